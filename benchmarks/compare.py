@@ -0,0 +1,84 @@
+"""
+基准测试结果比较模块
+
+用法: python -m benchmarks.compare baseline.json current.json --threshold 0.15
+按中位数比较同一规模下的同名测试，变慢超过阈值的标记为回归；存在回归时退出码为 1。
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+def load(path: str) -> dict:
+    """读取结果文件"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def compare(baseline: dict, current: dict, threshold: float = 0.15,
+            min_delta_ms: float = 0.05) -> List[dict]:
+    """比较两次运行结果
+
+    相对变化超过 threshold 且绝对差值超过 min_delta_ms 时才判定为回归或提升，
+    避免亚毫秒级测试的噪声被误报。
+    """
+    rows = []
+    for scale, data in current['scales'].items():
+        base_results = baseline.get('scales', {}).get(scale, {}).get('results', {})
+        for name, result in data['results'].items():
+            base = base_results.get(name)
+            if base is None:
+                rows.append({'scale': scale, 'name': name, 'baseline': None,
+                             'current': result['median_ms'], 'change': None, 'status': 'new'})
+                continue
+
+            before = base['median_ms']
+            after = result['median_ms']
+            change = (after - before) / before if before else 0.0
+            status = 'same'
+            if abs(after - before) >= min_delta_ms:
+                if change > threshold:
+                    status = 'regression'
+                elif change < -threshold:
+                    status = 'improvement'
+            rows.append({'scale': scale, 'name': name, 'baseline': before,
+                         'current': after, 'change': change, 'status': status})
+    return rows
+
+STATUS_TEXT = {
+    'regression': "回归",
+    'improvement': "提升",
+    'same': "持平",
+    'new': "新增",
+}
+
+def format_table(rows: List[dict]) -> str:
+    """格式化比较结果"""
+    lines = [f"{'规模':<8}{'测试':<30}{'基准(ms)':>12}{'当前(ms)':>12}{'变化':>10}  状态"]
+    for row in rows:
+        baseline = f"{row['baseline']:.3f}" if row['baseline'] is not None else "-"
+        change = f"{row['change']:+.1%}" if row['change'] is not None else "-"
+        lines.append(
+            f"{row['scale']:<8}{row['name']:<30}{baseline:>12}{row['current']:>12.3f}"
+            f"{change:>10}  {STATUS_TEXT[row['status']]}"
+        )
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="比较两次基准测试结果")
+    parser.add_argument('baseline', help="基准结果 JSON")
+    parser.add_argument('current', help="当前结果 JSON")
+    parser.add_argument('--threshold', type=float, default=0.15, help="判定回归的相对变化（默认 15%%）")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help="忽略小于该值的绝对差值")
+    args = parser.parse_args(argv)
+
+    rows = compare(load(args.baseline), load(args.current), args.threshold, args.min_delta_ms)
+    print(format_table(rows))
+    regressions = [row for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能回归", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+并发出入库压力测试模块
+
+用法: python -m benchmarks.contention --writers 1 2 4 8 --ops 500
+多个进程同时对同一数据库文件中的少量热点商品出入库（库存有限，会出现抢购），检查：
+- 没有丢失更新：每个商品的最终库存 = 初始库存 + 成功入库数量 - 成功出库数量，且与出入库记录一致
+- 没有超卖：最终库存不为负
+并报告不同写入进程数下的吞吐量（次/秒）、数据库忙重试次数和失败次数。
+--naive 使用先读库存、再按绝对值写回的写法作对照，通常会检查出丢失更新。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from src.database.connection import is_busy_error
+from src.database.db_manager import DatabaseManager
+
+def naive_process(conn: sqlite3.Connection, product_id: int, type: str, quantity: int, price: float):
+    """对照写法：读取库存后在 Python 中计算新库存，按绝对值写回（两个写入方交错时会覆盖对方）"""
+    current = conn.execute("SELECT quantity FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+    new_quantity = current + quantity if type == 'in' else current - quantity
+    if new_quantity < 0:
+        return False, "库存不足"
+    conn.execute("UPDATE products SET quantity = ? WHERE id = ?", (new_quantity, product_id))
+    conn.execute('''
+    INSERT INTO inventory_records (product_id, type, quantity, price, cost_price, remark)
+    VALUES (?, ?, ?, ?, ?, '')
+    ''', (product_id, type, quantity, price, None if type == 'in' else price))
+    conn.commit()
+    return True, "操作成功"
+
+def writer(db_path: str, product_ids: List[int], ops: int, seed: int, naive: bool,
+           start, results):
+    """写入进程：随机出入库 ops 次，结果放入 results 队列"""
+    rng = random.Random(seed)
+    db = DatabaseManager(db_path)
+    conn = db.conn
+    received = Counter()
+    shipped = Counter()
+    failures = Counter()
+    start.wait()
+
+    started = time.perf_counter()
+    for _ in range(ops):
+        product_id = rng.choice(product_ids)
+        type = 'in' if rng.random() < 0.2 else 'out'
+        quantity = rng.randint(1, 3)
+        try:
+            if naive:
+                ok, message = naive_process(conn, product_id, type, quantity, 10.0)
+            else:
+                ok, message = db.process_inventory(product_id, type, quantity, 10.0)
+        except sqlite3.Error as e:
+            conn.rollback()
+            ok, message = False, "数据库忙" if is_busy_error(e) else str(e)
+        if ok:
+            (received if type == 'in' else shipped)[product_id] += quantity
+        else:
+            failures["数据库忙" if "database is locked" in message else message] += 1
+    elapsed = time.perf_counter() - started
+
+    results.put({
+        'elapsed': elapsed,
+        'received': dict(received),
+        'shipped': dict(shipped),
+        'failures': dict(failures),
+        'retries': db.connections.retry_count,
+    })
+
+def prepare(db_path: str, products: int, stock: int) -> Dict[int, int]:
+    """创建测试数据库和热点商品，返回 {商品ID: 初始库存}"""
+    db = DatabaseManager(db_path)
+    initial = {db.add_product(f"热点商品{index + 1}", stock, 8.0): stock for index in range(products)}
+    db.connections.close_all()
+    return initial
+
+def check(db_path: str, initial: Dict[int, int], runs: List[dict]) -> dict:
+    """核对最终库存与各进程成功的出入库数量、出入库记录是否一致"""
+    conn = sqlite3.connect(db_path)
+    lost = 0
+    oversold = 0
+    for product_id, stock in initial.items():
+        expected = stock + sum(run['received'].get(product_id, 0) - run['shipped'].get(product_id, 0)
+                               for run in runs)
+        actual = conn.execute("SELECT quantity FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+        recorded = stock + conn.execute('''
+        SELECT COALESCE(SUM(CASE type WHEN 'in' THEN quantity ELSE -quantity END), 0)
+        FROM inventory_records
+        WHERE product_id = ?
+        ''', (product_id,)).fetchone()[0]
+        lost += abs(actual - expected) + abs(actual - recorded)
+        oversold += max(0, -recorded)
+    conn.close()
+    return {'lost_updates': lost, 'oversold': oversold}
+
+def run(work_dir: str, writers: int, ops: int, products: int, stock: int, naive: bool, seed: int) -> dict:
+    """用 writers 个进程运行一轮压力测试"""
+    db_path = os.path.join(work_dir, f"contention_{writers}{'_naive' if naive else ''}.db")
+    initial = prepare(db_path, products, stock)
+
+    # 使用 spawn 启动，子进程不继承父进程的数据库连接
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=writer, args=(db_path, list(initial), ops, seed + index, naive, start, results))
+        for index in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)
+
+    started = time.perf_counter()
+    start.set()
+    runs = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    failures = Counter()
+    for item in runs:
+        failures.update(item['failures'])
+    completed = writers * ops - sum(failures.values())
+    report = {
+        'writers': writers,
+        'ops': writers * ops,
+        'completed': completed,
+        'elapsed': round(elapsed, 3),
+        'ops_per_sec': round(writers * ops / elapsed, 1),
+        'retries': sum(item['retries'] for item in runs),
+        'failures': dict(failures),
+    }
+    report.update(check(db_path, initial, runs))
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="多进程并发出入库压力测试")
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8], help="写入进程数（可指定多个）")
+    parser.add_argument('--ops', type=int, default=500, help="每个进程的出入库次数")
+    parser.add_argument('--products', type=int, default=4, help="热点商品数")
+    parser.add_argument('--stock', type=int, default=300, help="每个商品的初始库存")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--naive', action='store_true', help="使用先读后写绝对值的对照写法")
+    parser.add_argument('--output', help="结果 JSON 文件")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='inventory-contention-') as work_dir:
+        reports = []
+        for writers in args.writers:
+            report = run(work_dir, writers, args.ops, args.products, args.stock, args.naive, args.seed)
+            reports.append(report)
+            print(f"  {writers:>3} 个进程  {report['ops_per_sec']:>9.1f} 次/秒  重试 {report['retries']:>5}  "
+                  f"丢失更新 {report['lost_updates']:>5}  超卖 {report['oversold']:>3}  "
+                  f"失败 {sum(report['failures'].values()):>5} {report['failures']}", file=sys.stderr)
+
+    text = json.dumps({'naive': args.naive, 'runs': reports}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    if any(report['lost_updates'] or report['oversold'] for report in reports):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
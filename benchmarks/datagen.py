@@ -0,0 +1,176 @@
+"""
+基准测试数据生成模块
+
+按固定随机种子生成接近真实使用情况的库存数据库：商品销量按 Zipf 分布倾斜（少数热销商品占大部分记录），
+出入库记录按时间顺序生成；成本汇总、汇总表和全文索引与程序正常写入的结果一致。
+"""
+import bisect
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import List, Optional
+from src.database.connection import ConnectionManager
+from src.database.db_manager import DatabaseManager
+from src.database.migrations import SCHEMA_VERSION
+
+# 规模名称 -> (商品数, 出入库记录数)
+SCALES = {
+    'small': (200, 10_000),
+    'medium': (2_000, 100_000),
+    'large': (10_000, 1_000_000),
+}
+
+CATEGORIES = ("矿泉水", "方便面", "牛奶", "饼干", "洗发水", "牙膏", "纸巾", "咖啡",
+              "酸奶", "薯片", "洗衣液", "大米", "食用油", "巧克力", "果汁", "啤酒")
+BRANDS = ("康师傅", "统一", "伊利", "蒙牛", "农夫山泉", "娃哈哈", "雀巢", "乐事",
+          "清风", "心相印", "海飞丝", "高露洁", "蓝月亮", "金龙鱼", "德芙", "青岛")
+SPECS = ("500ml", "1L", "250g", "箱装", "6连包", "家庭装", "迷你装", "袋装")
+
+BATCH_SIZE = 10_000
+
+def zipf_cum_weights(count: int, exponent: float = 1.1) -> List[float]:
+    """按 Zipf 分布生成累计权重（排名越靠前越热门）"""
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+def _product_row(rng: random.Random, index: int) -> tuple:
+    """生成一个商品：(名称, 基准价格, 描述)"""
+    brand = rng.choice(BRANDS)
+    category = rng.choice(CATEGORIES)
+    spec = rng.choice(SPECS)
+    name = f"{brand}{category}{spec}-{index:05d}"
+    base_price = round(rng.uniform(2, 200), 2)
+    description = f"{brand} {category} {spec}，货架{rng.randint(1, 40)}号"
+    return name, base_price, description
+
+def generate_database(path: str, products: int, records: int, seed: int = 42,
+                      days: int = 365, exponent: float = 1.1,
+                      end: Optional[datetime] = None) -> dict:
+    """生成数据库文件（已存在时覆盖），返回生成的数据量"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    rng = random.Random(seed)
+    end = end or datetime(2024, 12, 31, 20, 0, 0)
+    start = end - timedelta(days=days)
+
+    db = DatabaseManager(path)
+    conn = db.conn
+    try:
+        with db.transaction(immediate=True):
+            catalog = [_product_row(rng, index) for index in range(products)]
+            created_at = start.strftime('%Y-%m-%d %H:%M:%S')
+            conn.executemany('''
+            INSERT INTO products (name, quantity, price, avg_price, description, created_at, updated_at)
+            VALUES (?, 0, ?, ?, ?, ?, ?)
+            ''', [(name, price, price, description, created_at, created_at)
+                  for name, price, description in catalog])
+            ids = [row[0] for row in conn.execute("SELECT id FROM products ORDER BY id")]
+
+            # 热门程度与商品ID无关
+            popularity = ids[:]
+            rng.shuffle(popularity)
+            cum_weights = zipf_cum_weights(len(popularity), exponent)
+            total_weight = cum_weights[-1]
+
+            states = {
+                product_id: {'quantity': 0, 'price': catalog[index][1], 'avg_price': catalog[index][1],
+                             'cost_total': 0.0, 'cost_quantity': 0, 'base': catalog[index][1]}
+                for index, product_id in enumerate(ids)
+            }
+
+            step = (end - start).total_seconds() / max(records, 1)
+            record_rows = []
+            history_rows = []
+            counts = {'in': 0, 'out': 0}
+            for index in range(records):
+                product_id = popularity[bisect.bisect(cum_weights, rng.random() * total_weight)]
+                state = states[product_id]
+                when = (start + timedelta(seconds=index * step)).strftime('%Y-%m-%d %H:%M:%S')
+
+                if state['quantity'] < 10 or rng.random() < 0.3:
+                    quantity = rng.randint(20, 200)
+                    price = round(state['base'] * rng.uniform(0.85, 1.05), 2)
+                    state['quantity'] += quantity
+                    state['price'] = price
+                    state['cost_total'] += price * quantity
+                    state['cost_quantity'] += quantity
+                    state['avg_price'] = round(state['cost_total'] / state['cost_quantity'], 1)
+                    history_rows.append((product_id, price, quantity, when))
+                    record_rows.append((product_id, 'in', quantity, price, None, "", when))
+                    counts['in'] += 1
+                else:
+                    quantity = rng.randint(1, min(state['quantity'], 12))
+                    price = round(state['base'] * rng.uniform(1.15, 1.6), 2)
+                    state['quantity'] -= quantity
+                    remark = "会员" if rng.random() < 0.1 else ""
+                    record_rows.append((product_id, 'out', quantity, price, state['avg_price'], remark, when))
+                    counts['out'] += 1
+
+                if len(record_rows) >= BATCH_SIZE:
+                    _flush(conn, record_rows, history_rows)
+
+            _flush(conn, record_rows, history_rows)
+            updated_at = end.strftime('%Y-%m-%d %H:%M:%S')
+            conn.executemany('''
+            UPDATE products
+            SET quantity = ?, price = ?, avg_price = ?, cost_total = ?, cost_quantity = ?, updated_at = ?
+            WHERE id = ?
+            ''', [
+                (state['quantity'], state['price'], state['avg_price'],
+                 state['cost_total'], state['cost_quantity'], updated_at, product_id)
+                for product_id, state in states.items()
+            ])
+            # 全部库存在默认仓库
+            conn.executemany('''
+            INSERT OR REPLACE INTO warehouse_stock (product_id, warehouse_id, quantity)
+            VALUES (?, 1, ?)
+            ''', [(product_id, state['quantity']) for product_id, state in states.items() if state['quantity'] > 0])
+
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        # 生成的文件会被复制使用，关闭连接确保内容全部写入主文件
+        ConnectionManager.get(path).close_all()
+
+    return {
+        'products': products,
+        'records': records,
+        'in_records': counts['in'],
+        'out_records': counts['out'],
+        'hot_products': popularity[:10],
+    }
+
+def _flush(conn, record_rows: list, history_rows: list):
+    """批量写入已生成的记录"""
+    conn.executemany('''
+    INSERT INTO price_history (product_id, price, quantity, created_at)
+    VALUES (?, ?, ?, ?)
+    ''', history_rows)
+    conn.executemany('''
+    INSERT INTO inventory_records (product_id, type, quantity, price, cost_price, remark, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', record_rows)
+    record_rows.clear()
+    history_rows.clear()
+
+def template_path(data_dir: str, scale: str, seed: int) -> str:
+    """缓存的数据库模板路径（结构版本变化后重新生成）"""
+    return os.path.join(data_dir, f"{scale}-seed{seed}-v{SCHEMA_VERSION}.db")
+
+def prepare_database(data_dir: str, scale: str, seed: int, work_path: str) -> str:
+    """准备一个可写的基准测试数据库：模板不存在时生成，然后复制到 work_path"""
+    os.makedirs(data_dir, exist_ok=True)
+    template = template_path(data_dir, scale, seed)
+    if not os.path.exists(template):
+        products, records = SCALES[scale]
+        generate_database(template + '.tmp', products, records, seed)
+        os.replace(template + '.tmp', template)
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work_path + suffix):
+            os.remove(work_path + suffix)
+    shutil.copyfile(template, work_path)
+    return work_path
\ No newline at end of file
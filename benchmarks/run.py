@@ -0,0 +1,234 @@
+"""
+基准测试运行模块
+
+用法: python -m benchmarks.run --scales small medium --output results.json
+每项测试重复执行到累计时间达到 --min-time（至少 --min-runs 次），记录最小值、中位数和平均值；
+结果保存为 JSON，可用 python -m benchmarks.compare 比较两次运行。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from src.database.db_manager import DatabaseManager
+from src.services.record_exporter import RecordExporter
+from .datagen import SCALES, prepare_database
+
+class BenchmarkContext:
+    """一次基准测试使用的数据库及辅助数据"""
+    def __init__(self, db: DatabaseManager, work_dir: str, seed: int):
+        self.db = db
+        self.work_dir = work_dir
+        self.rng = random.Random(seed)
+        self.product_ids = [product.id for product in db.get_all_products()]
+        # 按记录数排序的热门商品（读取汇总表）
+        self.hot_product_ids = [row[0] for row in db.conn.execute('''
+            SELECT product_id FROM daily_summary
+            GROUP BY product_id ORDER BY SUM(record_count) DESC LIMIT 10
+        ''')]
+        # 搜索关键字：热门商品名称中的品牌和品类
+        self.keywords = [db.get_product(id).name[:4] for id in self.hot_product_ids[:5]]
+
+    def random_product(self) -> int:
+        """随机选择一个商品"""
+        return self.rng.choice(self.product_ids)
+
+def bench_get_all_products(ctx: BenchmarkContext):
+    """全部商品列表"""
+    ctx.db.get_all_products()
+
+def bench_search_products(ctx: BenchmarkContext):
+    """全文搜索（4个字的品牌/品类关键字）"""
+    ctx.db.search_products(ctx.rng.choice(ctx.keywords), limit=500)
+
+def bench_search_products_short(ctx: BenchmarkContext):
+    """短关键字搜索（2个字，LIKE 匹配）"""
+    ctx.db.search_products(ctx.rng.choice(ctx.keywords)[:2], limit=500)
+
+def bench_get_inventory_records_hot(ctx: BenchmarkContext):
+    """最热门商品的全部记录"""
+    ctx.db.get_inventory_records(ctx.hot_product_ids[0])
+
+def bench_get_inventory_records_all(ctx: BenchmarkContext):
+    """全部记录（对象列表）"""
+    ctx.db.get_inventory_records()
+
+def bench_records_first_page(ctx: BenchmarkContext):
+    """记录表格首页"""
+    ctx.db.get_inventory_records_page(200)
+
+def bench_records_scan_pages(ctx: BenchmarkContext):
+    """顺序翻 50 页（模拟滚动记录表格）"""
+    after = None
+    for _ in range(50):
+        records, after = ctx.db.get_inventory_records_page(200, after)
+        if after is None:
+            break
+
+def bench_record_columns(ctx: BenchmarkContext):
+    """全部记录（列式结果集）"""
+    ctx.db.get_inventory_record_columns()
+
+def bench_count_records(ctx: BenchmarkContext):
+    """统计出库记录数"""
+    ctx.db.count_inventory_records(types=['out'])
+
+def bench_calculate_average_price(ctx: BenchmarkContext):
+    """计算平均成本价"""
+    ctx.db.calculate_average_price(ctx.random_product())
+
+def bench_process_inventory_in(ctx: BenchmarkContext):
+    """单笔入库"""
+    ctx.db.process_inventory(ctx.random_product(), 'in', 10, round(ctx.rng.uniform(5, 50), 2))
+
+def bench_process_inventory_out(ctx: BenchmarkContext):
+    """单笔出库（库存不足时补货，保证后续出库可以成功）"""
+    product_id = ctx.random_product()
+    ok, _ = ctx.db.process_inventory(product_id, 'out', 1, 99.0)
+    if not ok:
+        ctx.db.process_inventory(product_id, 'in', 100, 10.0)
+
+def bench_process_inventory_fifo(ctx: BenchmarkContext):
+    """先进先出商品的整单出入库（入库 3 行、出库 3 行，出库消耗多个成本层）"""
+    product_id = ctx.hot_product_ids[1]
+    if ctx.db.get_product(product_id).costing_method != 'fifo':
+        ctx.db.update_product(product_id, costing_method='fifo')
+    lines = [(product_id, 'in', 5, round(ctx.rng.uniform(5, 50), 2), '') for _ in range(3)]
+    lines += [(product_id, 'out', 4, 99.0, '') for _ in range(3)]
+    ctx.db.process_inventory_batch(lines)
+
+def bench_profit_report(ctx: BenchmarkContext):
+    """按月利润报表"""
+    ctx.db.get_profit_report('month')
+
+def bench_export_csv(ctx: BenchmarkContext):
+    """导出全部记录到 CSV"""
+    RecordExporter(ctx.db).export(os.path.join(ctx.work_dir, 'export.csv'))
+
+def bench_export_xlsx(ctx: BenchmarkContext):
+    """导出全部记录到 Excel"""
+    RecordExporter(ctx.db).export(os.path.join(ctx.work_dir, 'export.xlsx'))
+
+# 测试名称 -> (测试函数, 是否修改数据)；修改数据的测试放在最后执行
+BENCHMARKS: Dict[str, tuple] = {
+    'get_all_products': (bench_get_all_products, False),
+    'search_products': (bench_search_products, False),
+    'search_products_short': (bench_search_products_short, False),
+    'get_inventory_records_hot': (bench_get_inventory_records_hot, False),
+    'get_inventory_records_all': (bench_get_inventory_records_all, False),
+    'records_first_page': (bench_records_first_page, False),
+    'records_scan_pages': (bench_records_scan_pages, False),
+    'record_columns': (bench_record_columns, False),
+    'count_records': (bench_count_records, False),
+    'calculate_average_price': (bench_calculate_average_price, False),
+    'profit_report': (bench_profit_report, False),
+    'export_csv': (bench_export_csv, False),
+    'export_xlsx': (bench_export_xlsx, False),
+    'process_inventory_in': (bench_process_inventory_in, True),
+    'process_inventory_out': (bench_process_inventory_out, True),
+    'process_inventory_fifo': (bench_process_inventory_fifo, True),
+}
+
+def measure(func: Callable[[], None], min_time: float = 0.5, min_runs: int = 3,
+            max_runs: int = 200, warmup: bool = True) -> dict:
+    """重复执行 func，返回耗时统计（毫秒）；warmup 时先执行一次不计时（预热页缓存和语句缓存）"""
+    if warmup:
+        func()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_runs:
+        begin = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - begin) * 1000)
+        if len(timings) >= min_runs and time.perf_counter() - started >= min_time:
+            break
+    return {
+        'runs': len(timings),
+        'min_ms': round(min(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'mean_ms': round(statistics.fmean(timings), 4),
+    }
+
+def run_scale(scale: str, names: List[str], data_dir: str, seed: int,
+              min_time: float, min_runs: int) -> Dict[str, dict]:
+    """在一个规模的数据上运行指定的测试"""
+    with tempfile.TemporaryDirectory(prefix='inventory-bench-') as work_dir:
+        path = prepare_database(data_dir, scale, seed, os.path.join(work_dir, 'bench.db'))
+        db = DatabaseManager(path)
+        ctx = BenchmarkContext(db, work_dir, seed)
+        results = {}
+        ordered = sorted(names, key=lambda name: BENCHMARKS[name][1])
+        for name in ordered:
+            func, _ = BENCHMARKS[name]
+            # 导出等耗时操作只执行一次，不预热
+            slow = name.startswith('export') or name.endswith('_all')
+            results[name] = measure(lambda: func(ctx), min_time, 1 if slow else min_runs,
+                                    warmup=not slow)
+            print(f"  {name:<28} {results[name]['median_ms']:>12.3f} ms  ({results[name]['runs']}次)",
+                  file=sys.stderr)
+        db.connections.close_all()
+        return results
+
+def environment() -> dict:
+    """运行环境信息"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'commit': commit,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="库存系统基准测试")
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES),
+                        help="数据规模")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="只运行指定测试")
+    parser.add_argument('--skip', nargs='+', default=[], choices=list(BENCHMARKS), help="跳过指定测试")
+    parser.add_argument('--seed', type=int, default=42, help="数据生成随机种子")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'inventory-bench-data'),
+                        help="生成数据的缓存目录")
+    parser.add_argument('--min-time', type=float, default=0.5, help="每项测试的最少累计时间（秒）")
+    parser.add_argument('--min-runs', type=int, default=3, help="每项测试的最少执行次数")
+    parser.add_argument('--output', help="结果 JSON 文件（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    names = [name for name in (args.only or BENCHMARKS) if name not in args.skip]
+    report = {
+        'environment': environment(),
+        'seed': args.seed,
+        'scales': {},
+    }
+    for scale in args.scales:
+        products, records = SCALES[scale]
+        print(f"[{scale}] {products} 个商品, {records} 条记录", file=sys.stderr)
+        report['scales'][scale] = {
+            'products': products,
+            'records': records,
+            'results': run_scale(scale, names, args.data_dir, args.seed, args.min_time, args.min_runs),
+        }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+启动时间测量模块
+
+用法: python -m benchmarks.startup --scale medium --runs 5
+每次在新的 Python 进程中启动主窗口，测量：
+- import_ms：导入主窗口模块的时间
+- window_ms：创建主窗口（含数据库管理器）的时间
+- first_paint_ms：从进程开始到商品列表首屏显示的时间
+- full_list_ms：从进程开始到全部商品加载完成的时间
+并列出导入耗时最多的模块、首屏显示时已加载的重量级模块（应为空）。
+没有图形环境时只测量导入时间。
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+# 启动时不应加载的模块（仅在导出、统计、诊断时使用）
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'ui.inventory_records_window', 'ui.export_dialog',
+                 'services.record_exporter', 'services.analytics', 'database.instrumentation')
+
+def child(timeout: float):
+    """子进程：启动主窗口并输出各阶段耗时（JSON）"""
+    started = time.perf_counter()
+    sys.path.insert(0, SRC)
+    import tkinter as tk
+    from ui.main_window import InventorySystem
+    result = {'import_ms': (time.perf_counter() - started) * 1000}
+
+    expected = sqlite3.connect('inventory.db').execute("SELECT COUNT(*) FROM products").fetchone()[0]
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        result['error'] = f"无法创建窗口: {e}"
+        print(json.dumps(result))
+        return
+
+    app = InventorySystem(root)
+    result['window_ms'] = (time.perf_counter() - started) * 1000
+    deadline = started + timeout
+
+    def poll():
+        now = time.perf_counter()
+        if 'first_paint_ms' not in result and app.tree.get_children():
+            root.update_idletasks()
+            result['first_paint_ms'] = (time.perf_counter() - started) * 1000
+            result['heavy_modules'] = [name for name in HEAVY_MODULES if name in sys.modules]
+        if len(app.product_items) >= expected or now > deadline:
+            result['full_list_ms'] = (now - started) * 1000
+            result['products'] = len(app.product_items)
+            app.on_close()
+            return
+        root.after(1, poll)
+
+    root.after(1, poll)
+    root.mainloop()
+    print(json.dumps(result))
+
+def import_breakdown(limit: int = 10) -> List[dict]:
+    """用 -X importtime 统计导入主窗口模块时耗时最多的顶层模块"""
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ui.main_window'],
+        cwd=SRC, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=SRC)
+    ).stderr
+    modules = []
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        # 只统计直接由主窗口模块（或其之前的顶层导入）引入的模块
+        if match and len(match.group(3)) <= 3:
+            modules.append({'module': match.group(4), 'cumulative_ms': int(match.group(2)) / 1000})
+    modules.sort(key=lambda item: item['cumulative_ms'], reverse=True)
+    return modules[:limit]
+
+def run_once(db_path: str, timeout: float) -> dict:
+    """在新进程中启动一次主窗口"""
+    with tempfile.TemporaryDirectory(prefix='inventory-startup-') as work_dir:
+        shutil.copy(db_path, os.path.join(work_dir, 'inventory.db'))
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.startup', '--child', '--timeout', str(timeout)],
+            cwd=work_dir, capture_output=True, text=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, SRC]))
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith('{')]
+        if not lines:
+            raise RuntimeError(f"启动失败:\n{output.stderr}")
+        return json.loads(lines[-1])
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="测量程序启动时间")
+    parser.add_argument('--db', help="使用指定的数据库文件（默认按 --scale 生成）")
+    parser.add_argument('--scale', default='medium', help="生成数据的规模（见 benchmarks.datagen.SCALES）")
+    parser.add_argument('--seed', type=int, default=42, help="数据生成随机种子")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'inventory-bench-data'),
+                        help="生成数据的缓存目录")
+    parser.add_argument('--runs', type=int, default=5, help="启动次数")
+    parser.add_argument('--timeout', type=float, default=60.0, help="单次启动的最长等待时间（秒）")
+    parser.add_argument('--output', help="结果 JSON 文件")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.timeout)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='inventory-startup-') as work_dir:
+        db_path = args.db
+        if db_path is None:
+            from .datagen import prepare_database
+            db_path = prepare_database(args.data_dir, args.scale, args.seed,
+                                       os.path.join(work_dir, 'startup.db'))
+        runs = [run_once(db_path, args.timeout) for _ in range(args.runs)]
+
+    report = {'runs': len(runs), 'median': {}, 'imports': import_breakdown()}
+    for key in ('import_ms', 'window_ms', 'first_paint_ms', 'full_list_ms'):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            report['median'][key] = round(statistics.median(values), 1)
+    report['heavy_modules'] = runs[-1].get('heavy_modules')
+    report['products'] = runs[-1].get('products')
+    if 'error' in runs[-1]:
+        report['error'] = runs[-1]['error']
+
+    for key, value in report['median'].items():
+        print(f"  {key:<16} {value:>10.1f} ms", file=sys.stderr)
+    if 'error' in report:
+        print(f"  {report['error']}（只测量了导入时间）", file=sys.stderr)
+    print("  导入耗时最多的模块:", file=sys.stderr)
+    for item in report['imports']:
+        print(f"    {item['module']:<32} {item['cumulative_ms']:>8.1f} ms", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""
+记录归档模块
+
+早于截止时间的出入库记录和价格历史按年份移入独立的归档数据库文件
+（与主数据库同目录，如 inventory_archive_2023.db），主数据库只保留近期数据，体积小、备份快。
+归档清单保存在主数据库的 record_archives 表中；查询记录时按时间范围选出需要的归档，
+只在真正读取时才 ATTACH 到当前连接，近期数据的查询不会打开归档文件。
+
+归档总是移出最早的一段记录，因此各归档之间、归档与主数据库之间的时间范围互不重叠，
+分页查询按时间顺序依次读取各分区即可。
+
+用法: python -m src.database.archive --db inventory.db --before 2024-01-01 [--vacuum]
+"""
+import os
+import sqlite3
+from datetime import date, datetime
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+# SQLite 默认最多附加 10 个数据库，超过时先分离不再使用的归档
+MAX_ATTACHED = 8
+
+RECORD_COLUMNS = "id, product_id, type, quantity, price, cost_price, remark, created_at, warehouse_id, guid"
+HISTORY_COLUMNS = "id, product_id, price, quantity, created_at, guid"
+
+# 早期版本创建的归档文件缺少的字段: (表, 字段, 定义)
+ADDED_COLUMNS = [
+    ('inventory_records', 'warehouse_id', "INTEGER NOT NULL DEFAULT 1"),  # 多仓库之前的记录都属于默认仓库
+    ('inventory_records', 'guid', "TEXT"),
+    ('price_history', 'guid', "TEXT"),
+]
+
+class Partition(NamedTuple):
+    """记录所在的数据分区（主数据库或一个归档文件）"""
+    schema: str
+    path: Optional[str] = None
+    first_at: Optional[str] = None
+    last_at: Optional[str] = None
+
+MAIN = Partition('main')
+
+def _format_time(value: Union[date, datetime, str]) -> str:
+    """将时间转换为数据库存储格式"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+class RecordArchive:
+    """记录归档类"""
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.directory = os.path.dirname(os.path.abspath(db_path))
+        self.stem = os.path.splitext(os.path.basename(db_path))[0]
+
+    def archive_path(self, year: int) -> str:
+        """某一年的归档文件路径"""
+        return os.path.join(self.directory, f"{self.stem}_archive_{year}.db")
+
+    def _resolve(self, path: str) -> str:
+        """清单中的相对路径相对于主数据库所在目录"""
+        return path if os.path.isabs(path) else os.path.join(self.directory, path)
+
+    def list_archives(self, conn: sqlite3.Connection) -> List[dict]:
+        """归档清单（按年份排序）"""
+        rows = conn.execute('''
+        SELECT year, path, first_at, last_at, record_count, history_count, archived_before
+        FROM record_archives
+        ORDER BY year
+        ''').fetchall()
+        return [
+            {
+                'year': row[0], 'path': self._resolve(row[1]), 'first_at': row[2], 'last_at': row[3],
+                'record_count': row[4], 'history_count': row[5], 'archived_before': row[6],
+                'exists': os.path.exists(self._resolve(row[1])),
+            }
+            for row in rows
+        ]
+
+    def partitions(self, conn: sqlite3.Connection,
+                   start: Optional[Union[date, datetime, str]] = None,
+                   end: Optional[Union[date, datetime, str]] = None,
+                   descending: bool = True,
+                   after: Optional[Tuple[str, int]] = None,
+                   table: str = 'inventory_records') -> List[Partition]:
+        """查询时间范围 [start, end) 涉及的分区，按查询顺序排列
+
+        只返回 table（inventory_records 或 price_history）中有数据且时间范围有交集的归档；
+        after 为分页游标时跳过游标之前的归档。归档文件不存在（如已移到离线存储）时跳过该归档。
+        """
+        conditions = ["history_count > 0" if table == 'price_history' else "record_count > 0"]
+        params = []
+        # 早期清单中只有价格历史的年份没有时间范围，视为与任何时间范围相交
+        if start is not None:
+            conditions.append("(last_at IS NULL OR last_at >= ?)")
+            params.append(_format_time(start))
+        if end is not None:
+            conditions.append("(first_at IS NULL OR first_at < ?)")
+            params.append(_format_time(end))
+        if after is not None:
+            conditions.append("first_at <= ?" if descending else "last_at >= ?")
+            params.append(after[0])
+        rows = conn.execute(f'''
+        SELECT year, path, first_at, last_at
+        FROM record_archives
+        WHERE {' AND '.join(conditions)}
+        ORDER BY year
+        ''', params).fetchall()
+
+        partitions = [
+            Partition(f"archive_{year}", self._resolve(path), first_at, last_at)
+            for year, path, first_at, last_at in rows
+            if os.path.exists(self._resolve(path))
+        ]
+        partitions.append(MAIN)
+        if descending:
+            partitions.reverse()
+        return partitions
+
+    def table(self, conn: sqlite3.Connection, partition: Partition, name: str) -> str:
+        """分区中的表名（归档分区在首次使用时附加到当前连接）"""
+        if partition.schema != 'main':
+            self._attach(conn, partition.schema, partition.path)
+        return f"{partition.schema}.{name}"
+
+    @staticmethod
+    def _attach(conn: sqlite3.Connection, schema: str, path: str):
+        """把归档文件附加到连接（已附加时跳过）"""
+        attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+        if schema in attached:
+            return
+        archives = [name for name in attached if name.startswith('archive_')]
+        for name in archives[:max(0, len(archives) - MAX_ATTACHED + 1)]:
+            conn.execute(f"DETACH DATABASE {name}")
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        # 早期版本创建的归档文件补充缺少的字段
+        for table, column, definition in ADDED_COLUMNS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+            if columns and column not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError:
+                    # 只读的归档文件无法补充字段，保持原样
+                    pass
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection, schema: str):
+        """在归档文件中创建表和索引（与主数据库的记录表结构一致）"""
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.inventory_records (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL,
+            cost_price REAL,
+            remark TEXT,
+            created_at TIMESTAMP,
+            warehouse_id INTEGER NOT NULL DEFAULT 1,
+            guid TEXT
+        )
+        ''')
+        conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS {schema}.idx_inventory_records_created
+        ON inventory_records (created_at)
+        ''')
+        conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS {schema}.idx_inventory_records_product_created
+        ON inventory_records (product_id, created_at)
+        ''')
+        conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS {schema}.idx_inventory_records_type_created
+        ON inventory_records (type, created_at)
+        ''')
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.price_history (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            guid TEXT
+        )
+        ''')
+
+    def archive(self, conn: sqlite3.Connection, before: Union[date, datetime, str],
+                vacuum: bool = False) -> dict:
+        """把 before 之前的出入库记录和价格历史移入按年份划分的归档文件
+
+        复制和删除在同一个事务中完成；复制使用 INSERT OR IGNORE，中断后重新执行即可。
+        vacuum 为 True 时归档后压缩主数据库文件。
+        返回 {'records': 移出的记录数, 'history': 移出的价格历史数, 'years': 涉及的年份}。
+        """
+        if self.db_path == ':memory:' or self.db_path.startswith('file:'):
+            raise Exception("内存数据库不支持归档")
+        if conn.in_transaction:
+            raise Exception("不能在事务中执行归档")
+        cutoff = _format_time(before)
+
+        years = sorted({
+            int(row[0]) for table in ('inventory_records', 'price_history')
+            for row in conn.execute(f'''
+            SELECT DISTINCT substr(created_at, 1, 4)
+            FROM main.{table}
+            WHERE created_at < ?
+            ''', (cutoff,))
+            if row[0] and row[0].isdigit()
+        })
+        if not years:
+            return {'records': 0, 'history': 0, 'years': []}
+
+        records = history = 0
+        # 附加数据库的数量有限，年份较多时分组处理，每组一个事务（从最早的年份开始）
+        for index in range(0, len(years), MAX_ATTACHED):
+            group = years[index:index + MAX_ATTACHED]
+            moved = self._archive_years(conn, group, min(cutoff, f"{group[-1] + 1:04d}-01-01"))
+            records += moved[0]
+            history += moved[1]
+
+        if vacuum:
+            conn.execute("VACUUM")
+            # WAL 模式下压缩结果先写入 WAL，检查点后主数据库文件才会变小
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {'records': records, 'history': history, 'years': years}
+
+    def _archive_years(self, conn: sqlite3.Connection, years: List[int], cutoff: str) -> Tuple[int, int]:
+        """在一个事务中归档若干年份 cutoff 之前的记录，返回 (记录数, 价格历史数)"""
+        # ATTACH 不能在事务中执行，先附加涉及的归档文件
+        for year in years:
+            self._attach(conn, f"archive_{year}", self.archive_path(year))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for year in years:
+                    self._archive_year(conn, year, cutoff)
+                records = conn.execute(
+                    "DELETE FROM main.inventory_records WHERE created_at < ?", (cutoff,)
+                ).rowcount
+                history = conn.execute(
+                    "DELETE FROM main.price_history WHERE created_at < ?", (cutoff,)
+                ).rowcount
+                conn.commit()
+                return records, history
+            except BaseException:
+                conn.rollback()
+                raise
+        finally:
+            for year in years:
+                try:
+                    conn.execute(f"DETACH DATABASE archive_{year}")
+                except sqlite3.OperationalError:
+                    pass
+
+    def _archive_year(self, conn: sqlite3.Connection, year: int, cutoff: str):
+        """复制一年的记录到归档文件并更新清单"""
+        schema = f"archive_{year}"
+        self._create_tables(conn, schema)
+        low = f"{year:04d}-01-01"
+        high = min(cutoff, f"{year + 1:04d}-01-01")
+        conn.execute(f'''
+        INSERT OR IGNORE INTO {schema}.inventory_records ({RECORD_COLUMNS})
+        SELECT {RECORD_COLUMNS} FROM main.inventory_records
+        WHERE created_at >= ? AND created_at < ?
+        ''', (low, high))
+        conn.execute(f'''
+        INSERT OR IGNORE INTO {schema}.price_history ({HISTORY_COLUMNS})
+        SELECT {HISTORY_COLUMNS} FROM main.price_history
+        WHERE created_at >= ? AND created_at < ?
+        ''', (low, high))
+
+        # 时间范围包括出入库记录和价格历史，只有价格历史的年份也能按时间选出
+        first_at, last_at, record_count, history_count = conn.execute(f'''
+        SELECT MIN(created_at), MAX(created_at),
+               (SELECT COUNT(*) FROM {schema}.inventory_records),
+               (SELECT COUNT(*) FROM {schema}.price_history)
+        FROM (
+            SELECT created_at FROM {schema}.inventory_records
+            UNION ALL
+            SELECT created_at FROM {schema}.price_history
+        )
+        ''').fetchone()
+        conn.execute('''
+        INSERT INTO record_archives (
+            year, path, first_at, last_at, record_count, history_count, archived_before
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (year) DO UPDATE SET
+            path = excluded.path,
+            first_at = excluded.first_at,
+            last_at = excluded.last_at,
+            record_count = excluded.record_count,
+            history_count = excluded.history_count,
+            archived_before = excluded.archived_before,
+            updated_at = CURRENT_TIMESTAMP
+        ''', (year, os.path.basename(self.archive_path(year)), first_at, last_at,
+              record_count, history_count, high))
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    import argparse
+    from .db_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="归档早期出入库记录")
+    parser.add_argument('--db', default='inventory.db', help="主数据库文件")
+    parser.add_argument('--before', required=True, help="截止日期（不含），如 2024-01-01")
+    parser.add_argument('--vacuum', action='store_true', help="归档后压缩主数据库文件")
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db)
+    result = db.archive_records(args.before, vacuum=args.vacuum)
+    print(f"已归档 {result['records']} 条出入库记录、{result['history']} 条价格历史，"
+          f"年份: {', '.join(map(str, result['years'])) or '无'}")
+    for archive in db.list_archives():
+        print(f"  {archive['year']}: {archive['path']}  {archive['record_count']} 条记录  "
+              f"{archive['first_at']} ~ {archive['last_at']}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
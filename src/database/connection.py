@@ -0,0 +1,213 @@
+"""
+数据库连接管理模块
+
+每个线程复用一个 SQLite 连接，连接以 WAL 模式打开，读写互不阻塞。
+写操作遇到数据库忙（其他进程持有写锁超过 busy_timeout）时，由 run_with_retry 按指数退避加随机抖动重试。
+"""
+import atexit
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+from .migrations import migrate
+
+def is_busy_error(error: BaseException) -> bool:
+    """是否为数据库忙/被锁定错误（SQLITE_BUSY、SQLITE_LOCKED 及其扩展错误码）"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+class ConnectionManager:
+    """数据库连接管理类"""
+    _managers: Dict[str, 'ConnectionManager'] = {}
+    _managers_lock = threading.Lock()
+
+    def __init__(self, db_path: str, busy_timeout: float = 5.0, cached_statements: int = 256,
+                 busy_retries: int = 5, backoff_base: float = 0.02, backoff_max: float = 1.0):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.busy_retries = busy_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_count = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._connect_hooks: List[Callable[[sqlite3.Connection], None]] = []
+        self._migrated = False
+        # 内存数据库无法跨连接共享，所有线程共用一个连接
+        self._shared = db_path == ':memory:' or db_path.startswith('file::memory:')
+        self._shared_lock = threading.Lock()
+        self._shared_connection = None
+        self._shared_cursor = None
+
+    @classmethod
+    def get(cls, db_path: str) -> 'ConnectionManager':
+        """获取指定数据库文件的连接管理器（同一文件共用一个实例）"""
+        key = db_path if db_path.startswith(':') or db_path.startswith('file:') else os.path.abspath(db_path)
+        with cls._managers_lock:
+            manager = cls._managers.get(key)
+            if manager is None:
+                manager = cls(db_path)
+                cls._managers[key] = manager
+            return manager
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并设置连接参数"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            uri=self.db_path.startswith('file:')
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+        # 首次连接时升级数据库结构
+        with self._lock:
+            if not self._migrated:
+                migrate(conn)
+                self._migrated = True
+            self._connections.append(conn)
+            hooks = list(self._connect_hooks)
+        for hook in hooks:
+            hook(conn)
+        return conn
+
+    def add_connect_hook(self, hook: Callable[[sqlite3.Connection], None]):
+        """注册连接回调：对已有连接立即调用，之后新建连接时调用"""
+        with self._lock:
+            self._connect_hooks.append(hook)
+        for conn in self.all_connections():
+            hook(conn)
+
+    def remove_connect_hook(self, hook: Callable[[sqlite3.Connection], None]):
+        """移除连接回调"""
+        with self._lock:
+            if hook in self._connect_hooks:
+                self._connect_hooks.remove(hook)
+
+    def all_connections(self) -> List[sqlite3.Connection]:
+        """所有线程当前打开的连接"""
+        with self._lock:
+            return list(self._connections)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """当前线程的连接"""
+        if self._shared:
+            with self._shared_lock:
+                if self._shared_connection is None:
+                    self._shared_connection = self._connect()
+                    self._shared_cursor = self._shared_connection.cursor()
+                return self._shared_connection
+
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.connection = conn
+            self._local.cursor = conn.cursor()
+        return conn
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """当前线程的游标"""
+        if self._shared:
+            self.connection
+            return self._shared_cursor
+
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            self.connection
+            cursor = self._local.cursor
+        return cursor
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """事务上下文：正常退出时提交，异常时回滚
+
+        immediate 为 True 时以 BEGIN IMMEDIATE 开始事务，提前获取写锁。
+        在已开启的事务中嵌套使用时，由外层事务负责提交或回滚。
+        """
+        conn = self.connection
+        if conn.in_transaction:
+            yield conn
+            return
+
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def run_with_retry(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """执行一个完整的写事务，数据库忙时重试（最多 busy_retries 次）
+
+        func 内部负责开启和提交事务，失败时事务已回滚，可以安全地整体重新执行。
+        第 n 次重试前随机等待 0 ~ min(backoff_max, backoff_base * 2^n) 秒，避免多个写入方同时重试。
+        当前已在事务中时不重试，由外层事务负责。
+        """
+        if self.connection.in_transaction:
+            return func(*args, **kwargs)
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if attempt >= self.busy_retries or not is_busy_error(e):
+                    raise
+            with self._lock:
+                self.retry_count += 1
+            time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+            attempt += 1
+
+    def close(self):
+        """关闭当前线程的连接"""
+        if self._shared:
+            return
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            return
+        self._local.connection = None
+        self._local.cursor = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._shared_connection = None
+            self._shared_cursor = None
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    @classmethod
+    def close_all_managers(cls):
+        """关闭所有连接管理器的连接"""
+        with cls._managers_lock:
+            managers = list(cls._managers.values())
+        for manager in managers:
+            manager.close_all()
+
+
+atexit.register(ConnectionManager.close_all_managers)
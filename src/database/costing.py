@@ -0,0 +1,107 @@
+"""
+成本计算模块
+
+商品的出库成本按 products.costing_method 计算：
+- 'average'：加权平均，出库成本为商品当前均价；
+- 'fifo'：先进先出，每次入库形成一个成本层，出库按入库顺序消耗成本层。
+
+先进先出的成本层通过部分索引 idx_cost_layers_open（只包含 remaining > 0 的层）按需读取，
+出库的耗时只与消耗的层数有关，与历史入库次数无关。
+"""
+import sqlite3
+from collections import deque
+from typing import Dict, List, Tuple
+
+COSTING_METHODS = {
+    'average': "加权平均",
+    'fifo': "先进先出",
+}
+
+class FifoLayers:
+    """一个商品在一次批量操作中的先进先出成本层
+
+    数据库中的可用成本层按需逐行读取；本批次新入库的层排在其后。
+    所有消耗先在内存中模拟，整单校验通过后由 pending_updates/pending_inserts 一次写回。
+    """
+    def __init__(self, conn: sqlite3.Connection, product_id: int):
+        self.product_id = product_id
+        self._rows = conn.execute('''
+        SELECT id, unit_cost, remaining
+        FROM cost_layers
+        WHERE product_id = ? AND remaining > 0
+        ORDER BY id
+        ''', (product_id,))
+        self._open = deque()          # 已读取、尚未消耗完的层: [id, unit_cost, remaining]
+        self._exhausted = False
+        self._changed: Dict[int, int] = {}  # 已有层 id -> 消耗后的 remaining
+        self._new: List[list] = []    # 本批次入库的层: [unit_cost, quantity, remaining]
+        self._new_start = 0           # 本批次第一个未消耗完的新层
+
+    def add(self, unit_cost: float, quantity: int):
+        """入库：追加一个成本层"""
+        self._new.append([unit_cost, quantity, quantity])
+
+    def _next_layer(self):
+        """下一个可消耗的已有成本层（按需从数据库读取）"""
+        if not self._open and not self._exhausted:
+            row = self._rows.fetchone()
+            if row is None:
+                self._exhausted = True
+                self._rows.close()
+            else:
+                self._open.append(list(row))
+        return self._open[0] if self._open else None
+
+    def consume(self, quantity: int, fallback_cost: float) -> float:
+        """出库：按先进先出消耗 quantity 个单位，返回总成本
+
+        成本层不足（如手工修改过库存数量）时，不足部分按 fallback_cost 计算。
+        """
+        total = 0.0
+        while quantity > 0:
+            layer = self._next_layer()
+            if layer is not None:
+                taken = min(layer[2], quantity)
+                total += taken * layer[1]
+                layer[2] -= taken
+                self._changed[layer[0]] = layer[2]
+                if layer[2] == 0:
+                    self._open.popleft()
+            elif self._new_start < len(self._new):
+                layer = self._new[self._new_start]
+                taken = min(layer[2], quantity)
+                total += taken * layer[0]
+                layer[2] -= taken
+                if layer[2] == 0:
+                    self._new_start += 1
+            else:
+                total += quantity * fallback_cost
+                break
+            quantity -= taken
+        return total
+
+    def pending_updates(self) -> List[Tuple[int, int]]:
+        """需要写回的已有成本层: (remaining, id)"""
+        return [(remaining, layer_id) for layer_id, remaining in self._changed.items()]
+
+    def pending_inserts(self) -> List[Tuple[int, float, int, int]]:
+        """需要新增的成本层: (product_id, unit_cost, quantity, remaining)"""
+        return [(self.product_id, unit_cost, quantity, remaining)
+                for unit_cost, quantity, remaining in self._new]
+
+    def close(self):
+        """关闭未读完的查询"""
+        if not self._exhausted:
+            self._rows.close()
+            self._exhausted = True
+
+def write_layers(cursor: sqlite3.Cursor, layers: List[FifoLayers]):
+    """写回一批商品的成本层变化"""
+    for item in layers:
+        item.close()
+    cursor.executemany("UPDATE cost_layers SET remaining = ? WHERE id = ?",
+                       [row for item in layers for row in item.pending_updates()])
+    cursor.executemany('''
+    INSERT INTO cost_layers (product_id, unit_cost, quantity, remaining)
+    VALUES (?, ?, ?, ?)
+    ''', [row for item in layers for row in item.pending_inserts()])
\ No newline at end of file
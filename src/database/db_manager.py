@@ -2,185 +2,544 @@
 数据库管理模块
 """
 import sqlite3
-from datetime import datetime
-from typing import List, Optional, Tuple, Union
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from src.models.product import Product
 from src.models.inventory_record import InventoryRecord
+from src.models.record_columns import RecordColumns
+from src.models.inventory_line import InventoryLine
+from src.models.profit_summary import ProfitSummary
+from src.models.warehouse import Warehouse
+from .connection import ConnectionManager
+from .migrations import migrate
+from .product_cache import ProductCache
+from .costing import COSTING_METHODS, FifoLayers, write_layers
+from .archive import RecordArchive
+from . import reporting
+from . import stock_history
+from . import sync
+from . import warehouses
+
+if TYPE_CHECKING:
+    from .instrumentation import Instrumentation
+
+# 商品查询字段（与 row_to_product 对应）
+PRODUCT_COLUMNS = """
+    p.id, p.name, p.quantity, p.price, p.avg_price, p.description,
+    datetime(p.created_at, 'localtime') as created_at,
+    datetime(p.updated_at, 'localtime') as updated_at,
+    p.costing_method, p.barcode
+"""
+
+# 出入库记录查询字段（与 row_to_inventory_record 对应，最后一列为键集分页使用的原始时间）
+RECORD_COLUMNS = """
+    r.id, r.product_id, p.name, r.type, r.quantity, r.price, r.cost_price, r.remark,
+    datetime(r.created_at, 'localtime') as local_time, r.created_at
+"""
+
+# 列式结果集使用的字段（时间为本地时间按 UTC 换算的秒数）
+RECORD_EPOCH_COLUMNS = """
+    r.id, r.product_id, p.name, r.type, r.quantity, r.price, r.cost_price, r.remark,
+    CAST(strftime('%s', r.created_at, 'localtime') AS INTEGER), r.created_at
+"""
+
+# 批量分析使用的数值字段（是否出库为 0/1，时间为记录时间按 UTC 换算的秒数，与汇总表的日期一致）
+RECORD_NUMERIC_COLUMNS = """
+    r.id, r.product_id, r.type = 'out', r.quantity, r.price, r.cost_price, r.warehouse_id,
+    CAST(strftime('%s', r.created_at) AS INTEGER), r.created_at
+"""
 
 class DatabaseManager:
     """数据库管理类"""
-    def __init__(self, db_path: str = 'inventory.db'):
+    def __init__(self, db_path: str = 'inventory.db', cache_size: int = 1024):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
+        # 同一数据库文件共用连接管理器，每个线程复用自己的连接；
+        # 首次连接时自动升级表结构，之后创建实例不再有额外开销
+        self.connections = ConnectionManager.get(db_path)
+        # 同一数据库文件共用商品缓存，由本类的写操作直写更新
+        self.product_cache = ProductCache.shared(self.connections, cache_size)
+        self._fulltext = None
+        # 早期记录的归档文件（查询时按时间范围按需附加）
+        self.archives = RecordArchive(db_path)
+        # 性能监测（默认关闭，开启后才导入监测模块、包装方法和跟踪语句）
+        self.instrumentation: Optional['Instrumentation'] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前线程的数据库连接"""
+        return self.connections.connection
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """当前线程的数据库游标"""
+        return self.connections.cursor
+
+    def transaction(self, immediate: bool = False):
+        """事务上下文，用法: with db.transaction(): ..."""
+        return self.connections.transaction(immediate)
+
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """修改商品的写事务（BEGIN IMMEDIATE），维护商品缓存
+
+        取得写锁后先移除其他连接修改过的缓存商品，提交前记下变化序号：本事务的修改由调用方在事务内直写缓存。
+        在已开启的事务中嵌套使用时由外层事务负责。
+        """
+        if self.conn.in_transaction:
+            with self.transaction() as conn:
+                yield conn
+            return
+        begun = ended = False
+        try:
+            with self.transaction(immediate=True) as conn:
+                self.product_cache.begin_write(conn)
+                begun = True
+                yield conn
+                self.product_cache.end_write(conn)
+                ended = True
+        except BaseException:
+            if ended:
+                # 提交失败：已直写的商品和记下的序号都不再可靠
+                self.product_cache.reset()
+            raise
+        finally:
+            if begun:
+                self.product_cache.after_write()
 
     def create_tables(self):
-        """创建数据库表"""
+        """创建或升级数据库表（结构已是最新时不执行任何DDL）"""
         try:
-            # 创建商品表
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                quantity INTEGER NOT NULL DEFAULT 0,
-                price REAL NOT NULL DEFAULT 0,
-                avg_price REAL NOT NULL DEFAULT 0,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-            
-            # 创建出入库记录表
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                type TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                price REAL,
-                cost_price REAL,
-                remark TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-            ''')
-            
-            # 创建价格历史表
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS price_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                price REAL NOT NULL,
-                quantity INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-            ''')
-            
-            self.conn.commit()
+            migrate(self.conn)
         except Exception as e:
             self.conn.rollback()
             raise Exception(f"创建数据库表失败: {str(e)}")
 
     def row_to_product(self, row: Tuple) -> Product:
-        """将数据库行转换为Product对象"""
-        return Product(
-            id=row[0],
-            name=row[1],
-            quantity=row[2],
-            price=row[3],
-            avg_price=row[4],
-            description=row[5],
-            created_at=datetime.strptime(row[6], '%Y-%m-%d %H:%M:%S'),
-            updated_at=datetime.strptime(row[7], '%Y-%m-%d %H:%M:%S')
-        )
+        """将数据库行转换为Product对象（字段顺序见 PRODUCT_COLUMNS，时间在首次访问时解析）"""
+        return Product(*row)
 
     def row_to_inventory_record(self, row: Tuple) -> InventoryRecord:
-        """将数据库行转换为InventoryRecord对象"""
-        return InventoryRecord(
-            id=row[0],
-            product_id=row[1],
-            type=row[2],
-            quantity=row[3],
-            price=row[4],
-            cost_price=row[5],
-            remark=row[6],
-            created_at=datetime.strptime(row[9], '%Y-%m-%d %H:%M:%S'),
-            product_name=row[8]
-        )
+        """将数据库行转换为InventoryRecord对象（字段顺序见 RECORD_COLUMNS，时间在首次访问时解析）"""
+        return InventoryRecord(*row[:9])
 
     def get_all_products(self) -> List[Product]:
         """获取所有商品"""
         self.cursor.execute("""
         SELECT id, name, quantity, price, avg_price, description, 
                datetime(created_at, 'localtime') as created_at,
-               datetime(updated_at, 'localtime') as updated_at
+               datetime(updated_at, 'localtime') as updated_at,
+               costing_method, barcode
         FROM products 
         ORDER BY name
         """)
         return [self.row_to_product(row) for row in self.cursor.fetchall()]
 
+    def get_products_page(self, limit: int = 100, after: Optional[Tuple[str, int]] = None
+                          ) -> Tuple[List[Product], Optional[Tuple[str, int]]]:
+        """按 (名称, ID) 键集分页获取商品，after 为上一页返回的游标
+
+        返回 (本页商品, 下一页游标)，没有更多商品时游标为 None。
+        """
+        condition = "WHERE (p.name, p.id) > (?, ?)" if after is not None else ""
+        rows = self.conn.execute(f"""
+        SELECT {PRODUCT_COLUMNS}
+        FROM products p
+        {condition}
+        ORDER BY p.name, p.id
+        LIMIT ?
+        """, (*after, limit) if after is not None else (limit,)).fetchall()
+        cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return [self.row_to_product(row) for row in rows], cursor
+
     def get_product(self, id: int) -> Optional[Product]:
-        """获取单个商品"""
+        """获取单个商品（优先读取缓存，返回的对象请勿修改）"""
+        self.product_cache.check_data_version(self.conn)
+        product = self.product_cache.get(id)
+        if product is not None:
+            return product
+        
+        generation = self.product_cache.generation()
+        product = self._load_product(id)
+        if product is not None:
+            self.product_cache.fill(product, generation)
+        return product
+
+    def _load_product(self, id: int) -> Optional[Product]:
+        """从数据库读取单个商品"""
         self.cursor.execute("""
         SELECT id, name, quantity, price, avg_price, description,
                datetime(created_at, 'localtime') as created_at,
-               datetime(updated_at, 'localtime') as updated_at
+               datetime(updated_at, 'localtime') as updated_at,
+               costing_method, barcode
         FROM products 
         WHERE id = ?
         """, (id,))
         row = self.cursor.fetchone()
         return self.row_to_product(row) if row else None
 
-    def search_products(self, keyword: str) -> List[Product]:
-        """搜索商品"""
-        self.cursor.execute("""
-        SELECT id, name, quantity, price, avg_price, description,
-               datetime(created_at, 'localtime') as created_at,
-               datetime(updated_at, 'localtime') as updated_at
-        FROM products 
-        WHERE name LIKE ? OR description LIKE ?
-        ORDER BY name
-        """, (f"%{keyword}%", f"%{keyword}%"))
+    def get_product_by_barcode(self, barcode: str) -> Optional[Product]:
+        """按条码/SKU精确查找商品（唯一索引定位商品ID，商品本身读取缓存）"""
+        barcode = self._normalize_barcode(barcode)
+        if barcode is None:
+            return None
+        row = self.conn.execute("SELECT id FROM products WHERE barcode = ?", (barcode,)).fetchone()
+        return self.get_product(row[0]) if row else None
+
+    def get_products_by_barcodes(self, barcodes: Iterable[str]) -> Dict[str, Product]:
+        """批量按条码查找商品，返回 {条码: 商品}（不存在的条码不在结果中）"""
+        codes = list(dict.fromkeys(filter(None, map(self._normalize_barcode, barcodes))))
+        products = {}
+        # 分块避免超过SQLite参数数量上限
+        for start in range(0, len(codes), 900):
+            chunk = codes[start:start + 900]
+            rows = self.conn.execute(f"""
+            SELECT {PRODUCT_COLUMNS}
+            FROM products p
+            WHERE p.barcode IN ({', '.join('?' * len(chunk))})
+            """, chunk).fetchall()
+            for row in rows:
+                product = self.row_to_product(row)
+                products[product.barcode] = product
+        return products
+
+    @staticmethod
+    def _normalize_barcode(barcode: Optional[str]) -> Optional[str]:
+        """去掉条码首尾空白，空条码视为未设置"""
+        if barcode is None:
+            return None
+        return str(barcode).strip() or None
+
+    def has_fulltext_search(self) -> bool:
+        """数据库是否已建立商品全文索引"""
+        if self._fulltext is None:
+            self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+            )
+            self._fulltext = self.cursor.fetchone() is not None
+        return self._fulltext
+
+    def search_products(self, keyword: str, limit: Optional[int] = None) -> List[Product]:
+        """搜索商品
+
+        关键字不少于3个字符时使用 FTS5 trigram 全文索引，按相关度排序；
+        更短的关键字（trigram 无法匹配）或没有全文索引时使用 LIKE 按名称排序。
+        """
+        keyword = keyword.strip()
+        # 扫码枪输入的完整条码直接定位
+        by_barcode = self.get_product_by_barcode(keyword)
+        if by_barcode is not None:
+            return [by_barcode]
+        if len(keyword) >= 3 and self.has_fulltext_search():
+            # 整个关键字作为短语查询，trigram 分词下等价于子串匹配
+            phrase = '"' + keyword.replace('"', '""') + '"'
+            self.cursor.execute(f"""
+            SELECT {PRODUCT_COLUMNS}
+            FROM products_fts f
+            JOIN products p ON p.id = f.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY bm25(products_fts, 10.0, 1.0), p.name
+            LIMIT ?
+            """, (phrase, limit if limit is not None else -1))
+        else:
+            self.cursor.execute(f"""
+            SELECT {PRODUCT_COLUMNS}
+            FROM products p
+            WHERE p.name LIKE ? OR p.description LIKE ?
+            ORDER BY p.name
+            LIMIT ?
+            """, (f"%{keyword}%", f"%{keyword}%", limit if limit is not None else -1))
         return [self.row_to_product(row) for row in self.cursor.fetchall()]
 
     def get_inventory_records(self, product_id: Optional[int] = None) -> List[InventoryRecord]:
         """获取出入库记录"""
-        if product_id:
-            self.cursor.execute("""
-            SELECT r.*, p.name, datetime(r.created_at, 'localtime') as local_time
-            FROM inventory_records r
-            JOIN products p ON r.product_id = p.id
-            WHERE r.product_id = ?
-            ORDER BY r.created_at DESC
-            """, (product_id,))
-        else:
-            self.cursor.execute("""
-            SELECT r.*, p.name, datetime(r.created_at, 'localtime') as local_time
-            FROM inventory_records r
-            JOIN products p ON r.product_id = p.id
-            ORDER BY r.created_at DESC
-            """)
-        return [self.row_to_inventory_record(row) for row in self.cursor.fetchall()]
+        return list(self.iter_inventory_records(product_ids=[product_id] if product_id else None))
+
+    def _record_filters(self, types: Optional[Iterable[str]] = None,
+                        start: Optional[Union[datetime, str]] = None,
+                        end: Optional[Union[datetime, str]] = None,
+                        product_ids: Optional[Iterable[int]] = None,
+                        remark: Optional[str] = None,
+                        warehouse_ids: Optional[Iterable[int]] = None) -> Tuple[List[str], List]:
+        """构造出入库记录查询的过滤条件（时间范围为 [start, end)）"""
+        conditions = []
+        params = []
+        if types:
+            types = list(types)
+            conditions.append(f"r.type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+        if start is not None:
+            conditions.append("r.created_at >= ?")
+            params.append(self._format_timestamp(start))
+        if end is not None:
+            conditions.append("r.created_at < ?")
+            params.append(self._format_timestamp(end))
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            conditions.append(f"r.product_id IN ({', '.join('?' * len(product_ids))})")
+            params.extend(product_ids)
+        if warehouse_ids is not None:
+            warehouse_ids = list(warehouse_ids)
+            conditions.append(f"r.warehouse_id IN ({', '.join('?' * len(warehouse_ids))})")
+            params.extend(warehouse_ids)
+        if remark:
+            escaped = remark.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("r.remark LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        return conditions, params
+
+    @staticmethod
+    def _format_timestamp(value: Union[datetime, str]) -> str:
+        """将时间转换为数据库存储格式"""
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return value
+
+    def _fetch_record_rows(self, columns: str, limit: int,
+                           after: Optional[Tuple[str, int]], descending: bool,
+                           offset: int, filters: dict) -> Tuple[List[tuple], Optional[Tuple[str, int]]]:
+        """按键集分页读取出入库记录的原始行（columns 首列为 r.id，末列为 r.created_at）
+
+        时间范围涉及已归档的记录时，按时间顺序依次读取主数据库和各归档分区。
+        """
+        conditions, params = self._record_filters(**filters)
+        if after is not None:
+            conditions.append(f"(r.created_at, r.id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "DESC" if descending else "ASC"
+        
+        partitions = self._record_partitions(filters, descending, after)
+        rows = []
+        for partition in partitions:
+            if offset and len(partitions) > 1:
+                # 随机跳转时整体跳过记录数不超过 offset 的分区
+                count = self._count_partition_records(partition, where, params)
+                if count <= offset:
+                    offset -= count
+                    continue
+            table = self.archives.table(self.conn, partition, 'inventory_records')
+            rows.extend(self.conn.execute(f"""
+            SELECT {columns}
+            FROM {table} r
+            JOIN main.products p ON r.product_id = p.id
+            {where}
+            ORDER BY r.created_at {order}, r.id {order}
+            LIMIT ? OFFSET ?
+            """, params + [limit - len(rows), offset]).fetchall())
+            offset = 0
+            if len(rows) >= limit:
+                break
+        
+        cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return rows, cursor
+
+    def get_inventory_records_page(self, limit: int = 100,
+                                   after: Optional[Tuple[str, int]] = None,
+                                   descending: bool = True, offset: int = 0,
+                                   **filters) -> Tuple[List[InventoryRecord], Optional[Tuple[str, int]]]:
+        """按 (created_at, id) 键集分页获取出入库记录
+
+        after 为上一页返回的游标，filters 支持 types/start/end/product_ids/remark/warehouse_ids。
+        offset 仅用于没有游标时的随机跳转（如拖动滚动条），顺序翻页应使用 after。
+        返回 (本页记录, 下一页游标)，没有更多记录时游标为 None。
+        """
+        rows, cursor = self._fetch_record_rows(RECORD_COLUMNS, limit, after, descending, offset, filters)
+        return [InventoryRecord(*row[:9]) for row in rows], cursor
+
+    def get_inventory_record_columns(self, descending: bool = True, page_size: int = 10000,
+                                     **filters) -> RecordColumns:
+        """以列式结果集读取出入库记录（批量统计、大量记录时使用，内存占用远小于对象列表）"""
+        columns = RecordColumns()
+        after = None
+        while True:
+            rows, after = self._fetch_record_rows(
+                RECORD_EPOCH_COLUMNS, page_size, after, descending, 0, filters
+            )
+            columns.append_rows(rows)
+            if after is None:
+                return columns
+
+    def iter_inventory_record_chunks(self, page_size: int = 100000, descending: bool = False,
+                                     **filters) -> Iterator[List[tuple]]:
+        """按块读取出入库记录的数值字段（RECORD_NUMERIC_COLUMNS 的前8列），供批量分析使用"""
+        after = None
+        while True:
+            rows, after = self._fetch_record_rows(
+                RECORD_NUMERIC_COLUMNS, page_size, after, descending, 0, filters
+            )
+            if rows:
+                yield rows
+            if after is None:
+                return
+
+    def iter_price_history_chunks(self, page_size: int = 100000,
+                                  start: Optional[Union[datetime, str]] = None,
+                                  end: Optional[Union[datetime, str]] = None,
+                                  product_ids: Optional[Iterable[int]] = None) -> Iterator[List[tuple]]:
+        """按时间顺序分块读取价格历史（包括归档）：(商品ID, 价格, 数量, 本地时间按 UTC 换算的秒数)"""
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("h.created_at >= ?")
+            params.append(self._format_timestamp(start))
+        if end is not None:
+            conditions.append("h.created_at < ?")
+            params.append(self._format_timestamp(end))
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            conditions.append(f"h.product_id IN ({', '.join('?' * len(product_ids))})")
+            params.extend(product_ids)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # 价格历史与出入库记录一起归档，按时间顺序读取有价格历史的分区
+        partitions = self.archives.partitions(
+            self.conn,
+            self._format_timestamp(start) if start is not None else None,
+            self._format_timestamp(end) if end is not None else None,
+            descending=False, table='price_history'
+        )
+        for partition in partitions:
+            table = self.archives.table(self.conn, partition, 'price_history')
+            cursor = self.conn.execute(f"""
+            SELECT h.product_id, h.price, h.quantity,
+                   CAST(strftime('%s', h.created_at, 'localtime') AS INTEGER)
+            FROM {table} h
+            {where}
+            ORDER BY h.created_at, h.id
+            """, params)
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    break
+                yield rows
+
+    def _record_partitions(self, filters: dict, descending: bool = True,
+                           after: Optional[Tuple[str, int]] = None) -> list:
+        """查询涉及的数据分区（主数据库及时间范围有交集的归档）"""
+        start, end = filters.get('start'), filters.get('end')
+        return self.archives.partitions(
+            self.conn,
+            self._format_timestamp(start) if start is not None else None,
+            self._format_timestamp(end) if end is not None else None,
+            descending, after
+        )
+
+    def _count_partition_records(self, partition, where: str, params: List) -> int:
+        """统计一个分区中符合条件的记录数（与分页查询一样只统计商品仍存在的记录）"""
+        table = self.archives.table(self.conn, partition, 'inventory_records')
+        return self.conn.execute(f"""
+        SELECT COUNT(*)
+        FROM {table} r
+        JOIN main.products p ON r.product_id = p.id
+        {where}
+        """, params).fetchone()[0]
+
+    def count_inventory_records(self, **filters) -> int:
+        """统计符合条件的出入库记录数（包括时间范围内的归档记录）"""
+        conditions, params = self._record_filters(**filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return sum(
+            self._count_partition_records(partition, where, params)
+            for partition in self._record_partitions(filters)
+        )
+
+    def iter_inventory_records(self, types: Optional[Iterable[str]] = None,
+                               start: Optional[Union[datetime, str]] = None,
+                               end: Optional[Union[datetime, str]] = None,
+                               product_ids: Optional[Iterable[int]] = None,
+                               remark: Optional[str] = None,
+                               descending: bool = True,
+                               page_size: int = 1000,
+                               warehouse_ids: Optional[Iterable[int]] = None) -> Iterator[InventoryRecord]:
+        """逐页流式读取出入库记录，内存占用与记录总数无关"""
+        filters = dict(types=types, start=start, end=end, product_ids=product_ids, remark=remark,
+                       warehouse_ids=warehouse_ids)
+        after = None
+        while True:
+            records, after = self.get_inventory_records_page(page_size, after, descending, **filters)
+            yield from records
+            if after is None:
+                break
 
     def calculate_average_price(self, product_id: int) -> float:
-        """计算商品的加权平均价格"""
+        """计算商品的加权平均价格（基于成本汇总字段）"""
         try:
             self.cursor.execute('''
-            SELECT SUM(price * quantity) / SUM(quantity) as avg_price
-            FROM price_history
-            WHERE product_id = ?
+            SELECT cost_total / cost_quantity as avg_price
+            FROM products
+            WHERE id = ?
             ''', (product_id,))
             result = self.cursor.fetchone()
-            return round(result[0], 1) if result[0] is not None else 0.0
+            return round(result[0], 1) if result and result[0] is not None else 0.0
         except Exception as e:
             print(f"计算平均价格失败: {str(e)}")
             return 0.0
 
-    def add_product(self, name: str, quantity: int, price: float, description: str = "") -> int:
-        """添加商品"""
-        self.cursor.execute('''
-        INSERT INTO products (name, quantity, price, avg_price, description)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (name, quantity, price, price, description))
-        
-        product_id = self.cursor.lastrowid
-        
-        # 记录初始价格历史
+    def _record_price_history(self, product_id: int, price: float, quantity: int):
+        """记录价格历史，并在同一事务中累加成本汇总"""
         self.cursor.execute('''
-        INSERT INTO price_history (product_id, price, quantity)
-        VALUES (?, ?, ?)
+        INSERT INTO price_history (product_id, price, quantity, guid)
+        VALUES (?, ?, ?, lower(hex(randomblob(16))))
         ''', (product_id, price, quantity))
         
-        self.conn.commit()
+        self.cursor.execute('''
+        UPDATE products
+        SET cost_total = cost_total + ?,
+            cost_quantity = cost_quantity + ?
+        WHERE id = ?
+        ''', (price * quantity, quantity, product_id))
+
+    def add_product(self, name: str, quantity: int, price: float, description: str = "",
+                    costing_method: str = 'average', barcode: Optional[str] = None) -> int:
+        """添加商品（costing_method 为 'average' 加权平均或 'fifo' 先进先出，barcode 为条码/SKU）"""
+        self._check_costing_method(costing_method)
+        barcode = self._normalize_barcode(barcode)
+        self._check_barcode_unused(barcode)
+        return self.connections.run_with_retry(self._apply_add_product, name, quantity, price,
+                                               description, costing_method, barcode)
+
+    def _apply_add_product(self, name: str, quantity: int, price: float, description: str,
+                           costing_method: str, barcode: Optional[str]) -> int:
+        """在一个写事务中插入商品、初始价格历史和成本层，返回商品ID"""
+        with self._write_transaction():
+            self.cursor.execute('''
+            INSERT INTO products (name, quantity, price, avg_price, description, costing_method, barcode, guid)
+            VALUES (?, ?, ?, ?, ?, ?, ?, lower(hex(randomblob(16))))
+            ''', (name, quantity, price, price, description, costing_method, barcode))
+            
+            product_id = self.cursor.lastrowid
+            
+            # 记录初始价格历史
+            self._record_price_history(product_id, price, quantity)
+            if costing_method == 'fifo':
+                self._add_cost_layer(product_id, price, quantity)
+            
+            # 在写锁内直写缓存（创建时间与更新时间均为当前时间）
+            now = datetime.now().replace(microsecond=0)
+            self.product_cache.put(Product(
+                id=product_id, name=name, quantity=quantity, price=price, avg_price=price,
+                description=description, created_at=now, updated_at=now, costing_method=costing_method,
+                barcode=barcode
+            ))
         return product_id
 
     def update_product(self, id: int, name: Optional[str] = None, 
                       quantity: Optional[int] = None, price: Optional[float] = None, 
-                      description: Optional[str] = None) -> bool:
-        """更新商品信息"""
+                      description: Optional[str] = None,
+                      costing_method: Optional[str] = None,
+                      barcode: Optional[str] = None,
+                      warehouse_id: Optional[int] = None) -> bool:
+        """更新商品信息（barcode 传入空字符串时清除条码）
+
+        修改的库存数量计入 warehouse_id 指定的仓库；未指定时库存只在一个仓库的计入该仓库，
+        库存分布在多个仓库或所选仓库库存不足时抛出 ValueError，不做任何修改。
+        先进先出商品修改库存数量时同步调整成本层：增加的数量按价格新增成本层，减少的数量按先进先出消耗。
+        """
+        if costing_method is not None:
+            self._check_costing_method(costing_method)
+        if barcode is not None:
+            barcode = self._normalize_barcode(barcode) or ''
+            self._check_barcode_unused(barcode or None, id)
         updates = []
         values = []
         if name is not None:
@@ -192,103 +551,562 @@ class DatabaseManager:
         if price is not None:
             updates.append("price = ?")
             values.append(price)
-            # 记录新价格历史
-            self.cursor.execute('''
-            INSERT INTO price_history (product_id, price, quantity)
-            VALUES (?, ?, ?)
-            ''', (id, price, quantity if quantity is not None else self.get_product(id).quantity))
         if description is not None:
             updates.append("description = ?")
             values.append(description)
+        if costing_method is not None:
+            updates.append("costing_method = ?")
+            values.append(costing_method)
+        if barcode is not None:
+            updates.append("barcode = ?")
+            values.append(barcode or None)
         
         if updates:
+            if quantity is None or len(updates) > 1:
+                # 同步时按修改时间决定商品字段以哪一方为准（只改数量时不更新）
+                updates.append("edited_at = CURRENT_TIMESTAMP")
             updates.append("updated_at = CURRENT_TIMESTAMP")
             query = f"UPDATE products SET {', '.join(updates)} WHERE id = ?"
             values.append(id)
-            self.cursor.execute(query, values)
-            self.conn.commit()
+            self.connections.run_with_retry(self._apply_product_update, id, query, values,
+                                            quantity, price, costing_method, warehouse_id)
             return True
         return False
 
+    def _apply_product_update(self, id: int, query: str, values: list, quantity: Optional[int],
+                              price: Optional[float], costing_method: Optional[str],
+                              warehouse_id: Optional[int]):
+        """在一个写事务中修改商品（在写锁内读取修改前的库存，成本层和仓库库存按实际变化量同步）"""
+        with self._write_transaction():
+            product = self._load_product(id)
+            if product is not None and quantity is not None and quantity != product.quantity:
+                # 先确定计入的仓库，无法修改时不写入任何内容
+                warehouse_id = warehouses.adjustment_warehouse(self.conn, id, warehouse_id,
+                                                               quantity - product.quantity)
+            if price is not None and product is not None:
+                # 记录新价格历史
+                self._record_price_history(
+                    id, price, quantity if quantity is not None else product.quantity
+                )
+            self.cursor.execute(query, values)
+            if product is not None:
+                self._sync_cost_layers(product, quantity, price, costing_method)
+                if quantity is not None and quantity != product.quantity:
+                    # 手工修改的数量计入所选仓库，并按节点累计供同步使用
+                    warehouses.change_stock(self.conn, id, warehouse_id, quantity - product.quantity)
+                    sync.record_adjustment(self.conn, id, quantity - product.quantity)
+                # 在写锁内直写缓存（重新读取修改后的商品）
+                self.product_cache.put(self._load_product(id))
+
+    def _check_barcode_unused(self, barcode: Optional[str], product_id: Optional[int] = None):
+        """校验条码未被其他商品使用"""
+        if barcode is None:
+            return
+        row = self.conn.execute("SELECT id FROM products WHERE barcode = ?", (barcode,)).fetchone()
+        if row is not None and row[0] != product_id:
+            raise ValueError(f"条码 {barcode} 已被其他商品使用")
+
+    @staticmethod
+    def _check_costing_method(costing_method: str):
+        """校验成本计算方式"""
+        if costing_method not in COSTING_METHODS:
+            raise ValueError(f"无效的成本计算方式: {costing_method}")
+
+    def _add_cost_layer(self, product_id: int, unit_cost: float, quantity: int):
+        """新增一个先进先出成本层"""
+        if quantity > 0:
+            self.cursor.execute('''
+            INSERT INTO cost_layers (product_id, unit_cost, quantity, remaining)
+            VALUES (?, ?, ?, ?)
+            ''', (product_id, unit_cost, quantity, quantity))
+
+    def _sync_cost_layers(self, product: Product, quantity: Optional[int],
+                          price: Optional[float], costing_method: Optional[str]):
+        """商品修改后同步成本层（在调用方的事务中执行）"""
+        method = costing_method or product.costing_method
+        if method != 'fifo':
+            if product.costing_method == 'fifo':
+                # 改为加权平均：关闭剩余成本层
+                self.cursor.execute(
+                    "UPDATE cost_layers SET remaining = 0 WHERE product_id = ? AND remaining > 0",
+                    (product.id,)
+                )
+            return
+        
+        new_quantity = quantity if quantity is not None else product.quantity
+        if product.costing_method != 'fifo':
+            # 改为先进先出：以当前库存和均价建立期初成本层
+            self.cursor.execute(
+                "UPDATE cost_layers SET remaining = 0 WHERE product_id = ? AND remaining > 0",
+                (product.id,)
+            )
+            self._add_cost_layer(product.id, product.avg_price, new_quantity)
+        elif new_quantity > product.quantity:
+            self._add_cost_layer(product.id, price if price is not None else product.price,
+                                 new_quantity - product.quantity)
+        elif new_quantity < product.quantity:
+            layers = FifoLayers(self.conn, product.id)
+            layers.consume(product.quantity - new_quantity, product.avg_price)
+            write_layers(self.cursor, [layers])
+
+    def get_cost_layers(self, product_id: int, open_only: bool = True) -> List[dict]:
+        """获取商品的先进先出成本层（按入库顺序，open_only 时只返回未消耗完的层）"""
+        condition = "AND remaining > 0" if open_only else ""
+        rows = self.conn.execute(f'''
+        SELECT id, unit_cost, quantity, remaining, datetime(created_at, 'localtime')
+        FROM cost_layers
+        WHERE product_id = ? {condition}
+        ORDER BY id
+        ''', (product_id,)).fetchall()
+        return [
+            {'id': row[0], 'unit_cost': row[1], 'quantity': row[2], 'remaining': row[3], 'created_at': row[4]}
+            for row in rows
+        ]
+
     def process_inventory(self, product_id: int, type: str, 
                          quantity: int, price: Optional[float] = None, 
-                         remark: str = "") -> Tuple[bool, str]:
-        """处理出入库操作"""
+                         remark: str = "", warehouse_id: Optional[int] = None) -> Tuple[bool, str]:
+        """处理出入库操作（warehouse_id 为空时使用默认仓库）"""
+        _, _, results = self.process_inventory_batch(
+            [InventoryLine(product_id, type, quantity, price, remark, warehouse_id)]
+        )
+        return results[0]
+
+    def transfer_stock(self, product_id: int, from_warehouse_id: int, to_warehouse_id: int,
+                       quantity: int, remark: str = "") -> Tuple[bool, str]:
+        """在仓库间调拨库存（合计库存不变，不记入出入库记录和利润）"""
+        if quantity is None or quantity <= 0:
+            return False, "数量必须大于0"
+        if from_warehouse_id == to_warehouse_id:
+            return False, "调出和调入仓库不能相同"
+        try:
+            self.connections.run_with_retry(self._apply_transfer, product_id, from_warehouse_id,
+                                            to_warehouse_id, quantity, remark)
+            return True, "操作成功"
+        except ValueError as e:
+            return False, str(e)
+        except Exception as e:
+            return False, f"操作失败: {str(e)}"
+
+    def _apply_transfer(self, product_id: int, from_warehouse_id: int, to_warehouse_id: int,
+                        quantity: int, remark: str):
+        """在一个写事务中完成调拨"""
+        with self.transaction(immediate=True):
+            if not self.conn.execute("SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone():
+                raise ValueError("商品不存在")
+            valid_warehouses = warehouses.warehouse_ids(self.conn)
+            if from_warehouse_id not in valid_warehouses or to_warehouse_id not in valid_warehouses:
+                raise ValueError("仓库不存在")
+            warehouses.record_transfer(self.conn, product_id, from_warehouse_id, to_warehouse_id,
+                                       quantity, remark)
+
+    def get_warehouses(self) -> List[Warehouse]:
+        """获取全部仓库"""
+        return warehouses.list_warehouses(self.conn)
+
+    def add_warehouse(self, code: str, name: str) -> int:
+        """添加仓库（编码不能重复），返回仓库ID"""
+        code = code.strip()
+        if not code or not name.strip():
+            raise ValueError("仓库编码和名称不能为空")
+        try:
+            with self.transaction():
+                return self.conn.execute(
+                    "INSERT INTO warehouses (code, name) VALUES (?, ?)", (code, name.strip())
+                ).lastrowid
+        except sqlite3.IntegrityError:
+            raise ValueError(f"仓库编码 {code} 已存在")
+
+    def get_stock_level(self, product_id: int, warehouse_id: Optional[int] = None) -> int:
+        """商品在某个仓库的库存（warehouse_id 为空时为合计库存），一次主键查找"""
+        return warehouses.get_stock_level(self.conn, product_id, warehouse_id)
+
+    def get_product_stock(self, product_id: int) -> Dict[int, int]:
+        """商品在各仓库的库存: {仓库ID: 数量}"""
+        return warehouses.get_product_stock(self.conn, product_id)
+
+    def get_warehouse_stock(self, warehouse_id: int, limit: Optional[int] = None) -> List[dict]:
+        """某个仓库中有库存的商品（按商品名称排序）"""
+        return warehouses.get_warehouse_stock(self.conn, warehouse_id, limit)
+
+    def get_stock_rollup(self, product_ids: Optional[Iterable[int]] = None) -> List[dict]:
+        """各商品的合计库存及各仓库库存"""
+        return warehouses.get_stock_rollup(self.conn, product_ids)
+
+    def get_transfers(self, product_id: Optional[int] = None, limit: int = 100) -> List[dict]:
+        """最近的调拨记录"""
+        return warehouses.get_transfers(self.conn, product_id, limit)
+
+    def _load_product_states(self, product_ids: List[int]) -> Dict[int, dict]:
+        """一次查询加载批量操作涉及商品的库存与成本状态"""
+        states = {}
+        ids = list(dict.fromkeys(product_ids))
+        # 分块避免超过SQLite参数数量上限
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            placeholders = ', '.join('?' * len(chunk))
+            self.cursor.execute(f"""
+            SELECT id, quantity, price, avg_price, cost_total, cost_quantity, costing_method
+            FROM products
+            WHERE id IN ({placeholders})
+            """, chunk)
+            for row in self.cursor.fetchall():
+                states[row[0]] = {
+                    'quantity': row[1],
+                    'price': row[2],
+                    'avg_price': row[3],
+                    'cost_total': row[4],
+                    'cost_quantity': row[5],
+                    'costing_method': row[6],
+                    # 本次操作的累计变化量（按变化量相对更新商品表）
+                    'change': 0,
+                    'cost_change': 0.0,
+                    'cost_quantity_change': 0,
+                    'received': False,
+                }
+        return states
+
+    def process_inventory_batch(self, lines: List[Union[InventoryLine, Tuple]]
+                                ) -> Tuple[bool, str, List[Tuple[bool, str]]]:
+        """批量处理出入库操作（整单成功或整单失败）
+
+        lines 中每一项为 InventoryLine 或 (product_id, type, quantity, price, remark) 元组，
+        按顺序处理，后面的明细可使用前面入库的库存。
+        出库成本按商品的成本计算方式确定：加权平均取当前均价；先进先出按入库顺序消耗成本层，
+        整单涉及的成本层在内存中一次模拟，校验通过后批量写回。
+        返回 (是否成功, 提示信息, 每行的 (是否成功, 提示信息))。
+        """
+        if not lines:
+            return False, "没有出入库明细", []
+        
+        layers: Dict[int, FifoLayers] = {}
         try:
-            product = self.get_product(product_id)
-            if not product:
-                return False, "商品不存在"
+            # 按属性识别明细行：界面从 src 目录启动时导入的 InventoryLine 与本模块的不是同一个类
+            lines = [line if hasattr(line, 'product_id') else InventoryLine(*line) for line in lines]
+            return self.connections.run_with_retry(self._apply_inventory_batch, lines, layers)
+        except Exception as e:
+            message = f"操作失败: {str(e)}"
+            return False, message, [(False, message)] * len(lines)
+        finally:
+            for item in layers.values():
+                item.close()
+
+    def _apply_inventory_batch(self, lines: List[InventoryLine], layers: Dict[int, FifoLayers]
+                               ) -> Tuple[bool, str, List[Tuple[bool, str]]]:
+        """在一个写事务中处理出入库明细（数据库忙时由 run_with_retry 整体重新执行）"""
+        for item in layers.values():
+            item.close()
+        layers.clear()
+        # 先获取写锁再读取库存，避免并发写入相互覆盖
+        with self._write_transaction():
+            states = self._load_product_states([line.product_id for line in lines])
+            valid_warehouses = warehouses.warehouse_ids(self.conn)
+            stock = warehouses.load_stock(self.conn, states)
+            stock_changes: Dict[Tuple[int, int], int] = {}
             
-            if type == 'in':
-                new_quantity = product.quantity + quantity
-                if price is None:
-                    price = product.price
+            results = []
+            history_rows = []
+            record_rows = []
+            for line in lines:
+                state = states.get(line.product_id)
+                if not state:
+                    results.append((False, "商品不存在"))
+                    continue
+                if line.type not in ('in', 'out'):
+                    results.append((False, "无效的操作类型"))
+                    continue
+                if line.quantity is None or line.quantity <= 0:
+                    results.append((False, "数量必须大于0"))
+                    continue
+                warehouse_id = line.warehouse_id or warehouses.DEFAULT_WAREHOUSE_ID
+                if warehouse_id not in valid_warehouses:
+                    results.append((False, "仓库不存在"))
+                    continue
+                location = (line.product_id, warehouse_id)
                 
-                # 记录新价格历史
-                self.cursor.execute('''
-                INSERT INTO price_history (product_id, price, quantity)
-                VALUES (?, ?, ?)
-                ''', (product_id, price, quantity))
-                
-                # 更新平均价格
-                avg_price = self.calculate_average_price(product_id)
-                
-                # 更新商品信息
-                self.cursor.execute('''
-                UPDATE products 
-                SET quantity = ?, 
-                    price = ?,
-                    avg_price = ?,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-                ''', (new_quantity, price, avg_price, product_id))
-                
-            elif type == 'out':
-                new_quantity = product.quantity - quantity
-                if new_quantity < 0:
-                    return False, "库存不足"
-                
-                if price is None:
-                    return False, "出库时必须指定售价"
-                
-                # 更新商品数量
-                self.cursor.execute('''
-                UPDATE products 
-                SET quantity = ?,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-                ''', (new_quantity, product_id))
-            else:
-                return False, "无效的操作类型"
+                if line.type == 'in':
+                    price = line.price if line.price is not None else state['price']
+                    state['quantity'] += line.quantity
+                    state['price'] = price
+                    state['cost_total'] += price * line.quantity
+                    state['cost_quantity'] += line.quantity
+                    state['change'] += line.quantity
+                    state['cost_change'] += price * line.quantity
+                    state['cost_quantity_change'] += line.quantity
+                    state['received'] = True
+                    state['avg_price'] = (
+                        round(state['cost_total'] / state['cost_quantity'], 1)
+                        if state['cost_quantity'] else 0.0
+                    )
+                    stock[location] = stock.get(location, 0) + line.quantity
+                    stock_changes[location] = stock_changes.get(location, 0) + line.quantity
+                    history_rows.append((line.product_id, price, line.quantity))
+                    record_rows.append((
+                        line.product_id, 'in', line.quantity, price, None, line.remark, warehouse_id
+                    ))
+                    if state['costing_method'] == 'fifo':
+                        self._fifo_layers(layers, line.product_id).add(price, line.quantity)
+                else:
+                    if state['quantity'] - line.quantity < 0:
+                        results.append((False, "库存不足"))
+                        continue
+                    if stock.get(location, 0) - line.quantity < 0:
+                        results.append((False, "该仓库库存不足"))
+                        continue
+                    if line.price is None:
+                        results.append((False, "出库时必须指定售价"))
+                        continue
+                    state['quantity'] -= line.quantity
+                    state['change'] -= line.quantity
+                    stock[location] -= line.quantity
+                    stock_changes[location] = stock_changes.get(location, 0) - line.quantity
+                    cost_price = state['avg_price']
+                    if state['costing_method'] == 'fifo':
+                        cost = self._fifo_layers(layers, line.product_id).consume(
+                            line.quantity, state['avg_price']
+                        )
+                        # 保存不舍入的单位成本，成本合计与消耗的成本层一致（显示时再舍入）
+                        cost_price = cost / line.quantity
+                    record_rows.append((
+                        line.product_id, 'out', line.quantity, line.price, cost_price, line.remark,
+                        warehouse_id
+                    ))
+                results.append((True, "操作成功"))
+            
+            failed = [(index, message) for index, (ok, message) in enumerate(results) if not ok]
+            if failed:
+                # 整单未提交，通过校验的明细也不生效
+                results = [(ok, message if not ok else "校验通过（整单未提交）") for ok, message in results]
+                index, message = failed[0]
+                if len(lines) == 1:
+                    return False, message, results
+                return False, f"第{index + 1}行: {message}", results
+            
+            # 记录价格历史
+            self.cursor.executemany('''
+            INSERT INTO price_history (product_id, price, quantity, guid)
+            VALUES (?, ?, ?, lower(hex(randomblob(16))))
+            ''', history_rows)
+            
+            # 按变化量更新商品库存及成本汇总，并要求更新后库存不为负（防止超卖）；
+            # 价格和均价只在有入库时更新
+            touched = dict.fromkeys(line.product_id for line in lines)
+            updates = []
+            for product_id in touched:
+                state = states[product_id]
+                received = state['received']
+                updates.append((
+                    state['change'],
+                    state['price'] if received else None,
+                    state['avg_price'] if received else None,
+                    state['cost_change'],
+                    state['cost_quantity_change'],
+                    product_id,
+                    state['change']
+                ))
+            self.cursor.executemany('''
+            UPDATE products 
+            SET quantity = quantity + ?,
+                price = COALESCE(?, price),
+                avg_price = COALESCE(?, avg_price),
+                cost_total = cost_total + ?,
+                cost_quantity = cost_quantity + ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND quantity + ? >= 0
+            ''', updates)
+            if self.cursor.rowcount != len(touched):
+                # 回滚整单
+                raise Exception("库存不足（库存已被其他操作修改）")
+            
+            # 按变化量更新各仓库库存
+            for (product_id, warehouse_id), change in stock_changes.items():
+                warehouses.change_stock(self.conn, product_id, warehouse_id, change)
+            
+            # 写回先进先出成本层
+            if layers:
+                write_layers(self.cursor, list(layers.values()))
             
             # 记录出入库信息
-            self.cursor.execute('''
+            self.cursor.executemany('''
             INSERT INTO inventory_records 
-                (product_id, type, quantity, price, cost_price, remark, created_at)
+                (product_id, type, quantity, price, cost_price, remark, warehouse_id, created_at, guid)
             VALUES 
-                (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
-            ''', (
-                product_id,
-                type,
-                quantity,
-                price,
-                product.avg_price if type == 'out' else None,
-                remark
-            ))
-            
-            self.conn.commit()
-            return True, "操作成功"
-            
+                (?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), lower(hex(randomblob(16))))
+            ''', record_rows)
+
+            # 在写锁内直写缓存
+            now = datetime.now().replace(microsecond=0)
+            for product_id in touched:
+                cached = self.product_cache.peek(product_id)
+                if cached is not None:
+                    state = states[product_id]
+                    self.product_cache.put(cached.replace(
+                        quantity=state['quantity'],
+                        price=state['price'],
+                        avg_price=state['avg_price'],
+                        updated_at=now
+                    ))
+        return True, "操作成功", results
+
+    def _fifo_layers(self, layers: Dict[int, FifoLayers], product_id: int) -> FifoLayers:
+        """获取批量操作中商品的成本层（每个商品只查询一次）"""
+        item = layers.get(product_id)
+        if item is None:
+            item = layers[product_id] = FifoLayers(self.conn, product_id)
+        return item
+
+    def process_inventory_group(self, batches: List[List[Union[InventoryLine, Tuple]]]
+                                ) -> List[Tuple[bool, str, List[Tuple[bool, str]]]]:
+        """在一个事务中处理多张互不相关的出入库单（每张单据各自成功或失败）
+
+        并发写入较多时合并提交，减少事务和磁盘同步次数；每张单据使用保存点，
+        失败的单据回滚到保存点，不影响同组其他单据。
+        返回每张单据的 process_inventory_batch 结果。
+        """
+        try:
+            return self.connections.run_with_retry(self._apply_inventory_group, batches)
         except Exception as e:
-            self.conn.rollback()
-            return False, f"操作失败: {str(e)}"
+            # 整组已回滚，单据处理时直写的缓存不再可靠
+            self.product_cache.clear()
+            message = f"操作失败: {str(e)}"
+            return [(False, message, [(False, message)] * len(lines)) for lines in batches]
+
+    def _apply_inventory_group(self, batches: List[List[Union[InventoryLine, Tuple]]]
+                               ) -> List[Tuple[bool, str, List[Tuple[bool, str]]]]:
+        """在一个写事务中依次处理各张单据"""
+        results = []
+        with self._write_transaction() as conn:
+            for lines in batches:
+                conn.execute("SAVEPOINT inventory_group_item")
+                result = self.process_inventory_batch(lines)
+                if not result[0]:
+                    conn.execute("ROLLBACK TO inventory_group_item")
+                conn.execute("RELEASE inventory_group_item")
+                results.append(result)
+        return results
+
+    def get_report_totals(self) -> ProfitSummary:
+        """获取全部历史的利润合计（读取汇总表，常数时间）"""
+        return reporting.get_totals(self.conn)
+
+    def get_profit_report(self, period: str = 'day',
+                          start: Optional[Union[datetime, str]] = None,
+                          end: Optional[Union[datetime, str]] = None,
+                          product_id: Optional[int] = None,
+                          by_product: bool = False) -> List[ProfitSummary]:
+        """按日/周/月/年统计销售额、销售成本、毛利及出入库数量"""
+        return reporting.get_summary(self.conn, period, start, end, product_id, by_product)
+
+    def get_turnover_report(self, start: Optional[Union[datetime, str]] = None,
+                            end: Optional[Union[datetime, str]] = None) -> List[dict]:
+        """按商品统计期间出入库数量及库存周转率"""
+        return reporting.get_turnover(self.conn, start, end)
+
+    def get_stock_as_of(self, as_of: Union[date, datetime, str],
+                        product_id: Optional[int] = None) -> List[dict]:
+        """查询某一时刻之前各商品的库存数量、均价和金额（从最近的快照开始应用其后的库存流水）"""
+        return stock_history.get_stock_as_of(self.conn, as_of, product_id)
+
+    def get_valuation_report(self, start: Optional[Union[date, datetime, str]] = None,
+                             end: Optional[Union[date, datetime, str]] = None,
+                             create_snapshots: bool = True) -> List[dict]:
+        """按月统计月末库存数量和金额（create_snapshots 时先补齐缺少的月末快照）"""
+        if create_snapshots:
+            self.create_month_end_snapshots()
+        return stock_history.get_valuation_report(self.conn, start, end)
+
+    def create_month_end_snapshots(self) -> int:
+        """补齐到本月为止缺少的月末库存快照，返回新建的快照数"""
+        try:
+            with self.transaction(immediate=True):
+                return stock_history.create_month_end_snapshots(self.conn)
+        except Exception as e:
+            raise Exception(f"创建库存快照失败: {str(e)}")
+
+    def archive_records(self, before: Union[date, datetime, str], vacuum: bool = False) -> dict:
+        """把 before 之前的出入库记录和价格历史按年份移入归档文件（利润报表不受影响）"""
+        try:
+            return self.archives.archive(self.conn, before, vacuum)
+        except Exception as e:
+            raise Exception(f"归档记录失败: {str(e)}")
+
+    def list_archives(self) -> List[dict]:
+        """归档文件清单"""
+        return self.archives.list_archives(self.conn)
+
+    def get_node_id(self) -> str:
+        """本数据库的同步节点ID"""
+        return sync.get_node_id(self.conn)
+
+    def get_sync_peers(self) -> List[dict]:
+        """已导入过变化的节点及已导入到的变化序号"""
+        return sync.get_peers(self.conn)
+
+    def export_changes(self, since: int = 0, path: Optional[str] = None,
+                       exclude_origin: Optional[str] = None) -> dict:
+        """导出变化序号大于 since 的全部变化（path 不为空时同时写入压缩文件）"""
+        try:
+            with self.transaction():
+                if not self.conn.in_transaction:
+                    # 在一个读事务中导出，各表数据为同一时刻的快照
+                    self.conn.execute("BEGIN")
+                bundle = sync.export_changes(self.conn, since, exclude_origin)
+        except Exception as e:
+            raise Exception(f"导出变化失败: {str(e)}")
+        if path is not None:
+            sync.write_bundle(bundle, path)
+        return bundle
+
+    def import_changes(self, bundle: Union[dict, str]) -> dict:
+        """导入变化包（字典或文件路径），在一个写事务中合并，重复导入不会产生重复数据"""
+        if isinstance(bundle, str):
+            bundle = sync.read_bundle(bundle)
+        try:
+            report = self.connections.run_with_retry(self._apply_changes, bundle)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"导入变化失败: {str(e)}")
+        self.product_cache.clear()
+        return report
+
+    def _apply_changes(self, bundle: dict) -> dict:
+        """在一个写事务中合并变化包"""
+        with self.transaction(immediate=True):
+            return sync.import_changes(self.conn, bundle)
 
     def delete_product(self, id: int) -> bool:
         """删除商品"""
-        self.cursor.execute("DELETE FROM products WHERE id = ?", (id,))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        return self.connections.run_with_retry(self._apply_delete_product, id)
+
+    def _apply_delete_product(self, id: int) -> bool:
+        """在一个写事务中删除商品"""
+        with self._write_transaction():
+            self.cursor.execute("DELETE FROM products WHERE id = ?", (id,))
+            self.product_cache.discard(id)
+            return self.cursor.rowcount > 0
+
+    def cache_stats(self) -> dict:
+        """商品缓存统计（命中、未命中、失效次数等）"""
+        return self.product_cache.stats()
+
+    def enable_instrumentation(self, slow_ms: Optional[float] = None,
+                               slow_log_path: Optional[str] = None) -> 'Instrumentation':
+        """开启性能监测：记录各方法和 SQL 语句的耗时直方图、影响行数、锁等待时间，
+        超过 slow_ms 毫秒的操作写入慢查询日志；统计数据通过返回对象的 snapshot()/export() 获取
+        """
+        from .instrumentation import Instrumentation
+        self.instrumentation = Instrumentation.shared(self.connections)
+        self.instrumentation.configure(slow_ms, slow_log_path)
+        self.instrumentation.attach(self)
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        """关闭性能监测（已有统计数据保留）"""
+        if self.instrumentation is not None:
+            self.instrumentation.detach(self)
 
-    def __del__(self):
-        """析构函数，关闭数据库连接"""
-        self.conn.close() 
\ No newline at end of file
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        self.connections.close()
+ 
\ No newline at end of file
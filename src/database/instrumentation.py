@@ -0,0 +1,268 @@
+"""
+性能监测模块
+
+按需开启：开启后包装 DatabaseManager 的公开方法统计耗时，并通过 set_trace_callback 跟踪每条 SQL 语句；
+未开启时不安装任何包装和回调，没有额外开销。
+
+SQL 语句的耗时按“从该语句开始到同一线程下一条语句开始（或所在方法结束）”计算，包含读取结果的时间；
+锁等待时间为 BEGIN IMMEDIATE/EXCLUSIVE 语句的耗时（等待写锁）。
+"""
+import bisect
+import functools
+import inspect
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+# 直方图桶上限（毫秒），最后一个桶为超过最大上限的部分
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# 不统计的方法
+EXCLUDED_METHODS = {
+    'transaction', 'close', 'create_tables', 'row_to_product', 'row_to_inventory_record',
+    'enable_instrumentation', 'disable_instrumentation', 'cache_stats',
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+def normalize_sql(sql: str) -> str:
+    """把语句中的常量替换为 ?，同类语句归为一组"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()[:300]
+
+class LatencyHistogram:
+    """耗时直方图（对数分桶，分位数为所在桶的上限）"""
+    __slots__ = ('counts', 'count', 'total', 'max', 'rows')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, elapsed_ms: float, rows: Optional[int] = None):
+        """记录一次耗时"""
+        self.counts[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total += elapsed_ms
+        if elapsed_ms > self.max:
+            self.max = elapsed_ms
+        if rows:
+            self.rows += rows
+
+    def percentile(self, fraction: float) -> float:
+        """估算分位数（毫秒）"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                value = min(BUCKETS_MS[index], self.max) if index < len(BUCKETS_MS) else self.max
+                return round(value, 3)
+        return round(self.max, 3)
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max, 3),
+            'rows': self.rows,
+            'buckets': {
+                (f"<={bound}" if index < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}"): count
+                for index, (bound, count) in enumerate(zip(BUCKETS_MS + (None,), self.counts))
+                if count
+            },
+        }
+
+class Instrumentation:
+    """性能监测类（同一数据库文件共用一个实例）"""
+    _shared: Dict[object, 'Instrumentation'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, connections, slow_ms: float = 100.0, slow_log_path: Optional[str] = None,
+                 slow_log_size: int = 200):
+        self.connections = connections
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+        self.methods: Dict[str, LatencyHistogram] = {}
+        self.statements: Dict[str, LatencyHistogram] = {}
+        self.lock_wait = LatencyHistogram()
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.since = datetime.now()
+        self._attached: Dict[int, tuple] = {}  # id(db) -> (db, 被包装的方法名)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def shared(cls, connections) -> 'Instrumentation':
+        """获取与连接管理器关联的监测实例"""
+        with cls._shared_lock:
+            instrumentation = cls._shared.get(connections)
+            if instrumentation is None:
+                instrumentation = cls(connections)
+                cls._shared[connections] = instrumentation
+            return instrumentation
+
+    @property
+    def enabled(self) -> bool:
+        """是否已开启"""
+        return bool(self._attached)
+
+    def configure(self, slow_ms: Optional[float] = None, slow_log_path: Optional[str] = None):
+        """设置慢查询阈值（毫秒）和慢查询日志文件（每行一个 JSON）"""
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        if slow_log_path is not None:
+            self.slow_log_path = slow_log_path
+
+    def attach(self, db):
+        """开始监测：包装 db 的公开方法，并跟踪所有连接的 SQL 语句"""
+        if id(db) in self._attached:
+            return
+        names = []
+        for name, func in inspect.getmembers(type(db), inspect.isfunction):
+            if name.startswith('_') or name in EXCLUDED_METHODS or inspect.isgeneratorfunction(func):
+                continue
+            setattr(db, name, self._wrap(name, getattr(db, name)))
+            names.append(name)
+        first = not self._attached
+        self._attached[id(db)] = (db, names)
+        if first:
+            self.connections.add_connect_hook(self._install_trace)
+
+    def detach(self, db):
+        """停止监测 db：移除方法包装；没有监测中的实例时移除 SQL 跟踪"""
+        attached = self._attached.pop(id(db), None)
+        if attached is None:
+            return
+        for name in attached[1]:
+            db.__dict__.pop(name, None)
+        if not self._attached:
+            self.connections.remove_connect_hook(self._install_trace)
+            for conn in self.connections.all_connections():
+                conn.set_trace_callback(None)
+
+    def reset(self):
+        """清空统计数据"""
+        with self._lock:
+            self.methods.clear()
+            self.statements.clear()
+            self.lock_wait = LatencyHistogram()
+            self.slow_queries.clear()
+            self.since = datetime.now()
+
+    def _wrap(self, name: str, method):
+        """包装一个方法，记录耗时和返回的行数"""
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = None
+            try:
+                result = method(*args, **kwargs)
+                return result
+            finally:
+                self._finish_statement()
+                elapsed = (time.perf_counter() - started) * 1000
+                rows = len(result) if isinstance(result, list) else None
+                self._record(self.methods, name, elapsed, rows, 'method')
+        return wrapper
+
+    def _install_trace(self, conn: sqlite3.Connection):
+        """为连接安装语句跟踪回调"""
+        conn.set_trace_callback(lambda sql: self._on_statement(conn, sql))
+
+    def _on_statement(self, conn: sqlite3.Connection, sql: str):
+        """语句开始执行：结束同一线程的上一条语句并开始计时"""
+        current = getattr(self._local, 'current', None)
+        if current is not None and current[2] is conn and current[0] == sql:
+            # 触发器中的语句以所属语句的文本回调，计入所属语句
+            return
+        self._finish_statement()
+        self._local.current = (sql, time.perf_counter(), conn, conn.total_changes)
+
+    def _finish_statement(self):
+        """结束当前线程正在计时的语句"""
+        current = getattr(self._local, 'current', None)
+        if current is None:
+            return
+        self._local.current = None
+        sql, started, conn, changes = current
+        elapsed = (time.perf_counter() - started) * 1000
+        # 影响行数包含触发器修改的行
+        rows = conn.total_changes - changes
+        key = normalize_sql(sql)
+        self._record(self.statements, key, elapsed, rows, 'statement', sql)
+        if key.upper().startswith(('BEGIN IMMEDIATE', 'BEGIN EXCLUSIVE')):
+            with self._lock:
+                self.lock_wait.add(elapsed)
+
+    def _record(self, histograms: Dict[str, LatencyHistogram], key: str, elapsed: float,
+                rows: Optional[int], kind: str, sql: Optional[str] = None):
+        """记录耗时，超过阈值时写入慢查询日志"""
+        with self._lock:
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = LatencyHistogram()
+            histogram.add(elapsed, rows)
+        if elapsed >= self.slow_ms:
+            self._log_slow(kind, key, elapsed, rows, sql)
+
+    def _log_slow(self, kind: str, name: str, elapsed: float, rows: Optional[int], sql: Optional[str]):
+        """记录慢查询"""
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'kind': kind,
+            'name': name,
+            'elapsed_ms': round(elapsed, 3),
+            'rows': rows,
+            'thread': threading.current_thread().name,
+        }
+        if sql is not None:
+            entry['sql'] = sql[:2000]
+        with self._lock:
+            self.slow_queries.append(entry)
+            if self.slow_log_path:
+                try:
+                    with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                except OSError:
+                    pass
+
+    def snapshot(self, statement_limit: int = 50) -> dict:
+        """获取当前统计数据（语句按累计耗时排序，最多 statement_limit 条）"""
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)
+            return {
+                'enabled': self.enabled,
+                'since': self.since.isoformat(timespec='seconds'),
+                'slow_ms': self.slow_ms,
+                'methods': {name: histogram.to_dict() for name, histogram in sorted(self.methods.items())},
+                'statements': [
+                    dict(sql=sql, **histogram.to_dict()) for sql, histogram in statements[:statement_limit]
+                ],
+                'lock_wait': self.lock_wait.to_dict(),
+                'slow_queries': list(self.slow_queries),
+            }
+
+    def export(self, file_path: str, statement_limit: int = 500):
+        """把统计数据导出为 JSON 文件"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(statement_limit), f, ensure_ascii=False, indent=2)
\ No newline at end of file
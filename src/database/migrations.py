@@ -0,0 +1,800 @@
+"""
+数据库迁移模块
+
+使用 PRAGMA user_version 记录结构版本，按顺序执行未应用的迁移。
+"""
+import sqlite3
+from typing import Callable, List
+
+
+def _create_base_tables(cursor: sqlite3.Cursor):
+    """版本1：创建基础表"""
+    # 创建商品表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        price REAL NOT NULL DEFAULT 0,
+        avg_price REAL NOT NULL DEFAULT 0,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # 创建出入库记录表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS inventory_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        price REAL,
+        cost_price REAL,
+        remark TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+
+    # 创建价格历史表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS price_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        price REAL NOT NULL,
+        quantity INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+
+
+def _add_cost_aggregates(cursor: sqlite3.Cursor):
+    """版本2：商品表增加成本汇总字段，并从价格历史回填"""
+    columns = _table_columns(cursor, 'products')
+    if 'cost_total' in columns and 'cost_quantity' in columns:
+        # 已由旧版本程序添加并回填
+        return
+
+    if 'cost_total' not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN cost_total REAL NOT NULL DEFAULT 0")
+    if 'cost_quantity' not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN cost_quantity INTEGER NOT NULL DEFAULT 0")
+
+    cursor.execute('''
+    UPDATE products
+    SET cost_total = COALESCE((
+            SELECT SUM(h.price * h.quantity) FROM price_history h
+            WHERE h.product_id = products.id
+        ), 0),
+        cost_quantity = COALESCE((
+            SELECT SUM(h.quantity) FROM price_history h
+            WHERE h.product_id = products.id
+        ), 0)
+    ''')
+
+
+def _add_query_indexes(cursor: sqlite3.Cursor):
+    """版本3：为常用查询路径创建索引"""
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_inventory_records_product_created
+    ON inventory_records (product_id, created_at)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_price_history_product
+    ON price_history (product_id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_products_name
+    ON products (name)
+    ''')
+
+
+def _add_record_time_indexes(cursor: sqlite3.Cursor):
+    """版本4：为出入库记录按时间、按类型+时间的分页查询创建索引"""
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_inventory_records_created
+    ON inventory_records (created_at)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_inventory_records_type_created
+    ON inventory_records (type, created_at)
+    ''')
+
+
+def _add_summary_tables(cursor: sqlite3.Cursor):
+    """版本5：创建按日、按商品汇总的统计表，由触发器随出入库记录增量更新"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS daily_summary (
+        day TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        units_in INTEGER NOT NULL DEFAULT 0,
+        units_out INTEGER NOT NULL DEFAULT 0,
+        purchase_amount REAL NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        cogs REAL NOT NULL DEFAULT 0,
+        profit REAL NOT NULL DEFAULT 0,
+        record_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_daily_summary_product
+    ON daily_summary (product_id, day)
+    ''')
+
+    # 全部历史的合计（单行），统计窗口读取总计为常数时间
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS summary_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        units_in INTEGER NOT NULL DEFAULT 0,
+        units_out INTEGER NOT NULL DEFAULT 0,
+        purchase_amount REAL NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        cogs REAL NOT NULL DEFAULT 0,
+        profit REAL NOT NULL DEFAULT 0,
+        record_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+
+    # 只在插入记录时累加；归档等删除操作不影响统计结果
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_records_summary
+    AFTER INSERT ON inventory_records
+    BEGIN
+        INSERT INTO daily_summary (
+            day, product_id, units_in, units_out, purchase_amount, revenue, cogs, profit, record_count
+        )
+        VALUES (
+            date(NEW.created_at),
+            NEW.product_id,
+            CASE WHEN NEW.type = 'in' THEN NEW.quantity ELSE 0 END,
+            CASE WHEN NEW.type = 'out' THEN NEW.quantity ELSE 0 END,
+            CASE WHEN NEW.type = 'in' THEN COALESCE(NEW.price * NEW.quantity, 0) ELSE 0 END,
+            CASE WHEN NEW.type = 'out' THEN COALESCE(NEW.price * NEW.quantity, 0) ELSE 0 END,
+            CASE WHEN NEW.type = 'out' THEN COALESCE(NEW.cost_price * NEW.quantity, 0) ELSE 0 END,
+            CASE WHEN NEW.type = 'out' THEN COALESCE((NEW.price - NEW.cost_price) * NEW.quantity, 0) ELSE 0 END,
+            1
+        )
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            units_in = units_in + excluded.units_in,
+            units_out = units_out + excluded.units_out,
+            purchase_amount = purchase_amount + excluded.purchase_amount,
+            revenue = revenue + excluded.revenue,
+            cogs = cogs + excluded.cogs,
+            profit = profit + excluded.profit,
+            record_count = record_count + excluded.record_count;
+
+        UPDATE summary_totals SET
+            units_in = units_in + CASE WHEN NEW.type = 'in' THEN NEW.quantity ELSE 0 END,
+            units_out = units_out + CASE WHEN NEW.type = 'out' THEN NEW.quantity ELSE 0 END,
+            purchase_amount = purchase_amount
+                + CASE WHEN NEW.type = 'in' THEN COALESCE(NEW.price * NEW.quantity, 0) ELSE 0 END,
+            revenue = revenue
+                + CASE WHEN NEW.type = 'out' THEN COALESCE(NEW.price * NEW.quantity, 0) ELSE 0 END,
+            cogs = cogs
+                + CASE WHEN NEW.type = 'out' THEN COALESCE(NEW.cost_price * NEW.quantity, 0) ELSE 0 END,
+            profit = profit
+                + CASE WHEN NEW.type = 'out' THEN COALESCE((NEW.price - NEW.cost_price) * NEW.quantity, 0) ELSE 0 END,
+            record_count = record_count + 1
+        WHERE id = 1;
+    END
+    ''')
+
+    # 回填已有记录
+    cursor.execute("DELETE FROM daily_summary")
+    cursor.execute('''
+    INSERT INTO daily_summary (
+        day, product_id, units_in, units_out, purchase_amount, revenue, cogs, profit, record_count
+    )
+    SELECT
+        date(created_at),
+        product_id,
+        SUM(CASE WHEN type = 'in' THEN quantity ELSE 0 END),
+        SUM(CASE WHEN type = 'out' THEN quantity ELSE 0 END),
+        SUM(CASE WHEN type = 'in' THEN COALESCE(price * quantity, 0) ELSE 0 END),
+        SUM(CASE WHEN type = 'out' THEN COALESCE(price * quantity, 0) ELSE 0 END),
+        SUM(CASE WHEN type = 'out' THEN COALESCE(cost_price * quantity, 0) ELSE 0 END),
+        SUM(CASE WHEN type = 'out' THEN COALESCE((price - cost_price) * quantity, 0) ELSE 0 END),
+        COUNT(*)
+    FROM inventory_records
+    GROUP BY date(created_at), product_id
+    ''')
+    cursor.execute("DELETE FROM summary_totals")
+    cursor.execute('''
+    INSERT INTO summary_totals (
+        id, units_in, units_out, purchase_amount, revenue, cogs, profit, record_count
+    )
+    SELECT
+        1,
+        COALESCE(SUM(units_in), 0),
+        COALESCE(SUM(units_out), 0),
+        COALESCE(SUM(purchase_amount), 0),
+        COALESCE(SUM(revenue), 0),
+        COALESCE(SUM(cogs), 0),
+        COALESCE(SUM(profit), 0),
+        COALESCE(SUM(record_count), 0)
+    FROM daily_summary
+    ''')
+
+
+def _add_product_search_index(cursor: sqlite3.Cursor):
+    """版本6：创建商品名称、描述的 FTS5 全文索引（trigram 分词，支持中文子串）
+
+    当前 SQLite 不支持 FTS5 或 trigram 分词时跳过，搜索回退到 LIKE。
+    """
+    try:
+        cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, description,
+            content='products', content_rowid='id',
+            tokenize='trigram'
+        )
+        ''')
+    except sqlite3.OperationalError:
+        return
+
+    # 触发器保持索引与商品表同步
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO products_fts (rowid, name, description)
+        VALUES (NEW.id, NEW.name, NEW.description);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete
+    AFTER DELETE ON products
+    BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description)
+        VALUES ('delete', OLD.id, OLD.name, OLD.description);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_update
+    AFTER UPDATE OF name, description ON products
+    BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description)
+        VALUES ('delete', OLD.id, OLD.name, OLD.description);
+        INSERT INTO products_fts (rowid, name, description)
+        VALUES (NEW.id, NEW.name, NEW.description);
+    END
+    ''')
+
+    # 为已有商品建立索引
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def _add_cost_layers(cursor: sqlite3.Cursor):
+    """版本7：增加商品成本计算方式和先进先出成本层
+
+    已有商品均为加权平均，不需要生成成本层；切换为先进先出时以当前库存和均价建立期初成本层。
+    """
+    if 'costing_method' not in _table_columns(cursor, 'products'):
+        cursor.execute('''
+        ALTER TABLE products
+        ADD COLUMN costing_method TEXT NOT NULL DEFAULT 'average'
+            CHECK (costing_method IN ('average', 'fifo'))
+        ''')
+
+    # 每次入库形成一个成本层，出库按 id 顺序消耗 remaining
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cost_layers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        unit_cost REAL NOT NULL,
+        quantity INTEGER NOT NULL,
+        remaining INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+
+    # 部分索引只包含未消耗完的成本层，出库时直接定位最早的可用层，不随历史层数增长
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_cost_layers_open
+    ON cost_layers (product_id, id)
+    WHERE remaining > 0
+    ''')
+
+
+def _add_stock_movements(cursor: sqlite3.Cursor):
+    """版本8：创建库存变动流水和库存快照表
+
+    商品表上的触发器把每次库存数量或均价的变化记入流水（时间为本地时间，与出入库记录一致）；
+    快照保存某一时刻每个商品的库存和均价，历史时点查询从最近的快照开始只应用其后的流水。
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stock_movements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        change INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_cost REAL NOT NULL DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_stock_movements_time
+    ON stock_movements (created_at)
+    ''')
+
+    # 快照：taken_at 之前的流水都已包含在内，last_movement_id 为其中最大的流水ID
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stock_snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        taken_at TIMESTAMP NOT NULL UNIQUE,
+        last_movement_id INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stock_snapshot_items (
+        snapshot_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_cost REAL NOT NULL,
+        PRIMARY KEY (snapshot_id, product_id)
+    ) WITHOUT ROWID
+    ''')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_movement_insert
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+        VALUES (NEW.id, NEW.quantity, NEW.quantity, NEW.avg_price);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_movement_update
+    AFTER UPDATE OF quantity, avg_price ON products
+    WHEN NEW.quantity IS NOT OLD.quantity OR NEW.avg_price IS NOT OLD.avg_price
+    BEGIN
+        INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+        VALUES (NEW.id, NEW.quantity - OLD.quantity, NEW.quantity, NEW.avg_price);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_movement_delete
+    AFTER DELETE ON products
+    BEGIN
+        INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+        VALUES (OLD.id, -OLD.quantity, 0, OLD.avg_price);
+    END
+    ''')
+
+    # 回填已有数据：由当前库存倒推各商品的期初库存，再按出入库记录依次累加；
+    # 手工修改过的数量无从得知，计入期初库存。均价按当前均价估算，流水ID按时间顺序分配
+    cursor.execute('''
+    INSERT INTO stock_movements (product_id, change, quantity, unit_cost, created_at)
+    WITH changes AS (
+        SELECT r.product_id, r.id AS record_id, r.created_at,
+               CASE WHEN r.type = 'in' THEN r.quantity ELSE -r.quantity END AS change
+        FROM inventory_records r
+        JOIN products p ON p.id = r.product_id
+    ),
+    openings AS (
+        SELECT p.id AS product_id, p.quantity - COALESCE(SUM(c.change), 0) AS quantity,
+               p.avg_price, datetime(p.created_at, 'localtime') AS created_at
+        FROM products p
+        LEFT JOIN changes c ON c.product_id = p.id
+        GROUP BY p.id
+    )
+    SELECT product_id, change, quantity, unit_cost, created_at
+    FROM (
+        SELECT o.product_id, o.quantity AS change, o.quantity, o.avg_price AS unit_cost,
+               MIN(o.created_at, COALESCE(first.created_at, o.created_at)) AS created_at,
+               0 AS record_id
+        FROM openings o
+        LEFT JOIN (
+            SELECT product_id, MIN(created_at) AS created_at FROM changes GROUP BY product_id
+        ) first ON first.product_id = o.product_id
+        UNION ALL
+        SELECT c.product_id, c.change,
+               o.quantity + SUM(c.change) OVER (
+                   PARTITION BY c.product_id ORDER BY c.created_at, c.record_id
+               ),
+               o.avg_price, c.created_at, c.record_id
+        FROM changes c
+        JOIN openings o ON o.product_id = c.product_id
+    )
+    ORDER BY created_at, record_id
+    ''')
+
+
+def _add_archive_manifest(cursor: sqlite3.Cursor):
+    """版本9：创建归档清单表
+
+    早于归档截止时间的出入库记录和价格历史按年份移入独立的归档数据库文件，
+    清单记录每个归档文件的路径、时间范围和记录数，查询时据此决定是否需要附加归档文件。
+    汇总表只在插入记录时更新，移出记录不影响利润报表。
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS record_archives (
+        year INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        first_at TIMESTAMP,
+        last_at TIMESTAMP,
+        record_count INTEGER NOT NULL DEFAULT 0,
+        history_count INTEGER NOT NULL DEFAULT 0,
+        archived_before TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def _add_product_barcode(cursor: sqlite3.Cursor):
+    """版本10：商品表增加条码/SKU字段及唯一索引（未设置条码的商品不占用索引）"""
+    if 'barcode' not in _table_columns(cursor, 'products'):
+        cursor.execute("ALTER TABLE products ADD COLUMN barcode TEXT")
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_products_barcode
+    ON products (barcode)
+    WHERE barcode IS NOT NULL
+    ''')
+
+
+def _add_warehouses(cursor: sqlite3.Cursor):
+    """版本11：多仓库库存
+
+    warehouse_stock 按 (商品, 仓库) 保存库存，products.quantity 为各仓库合计，由出入库在同一事务中维护；
+    出入库记录增加仓库字段，仓库间调拨记入 stock_transfers（不影响合计库存和利润）。
+    已有库存和记录全部归入默认仓库（ID为1）。
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS warehouses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        code TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO warehouses (id, code, name) VALUES (1, 'MAIN', '默认仓库')")
+
+    # 主键即 (商品, 仓库) 查询的索引，单个商品/仓库的库存读取为一次索引查找
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS warehouse_stock (
+        product_id INTEGER NOT NULL,
+        warehouse_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 0 CHECK (quantity >= 0),
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (product_id, warehouse_id),
+        FOREIGN KEY (product_id) REFERENCES products (id),
+        FOREIGN KEY (warehouse_id) REFERENCES warehouses (id)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_warehouse_stock_warehouse
+    ON warehouse_stock (warehouse_id, product_id)
+    ''')
+    cursor.execute('''
+    INSERT OR IGNORE INTO warehouse_stock (product_id, warehouse_id, quantity)
+    SELECT id, 1, quantity FROM products WHERE quantity > 0
+    ''')
+
+    # 新商品的初始库存计入默认仓库，删除商品时删除各仓库库存
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_stock_insert
+    AFTER INSERT ON products
+    WHEN NEW.quantity > 0
+    BEGIN
+        INSERT INTO warehouse_stock (product_id, warehouse_id, quantity)
+        VALUES (NEW.id, 1, NEW.quantity);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_stock_delete
+    AFTER DELETE ON products
+    BEGIN
+        DELETE FROM warehouse_stock WHERE product_id = OLD.id;
+    END
+    ''')
+
+    if 'warehouse_id' not in _table_columns(cursor, 'inventory_records'):
+        cursor.execute(
+            "ALTER TABLE inventory_records ADD COLUMN warehouse_id INTEGER NOT NULL DEFAULT 1"
+        )
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_inventory_records_warehouse_created
+    ON inventory_records (warehouse_id, created_at)
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stock_transfers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        from_warehouse_id INTEGER NOT NULL,
+        to_warehouse_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        remark TEXT,
+        created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_stock_transfers_product_created
+    ON stock_transfers (product_id, created_at)
+    ''')
+
+    # 各商品在各仓库的库存及合计库存
+    cursor.execute('''
+    CREATE VIEW IF NOT EXISTS stock_rollup AS
+    SELECT s.product_id, p.name AS product_name,
+           s.warehouse_id, w.code AS warehouse_code, w.name AS warehouse_name,
+           s.quantity, p.quantity AS total_quantity
+    FROM warehouse_stock s
+    JOIN products p ON p.id = s.product_id
+    JOIN warehouses w ON w.id = s.warehouse_id
+    ''')
+
+
+def _add_change_log(cursor: sqlite3.Cursor):
+    """版本12：增量同步
+
+    商品、出入库记录、价格历史增加全局唯一的 guid（新行插入时随机生成；已有的行为空，
+    同步时按 ID 和创建时间生成，避免升级时改写整张表）。
+    三张表的变化由触发器记入 change_log，seq 单调递增，同步时导出某个 seq 之后的变化；
+    每个商品只保留最新一条变化，出入库记录和价格历史只增不改，只记录插入。
+    """
+    for table in ('products', 'inventory_records', 'price_history'):
+        if 'guid' not in _table_columns(cursor, table):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN guid TEXT")
+        cursor.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_guid
+        ON {table} (guid)
+        WHERE guid IS NOT NULL
+        ''')
+
+    # 商品名称、价格等字段的修改时间（为空时为创建时间），出入库引起的变化不更新，
+    # 同步时按它决定以哪一方的字段为准
+    if 'edited_at' not in _table_columns(cursor, 'products'):
+        cursor.execute("ALTER TABLE products ADD COLUMN edited_at TIMESTAMP")
+
+    # 本数据库的节点ID（复制数据库文件后需要重新生成）
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    INSERT OR IGNORE INTO sync_state (key, value)
+    VALUES ('node_id', lower(hex(randomblob(8))))
+    ''')
+    # 已导入的各节点变化序号
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sync_peers (
+        node_id TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL DEFAULT 0,
+        imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    # 各节点手工修改库存数量的累计值（version 每次修改加1）
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sync_adjustments (
+        product_id INTEGER NOT NULL,
+        origin TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (product_id, origin)
+    ) WITHOUT ROWID
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        row_guid TEXT,
+        op TEXT NOT NULL CHECK (op IN ('upsert', 'insert', 'delete')),
+        origin TEXT,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_change_log_product
+    ON change_log (row_id)
+    WHERE table_name = 'products'
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_change_log_tombstone
+    ON change_log (row_guid)
+    WHERE op = 'delete'
+    ''')
+
+    # 插入时未指定 guid 的行随机生成
+    for table in ('products', 'inventory_records', 'price_history'):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_guid
+        AFTER INSERT ON {table}
+        WHEN NEW.guid IS NULL
+        BEGIN
+            UPDATE {table} SET guid = lower(hex(randomblob(16))) WHERE id = NEW.id;
+        END
+        ''')
+
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_change_insert
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO change_log (table_name, row_id, op) VALUES ('products', NEW.id, 'upsert');
+    END
+    ''')
+    # 生成 guid 的更新不记录
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_change_update
+    AFTER UPDATE ON products
+    WHEN NOT (OLD.guid IS NULL AND NEW.guid IS NOT NULL)
+    BEGIN
+        DELETE FROM change_log WHERE table_name = 'products' AND row_id = NEW.id AND op = 'upsert';
+        INSERT INTO change_log (table_name, row_id, op) VALUES ('products', NEW.id, 'upsert');
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_change_delete
+    AFTER DELETE ON products
+    BEGIN
+        DELETE FROM change_log WHERE table_name = 'products' AND row_id = OLD.id AND op = 'upsert';
+        INSERT INTO change_log (table_name, row_id, row_guid, op)
+        VALUES ('products', OLD.id, COALESCE(OLD.guid, 'p' || OLD.id || '@' || OLD.created_at), 'delete');
+        DELETE FROM sync_adjustments WHERE product_id = OLD.id;
+    END
+    ''')
+    for table in ('inventory_records', 'price_history'):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_change_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', NEW.id, 'insert');
+        END
+        ''')
+
+def _add_fifo_valuation(cursor: sqlite3.Cursor):
+    """版本13：先进先出商品按剩余成本层计价
+
+    库存流水的单位成本改为取自视图 stock_unit_costs：加权平均商品为均价，先进先出商品为剩余成本层的
+    平均成本（成本层不足库存的部分按均价计算，与出库时一致）。成本层变化时也记一条流水（数量不变），
+    因此无论商品和成本层哪个先写，同一事务中最后一条流水都是最终的库存金额。
+    已有的流水和快照不改写，只为先进先出商品补记一条按当前成本层计价的流水。
+    """
+    cursor.execute('''
+    CREATE VIEW IF NOT EXISTS stock_unit_costs AS
+    SELECT p.id AS product_id,
+           CASE WHEN p.costing_method != 'fifo' OR p.quantity <= 0 THEN p.avg_price
+                ELSE (
+                    SELECT CASE WHEN SUM(l.remaining) >= p.quantity
+                                THEN SUM(l.remaining * l.unit_cost) / SUM(l.remaining)
+                                ELSE (COALESCE(SUM(l.remaining * l.unit_cost), 0)
+                                      + (p.quantity - COALESCE(SUM(l.remaining), 0)) * p.avg_price)
+                                     / p.quantity
+                           END
+                    FROM cost_layers l
+                    WHERE l.product_id = p.id AND l.remaining > 0
+                )
+           END AS unit_cost
+    FROM products p
+    ''')
+
+    cursor.execute("DROP TRIGGER IF EXISTS trg_products_movement_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_products_movement_update")
+    cursor.execute('''
+    CREATE TRIGGER trg_products_movement_insert
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+        SELECT NEW.id, NEW.quantity, NEW.quantity, unit_cost
+        FROM stock_unit_costs WHERE product_id = NEW.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER trg_products_movement_update
+    AFTER UPDATE OF quantity, avg_price, costing_method ON products
+    WHEN NEW.quantity IS NOT OLD.quantity OR NEW.avg_price IS NOT OLD.avg_price
+      OR NEW.costing_method IS NOT OLD.costing_method
+    BEGIN
+        INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+        SELECT NEW.id, NEW.quantity - OLD.quantity, NEW.quantity, unit_cost
+        FROM stock_unit_costs WHERE product_id = NEW.id;
+    END
+    ''')
+
+    # 成本层变化（入库新增、出库消耗）：先进先出商品按变化后的成本层再记一条流水
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_cost_layers_movement_insert
+    AFTER INSERT ON cost_layers
+    BEGIN
+        INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+        SELECT p.id, 0, p.quantity, c.unit_cost
+        FROM products p
+        JOIN stock_unit_costs c ON c.product_id = p.id
+        WHERE p.id = NEW.product_id AND p.costing_method = 'fifo';
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_cost_layers_movement_update
+    AFTER UPDATE OF remaining ON cost_layers
+    WHEN NEW.remaining IS NOT OLD.remaining
+    BEGIN
+        INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+        SELECT p.id, 0, p.quantity, c.unit_cost
+        FROM products p
+        JOIN stock_unit_costs c ON c.product_id = p.id
+        WHERE p.id = NEW.product_id AND p.costing_method = 'fifo';
+    END
+    ''')
+
+    cursor.execute('''
+    INSERT INTO stock_movements (product_id, change, quantity, unit_cost)
+    SELECT p.id, 0, p.quantity, c.unit_cost
+    FROM products p
+    JOIN stock_unit_costs c ON c.product_id = p.id
+    WHERE p.costing_method = 'fifo'
+    ''')
+
+
+# 迁移列表，下标+1 即为应用后的版本号；只能追加，不能修改已发布的迁移
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    _create_base_tables,
+    _add_cost_aggregates,
+    _add_query_indexes,
+    _add_record_time_indexes,
+    _add_summary_tables,
+    _add_product_search_index,
+    _add_cost_layers,
+    _add_stock_movements,
+    _add_archive_manifest,
+    _add_product_barcode,
+    _add_warehouses,
+    _add_change_log,
+    _add_fifo_valuation,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _table_columns(cursor: sqlite3.Cursor, table: str) -> set:
+    """获取表的字段名集合"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """读取数据库当前结构版本"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """将数据库升级到最新结构版本，返回升级后的版本号
+
+    结构已是最新时只读取一次 user_version，不执行任何 DDL。
+    每个迁移在独立事务中执行，失败时回滚该迁移并抛出异常。
+    """
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+
+    cursor = conn.cursor()
+    try:
+        for index in range(version, SCHEMA_VERSION):
+            # 获取写锁后重新检查，避免多个进程重复迁移
+            cursor.execute("BEGIN IMMEDIATE")
+            current = get_schema_version(conn)
+            if current > index:
+                conn.commit()
+                continue
+            MIGRATIONS[index](cursor)
+            cursor.execute(f"PRAGMA user_version = {index + 1}")
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return get_schema_version(conn)
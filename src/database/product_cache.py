@@ -0,0 +1,175 @@
+"""
+商品缓存模块
+
+按商品ID缓存 Product 对象（LRU，容量有限），由 DatabaseManager 的写操作直写更新。
+其他连接（其他线程或进程）提交修改后，通过 PRAGMA data_version 发现，再从 change_log 中
+读取此后有变化的商品ID，只移除这些商品。DatabaseManager 的写事务在取得写锁后先处理其他连接的修改，
+提交前记下已处理到的序号，本事务的修改由直写更新，不会被其他线程的检查移除。
+"""
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from src.models.product import Product
+
+class ProductCache:
+    """商品缓存类（线程安全）"""
+    _shared: Dict[object, 'ProductCache'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._items: 'OrderedDict[int, Product]' = OrderedDict()
+        self._data_versions: Dict[int, int] = {}
+        self._last_seq: Optional[int] = None   # 已处理到的 change_log 序号
+        self._generation = 0                   # 每次写事务开始、结束或移除商品后递增，未命中时的回填据此判断是否过期
+        self._writing = 0                      # 本进程进行中的写事务数，期间不回填
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, owner: object, max_size: int = 1024) -> 'ProductCache':
+        """获取与 owner（同一数据库的连接管理器）关联的缓存，同一数据库共用一个缓存"""
+        with cls._shared_lock:
+            cache = cls._shared.get(owner)
+            if cache is None:
+                cache = cls(max_size)
+                cls._shared[owner] = cache
+            return cache
+
+    def check_data_version(self, conn: sqlite3.Connection):
+        """检查连接看到的 data_version，发现其他连接提交过修改时只移除有变化的商品"""
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        key = id(conn)
+        with self._lock:
+            last = self._data_versions.get(key)
+            self._data_versions[key] = version
+            if last == version and self._last_seq is not None:
+                return
+            since = self._last_seq
+
+        if since is None:
+            # 第一次检查：此前直写的内容无法确认，清空后从当前的变化序号开始
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+            with self._lock:
+                if self._last_seq is None:
+                    self._items.clear()
+                    self._last_seq = seq
+                    self._generation += 1
+            return
+
+        self._discard_changed(conn, since)
+
+    def _discard_changed(self, conn: sqlite3.Connection, since: int):
+        """移除序号 since 之后有变化的商品"""
+        rows = conn.execute('''
+        SELECT seq, row_id FROM change_log
+        WHERE seq > ? AND table_name = 'products'
+        ''', (since,)).fetchall()
+        if not rows:
+            return
+        with self._lock:
+            for _, product_id in rows:
+                if self._items.pop(product_id, None) is not None:
+                    self.invalidations += 1
+            self._last_seq = max(self._last_seq or 0, max(row[0] for row in rows))
+            self._generation += 1
+
+    def begin_write(self, conn: sqlite3.Connection):
+        """写事务取得写锁后调用：移除此前其他连接修改过的商品（之后必须调用 after_write）"""
+        with self._lock:
+            self._writing += 1
+            self._generation += 1
+            since = self._last_seq
+        if since is None:
+            self.check_data_version(conn)
+        else:
+            self._discard_changed(conn, since)
+
+    def end_write(self, conn: sqlite3.Connection):
+        """写事务提交前调用（仍持有写锁）：本事务的变化由直写更新，其他连接不必再移除"""
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        with self._lock:
+            self._last_seq = max(self._last_seq or 0, seq)
+
+    def after_write(self):
+        """写事务提交或回滚后调用：此前开始读取的商品不再回填"""
+        with self._lock:
+            self._writing -= 1
+            self._generation += 1
+
+    def reset(self):
+        """写事务提交失败时调用：清空缓存，下次检查时重新确定变化序号"""
+        with self._lock:
+            self._items.clear()
+            self._last_seq = None
+            self._generation += 1
+
+    def generation(self) -> int:
+        """当前代数，未命中时在读取数据库之前获取，回填时传给 fill"""
+        with self._lock:
+            return self._generation
+
+    def fill(self, product: Product, generation: int):
+        """未命中后回填：读取期间有写事务进行或移除过商品时不写入（读到的可能已过期）"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation == self._generation and not self._writing:
+                self._store(product)
+
+    def get(self, product_id: int) -> Optional[Product]:
+        """读取缓存，未命中返回 None"""
+        with self._lock:
+            product = self._items.get(product_id)
+            if product is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(product_id)
+            self.hits += 1
+            return product
+
+    def peek(self, product_id: int) -> Optional[Product]:
+        """读取缓存但不计入命中统计、不调整顺序"""
+        with self._lock:
+            return self._items.get(product_id)
+
+    def put(self, product: Product):
+        """写入缓存，超出容量时淘汰最久未使用的商品"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._store(product)
+
+    def _store(self, product: Product):
+        """写入并淘汰超出容量的商品（调用方持有锁）"""
+        self._items[product.id] = product
+        self._items.move_to_end(product.id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def discard(self, product_id: int):
+        """移除缓存中的商品"""
+        with self._lock:
+            self._items.pop(product_id, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._items.clear()
+            self._generation += 1
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,128 @@
+"""
+统计报表模块
+
+基于 daily_summary / summary_totals 汇总表在 SQL 中计算利润与周转，
+汇总表由出入库记录表上的触发器在同一事务中增量维护。
+"""
+import sqlite3
+from datetime import date, datetime
+from typing import List, Optional, Union
+from src.models.profit_summary import ProfitSummary
+
+# 统计周期对应的分组表达式
+PERIOD_EXPRESSIONS = {
+    'day': "s.day",
+    # ISO 周（周一开始，按周四所在年份编号，如 2025-W01）；SQLite 3.46 之前不支持 %G/%V，按周四换算
+    'week': "strftime('%Y', date(s.day, '-3 days', 'weekday 4')) || '-W' || "
+            "printf('%02d', (strftime('%j', date(s.day, '-3 days', 'weekday 4')) - 1) / 7 + 1)",
+    'month': "substr(s.day, 1, 7)",
+    'year': "substr(s.day, 1, 4)",
+    'all': "'全部'",
+}
+
+SUMMARY_COLUMNS = """
+    SUM(s.units_in), SUM(s.units_out), SUM(s.purchase_amount),
+    SUM(s.revenue), SUM(s.cogs), SUM(s.profit), SUM(s.record_count)
+"""
+
+
+def _format_day(value: Union[date, datetime, str]) -> str:
+    """将日期转换为汇总表中的日期格式"""
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def get_totals(conn: sqlite3.Connection) -> ProfitSummary:
+    """获取全部历史的合计（常数时间）"""
+    row = conn.execute("""
+    SELECT units_in, units_out, purchase_amount, revenue, cogs, profit, record_count
+    FROM summary_totals
+    WHERE id = 1
+    """).fetchone()
+    if row is None:
+        row = (0, 0, 0.0, 0.0, 0.0, 0.0, 0)
+    return ProfitSummary('全部', None, None, *row)
+
+
+def get_summary(conn: sqlite3.Connection, period: str = 'day',
+                start: Optional[Union[date, datetime, str]] = None,
+                end: Optional[Union[date, datetime, str]] = None,
+                product_id: Optional[int] = None,
+                by_product: bool = False) -> List[ProfitSummary]:
+    """按日/周/月/年统计入库、出库、销售额、销售成本和毛利
+
+    start/end 为日期范围 [start, end)；by_product 为 True 时按商品分别统计。
+    """
+    if period not in PERIOD_EXPRESSIONS:
+        raise ValueError(f"无效的统计周期: {period}")
+    period_expr = PERIOD_EXPRESSIONS[period]
+
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append("s.day >= ?")
+        params.append(_format_day(start))
+    if end is not None:
+        conditions.append("s.day < ?")
+        params.append(_format_day(end))
+    if product_id is not None:
+        conditions.append("s.product_id = ?")
+        params.append(product_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if by_product or product_id is not None:
+        rows = conn.execute(f"""
+        SELECT {period_expr} AS period, s.product_id, p.name, {SUMMARY_COLUMNS}
+        FROM daily_summary s
+        LEFT JOIN products p ON s.product_id = p.id
+        {where}
+        GROUP BY period, s.product_id
+        ORDER BY period, p.name
+        """, params).fetchall()
+    else:
+        rows = conn.execute(f"""
+        SELECT {period_expr} AS period, NULL, NULL, {SUMMARY_COLUMNS}
+        FROM daily_summary s
+        {where}
+        GROUP BY period
+        ORDER BY period
+        """, params).fetchall()
+    return [ProfitSummary(*row) for row in rows]
+
+
+def get_turnover(conn: sqlite3.Connection,
+                 start: Optional[Union[date, datetime, str]] = None,
+                 end: Optional[Union[date, datetime, str]] = None) -> List[dict]:
+    """按商品统计期间出入库数量及库存周转率（出库数量 / 当前库存）"""
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append("s.day >= ?")
+        params.append(_format_day(start))
+    if end is not None:
+        conditions.append("s.day < ?")
+        params.append(_format_day(end))
+    join_filter = ''.join(f" AND {condition}" for condition in conditions)
+
+    rows = conn.execute(f"""
+    SELECT p.id, p.name, p.quantity,
+           COALESCE(SUM(s.units_in), 0), COALESCE(SUM(s.units_out), 0),
+           COALESCE(SUM(s.cogs), 0)
+    FROM products p
+    LEFT JOIN daily_summary s ON s.product_id = p.id{join_filter}
+    GROUP BY p.id
+    ORDER BY p.name
+    """, params).fetchall()
+    return [
+        {
+            'product_id': row[0],
+            'product_name': row[1],
+            'quantity': row[2],
+            'units_in': row[3],
+            'units_out': row[4],
+            'cogs': row[5],
+            'turnover': row[4] / row[2] if row[2] else None,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,183 @@
+"""
+库存历史模块
+
+商品表上的触发器把每次库存数量、均价或先进先出成本层的变化记入 stock_movements；
+stock_snapshots/stock_snapshot_items 保存月初零点（即上月末）各商品的库存和单位成本。
+查询某一时刻的库存时，从该时刻之前最近的快照开始，只应用快照之后到该时刻的流水，
+不需要回放全部出入库记录。库存金额按数量 × 单位成本计算：加权平均商品为均价，
+先进先出商品为剩余成本层的平均成本（见迁移版本13的 stock_unit_costs 视图）。
+"""
+import sqlite3
+from datetime import date, datetime
+from typing import List, Optional, Tuple, Union
+
+TimeValue = Union[date, datetime, str]
+
+
+def _format_time(value: TimeValue) -> str:
+    """将时间转换为流水表中的本地时间格式（日期表示当天零点）"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _month_start(value: str) -> date:
+    """时间所在月份的第一天"""
+    return date(int(value[:4]), int(value[5:7]), 1)
+
+
+def _next_month(value: date) -> date:
+    """下个月的第一天"""
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _nearest_snapshot(conn: sqlite3.Connection, as_of: str) -> Tuple[Optional[int], int]:
+    """as_of 之前（含）最近的快照: (快照ID, 已包含的最大流水ID)，没有快照时为 (None, 0)"""
+    row = conn.execute('''
+    SELECT id, last_movement_id
+    FROM stock_snapshots
+    WHERE taken_at <= ?
+    ORDER BY taken_at DESC
+    LIMIT 1
+    ''', (as_of,)).fetchone()
+    return (row[0], row[1]) if row else (None, 0)
+
+
+def _last_movement_before(conn: sqlite3.Connection, as_of: str) -> int:
+    """as_of 之前的最大流水ID（流水ID按时间顺序分配）"""
+    row = conn.execute(
+        "SELECT MAX(id) FROM stock_movements WHERE created_at < ?", (as_of,)
+    ).fetchone()
+    return row[0] or 0
+
+
+def _stock_rows(conn: sqlite3.Connection, as_of: str,
+                product_id: Optional[int] = None) -> List[Tuple[int, int, float]]:
+    """as_of 时刻各商品的 (商品ID, 数量, 单位成本)，不含数量为0的商品"""
+    snapshot_id, first_id = _nearest_snapshot(conn, as_of)
+    last_id = _last_movement_before(conn, as_of)
+    product_filter = "AND product_id = :product_id" if product_id is not None else ""
+    return conn.execute(f'''
+    WITH changed AS (
+        SELECT product_id, quantity, unit_cost
+        FROM stock_movements
+        WHERE id IN (
+            SELECT MAX(id) FROM stock_movements
+            WHERE id > :first_id AND id <= :last_id {product_filter}
+            GROUP BY product_id
+        )
+    )
+    SELECT product_id, quantity, unit_cost FROM changed
+    WHERE quantity != 0
+    UNION ALL
+    SELECT product_id, quantity, unit_cost FROM stock_snapshot_items
+    WHERE snapshot_id = :snapshot_id {product_filter}
+      AND product_id NOT IN (SELECT product_id FROM changed)
+    ''', {'first_id': first_id, 'last_id': max(last_id, first_id), 'snapshot_id': snapshot_id,
+          'product_id': product_id}).fetchall()
+
+
+def get_stock_as_of(conn: sqlite3.Connection, as_of: TimeValue,
+                    product_id: Optional[int] = None) -> List[dict]:
+    """查询 as_of 时刻（不含该时刻）各商品的库存数量、单位成本和金额，按商品名称排序"""
+    rows = _stock_rows(conn, _format_time(as_of), product_id)
+    names = {}
+    ids = [row[0] for row in rows]
+    for start in range(0, len(ids), 900):
+        chunk = ids[start:start + 900]
+        names.update(conn.execute(
+            f"SELECT id, name FROM products WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    result = [
+        {
+            'product_id': id,
+            'name': names.get(id),
+            'quantity': quantity,
+            'unit_cost': unit_cost,
+            'value': round(quantity * unit_cost, 2),
+        }
+        for id, quantity, unit_cost in rows
+    ]
+    result.sort(key=lambda item: (item['name'] is None, item['name'] or '', item['product_id']))
+    return result
+
+
+def get_valuation(conn: sqlite3.Connection, as_of: TimeValue) -> Tuple[int, float, int]:
+    """as_of 时刻的库存合计: (总数量, 总金额, 有库存的商品数)"""
+    rows = _stock_rows(conn, _format_time(as_of))
+    return (
+        sum(row[1] for row in rows),
+        round(sum(row[1] * row[2] for row in rows), 2),
+        len(rows),
+    )
+
+
+def get_valuation_report(conn: sqlite3.Connection, start: Optional[TimeValue] = None,
+                         end: Optional[TimeValue] = None) -> List[dict]:
+    """按月统计月末库存数量和金额（start/end 为月份范围 [start, end)，默认从第一条流水到本月）"""
+    first = _month_start(_format_time(start)) if start is not None else None
+    if first is None:
+        row = conn.execute("SELECT MIN(created_at) FROM stock_movements").fetchone()
+        if row[0] is None:
+            return []
+        first = _month_start(row[0])
+    last = _month_start(_format_time(end)) if end is not None else _next_month(date.today())
+
+    report = []
+    month = first
+    while month < last:
+        # 月末库存即下月第一天零点之前的库存
+        boundary = _next_month(month)
+        quantity, value, products = get_valuation(conn, boundary)
+        report.append({
+            'period': month.strftime('%Y-%m'),
+            'as_of': boundary.strftime('%Y-%m-%d'),
+            'quantity': quantity,
+            'value': value,
+            'products': products,
+        })
+        month = boundary
+    return report
+
+
+def create_snapshot(conn: sqlite3.Connection, taken_at: TimeValue) -> Optional[int]:
+    """保存 taken_at 时刻的库存快照（由调用方管理事务），已存在时返回 None"""
+    taken_at = _format_time(taken_at)
+    if conn.execute("SELECT 1 FROM stock_snapshots WHERE taken_at = ?", (taken_at,)).fetchone():
+        return None
+    rows = _stock_rows(conn, taken_at)
+    cursor = conn.execute(
+        "INSERT INTO stock_snapshots (taken_at, last_movement_id) VALUES (?, ?)",
+        (taken_at, max(_last_movement_before(conn, taken_at), _nearest_snapshot(conn, taken_at)[1]))
+    )
+    snapshot_id = cursor.lastrowid
+    conn.executemany('''
+    INSERT INTO stock_snapshot_items (snapshot_id, product_id, quantity, unit_cost)
+    VALUES (?, ?, ?, ?)
+    ''', [(snapshot_id, *row) for row in rows])
+    return snapshot_id
+
+
+def create_month_end_snapshots(conn: sqlite3.Connection, today: Optional[date] = None) -> int:
+    """补齐到本月为止缺少的月末快照（由调用方管理事务），返回新建的快照数
+
+    按时间顺序创建，每个快照都从上一个快照开始计算，补齐全部历史只需扫描一遍流水。
+    """
+    row = conn.execute("SELECT MAX(taken_at) FROM stock_snapshots").fetchone()
+    if row[0] is not None:
+        month = _next_month(_month_start(row[0]))
+    else:
+        row = conn.execute("SELECT MIN(created_at) FROM stock_movements").fetchone()
+        if row[0] is None:
+            return 0
+        month = _next_month(_month_start(row[0]))
+
+    current = (today or date.today()).replace(day=1)
+    created = 0
+    while month <= current:
+        if create_snapshot(conn, month) is not None:
+            created += 1
+        month = _next_month(month)
+    return created
\ No newline at end of file
@@ -0,0 +1,612 @@
+"""
+增量同步模块
+
+products、inventory_records、price_history 的每次变化由触发器记入 change_log，seq 单调递增。
+导出 seq 大于某个值的全部变化，打包为 gzip 压缩的 JSON（变化包）；导入时按全局唯一的 guid 合并，
+同一变化包重复导入不会产生重复数据。两个数据库互相导入对方的变化包后数据一致：
+- 出入库记录、价格历史只增不改：本地没有时插入，并按记录调整库存和成本汇总；
+- 商品名称、价格、描述、条码等字段按修改时间（edited_at，出入库不更新）以后者为准，时间相同时按节点ID；
+- 手工修改的库存数量按节点累计（sync_adjustments），导入时只应用对方新增的部分；
+- 商品删除后，本地在删除时间之后没有修改过的才删除；
+- 出库时库存不足（两边同时卖出同一批货）库存减到0为止，计入冲突；
+- 先进先出商品：变化包带有商品当前未消耗完的成本层，本地新建的商品直接复制；已有的商品与本地操作相同地维护，
+  入库和增加的手工修改数量新增成本层，出库和减少的数量按先进先出消耗，切换成本计算方式时重建。
+仓库间调拨不同步，导入的出库先从记录的仓库扣减，不足时从其他仓库扣减。
+
+用法:
+    python -m src.database.sync export --db a.db --since 0 -o a.changes.json.gz
+    python -m src.database.sync import --db b.db a.changes.json.gz
+    python -m src.database.sync pull --db b.db --source a.db   # 两个本地数据库文件之间同步
+"""
+import gzip
+import json
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+from . import warehouses
+from .costing import FifoLayers, write_layers
+
+BUNDLE_FORMAT = 'inventory-changes'
+BUNDLE_VERSION = 2
+
+# 迁移前的行没有 guid，按 ID 和创建时间生成（复制出的数据库中两边相同）
+LEGACY_GUID_PREFIX = {'products': 'p', 'inventory_records': 'r', 'price_history': 'h'}
+
+def _guid_expr(table: str, alias: str) -> str:
+    """guid 查询表达式（迁移前的行按 ID 和创建时间生成）"""
+    prefix = LEGACY_GUID_PREFIX[table]
+    return f"COALESCE({alias}.guid, '{prefix}' || {alias}.id || '@' || {alias}.created_at)"
+
+def _chunks(ids: List[int], size: int = 900):
+    """分块避免超过SQLite参数数量上限"""
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def get_node_id(conn: sqlite3.Connection) -> str:
+    """本数据库的节点ID"""
+    return conn.execute("SELECT value FROM sync_state WHERE key = 'node_id'").fetchone()[0]
+
+def reset_node_id(conn: sqlite3.Connection) -> str:
+    """重新生成节点ID（复制数据库文件后在副本上执行，否则两边的变化无法区分）"""
+    conn.execute("UPDATE sync_state SET value = lower(hex(randomblob(8))) WHERE key = 'node_id'")
+    conn.commit()
+    return get_node_id(conn)
+
+def last_seq(conn: sqlite3.Connection) -> int:
+    """当前最新的变化序号"""
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+def get_peers(conn: sqlite3.Connection) -> List[dict]:
+    """已导入过的节点及已导入到的变化序号"""
+    return [
+        {'node_id': row[0], 'last_seq': row[1], 'imported_at': row[2]}
+        for row in conn.execute("SELECT node_id, last_seq, imported_at FROM sync_peers ORDER BY node_id")
+    ]
+
+def peer_seq(conn: sqlite3.Connection, node_id: str) -> int:
+    """已从某个节点导入到的变化序号（未导入过为0）"""
+    row = conn.execute("SELECT last_seq FROM sync_peers WHERE node_id = ?", (node_id,)).fetchone()
+    return row[0] if row else 0
+
+def record_adjustment(conn: sqlite3.Connection, product_id: int, change: int):
+    """记录本节点手工修改的库存数量（由调用方管理事务）"""
+    if change:
+        conn.execute('''
+        INSERT INTO sync_adjustments (product_id, origin, total, version)
+        VALUES (?, (SELECT value FROM sync_state WHERE key = 'node_id'), ?, 1)
+        ON CONFLICT (product_id, origin) DO UPDATE SET
+            total = total + excluded.total,
+            version = version + 1
+        ''', (product_id, change))
+
+def export_changes(conn: sqlite3.Connection, since: int = 0,
+                   exclude_origin: Optional[str] = None) -> dict:
+    """导出序号大于 since 的全部变化
+
+    exclude_origin 为对方节点ID时不导出从对方导入的变化。
+    已归档的记录和价格历史不再导出。
+    """
+    until = last_seq(conn)
+    product_ids = []
+    record_ids = []
+    history_ids = []
+    deleted = []
+    for table, row_id, row_guid, op, changed_at in conn.execute('''
+    SELECT table_name, row_id, row_guid, op, changed_at
+    FROM change_log
+    WHERE seq > ? AND seq <= ? AND (origin IS NULL OR origin != ?)
+    ORDER BY seq
+    ''', (since, until, exclude_origin or '')):
+        if op == 'delete':
+            deleted.append({'guid': row_guid, 'deleted_at': changed_at})
+        elif table == 'products':
+            product_ids.append(row_id)
+        elif table == 'inventory_records':
+            record_ids.append(row_id)
+        else:
+            history_ids.append(row_id)
+
+    products = []
+    for chunk in _chunks(product_ids):
+        products.extend(
+            {
+                'id': row[0], 'guid': row[1], 'name': row[2], 'quantity': row[3], 'price': row[4],
+                'avg_price': row[5], 'cost_total': row[6], 'cost_quantity': row[7],
+                'description': row[8], 'costing_method': row[9], 'barcode': row[10],
+                'created_at': row[11], 'edited_at': row[12], 'adjustments': {}, 'cost_layers': [],
+            }
+            for row in conn.execute(f'''
+            SELECT p.id, {_guid_expr('products', 'p')}, p.name, p.quantity, p.price, p.avg_price,
+                   p.cost_total, p.cost_quantity, p.description, p.costing_method, p.barcode,
+                   p.created_at, COALESCE(p.edited_at, p.created_at)
+            FROM products p
+            WHERE p.id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+        )
+    by_id = {product['id']: product for product in products}
+    for chunk in _chunks(list(by_id)):
+        for product_id, origin, total, version in conn.execute(f'''
+        SELECT product_id, origin, total, version
+        FROM sync_adjustments
+        WHERE product_id IN ({', '.join('?' * len(chunk))})
+        ''', chunk):
+            by_id[product_id]['adjustments'][origin] = [total, version]
+        for product_id, unit_cost, remaining in conn.execute(f'''
+        SELECT product_id, unit_cost, remaining
+        FROM cost_layers
+        WHERE product_id IN ({', '.join('?' * len(chunk))}) AND remaining > 0
+        ORDER BY product_id, id
+        ''', chunk):
+            by_id[product_id]['cost_layers'].append([unit_cost, remaining])
+    for product in products:
+        del product['id']
+
+    history = []
+    for chunk in _chunks(history_ids):
+        history.extend(
+            {'guid': row[0], 'product_guid': row[1], 'price': row[2], 'quantity': row[3], 'created_at': row[4]}
+            for row in conn.execute(f'''
+            SELECT {_guid_expr('price_history', 'h')}, {_guid_expr('products', 'p')},
+                   h.price, h.quantity, h.created_at
+            FROM price_history h
+            JOIN products p ON p.id = h.product_id
+            WHERE h.id IN ({', '.join('?' * len(chunk))})
+            ORDER BY h.id
+            ''', chunk)
+        )
+
+    records = []
+    for chunk in _chunks(record_ids):
+        records.extend(
+            {
+                'guid': row[0], 'product_guid': row[1], 'type': row[2], 'quantity': row[3],
+                'price': row[4], 'cost_price': row[5], 'remark': row[6], 'created_at': row[7],
+                'warehouse_code': row[8], 'warehouse_name': row[9],
+            }
+            for row in conn.execute(f'''
+            SELECT {_guid_expr('inventory_records', 'r')}, {_guid_expr('products', 'p')},
+                   r.type, r.quantity, r.price, r.cost_price, r.remark, r.created_at, w.code, w.name
+            FROM inventory_records r
+            JOIN products p ON p.id = r.product_id
+            LEFT JOIN warehouses w ON w.id = r.warehouse_id
+            WHERE r.id IN ({', '.join('?' * len(chunk))})
+            ORDER BY r.id
+            ''', chunk)
+        )
+
+    return {
+        'format': BUNDLE_FORMAT,
+        'version': BUNDLE_VERSION,
+        'node_id': get_node_id(conn),
+        'since': since,
+        'until': until,
+        'products': products,
+        'price_history': history,
+        'inventory_records': records,
+        'deleted_products': deleted,
+    }
+
+def write_bundle(bundle: dict, path: str) -> int:
+    """把变化包写入 gzip 压缩的 JSON 文件，返回文件大小（字节）"""
+    data = gzip.compress(json.dumps(bundle, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+def read_bundle(path: str) -> dict:
+    """读取变化包文件"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        bundle = json.load(f)
+    if bundle.get('format') != BUNDLE_FORMAT or bundle.get('version') != BUNDLE_VERSION:
+        raise ValueError("不是有效的变化包文件")
+    return bundle
+
+def _find_row(conn: sqlite3.Connection, table: str, guid: str) -> Optional[int]:
+    """按 guid 查找本地的行ID"""
+    row = conn.execute(f"SELECT id FROM {table} WHERE guid = ?", (guid,)).fetchone()
+    if row is not None:
+        return row[0]
+    prefix = LEGACY_GUID_PREFIX[table]
+    row_id, separator, created_at = guid[len(prefix):].partition('@')
+    if guid.startswith(prefix) and separator and row_id.isdigit():
+        row = conn.execute(
+            f"SELECT id FROM {table} WHERE id = ? AND created_at = ? AND guid IS NULL",
+            (int(row_id), created_at)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+    return None
+
+def _add_stock(conn: sqlite3.Connection, product_id: int, warehouse_id: int, quantity: int):
+    """增加商品在某个仓库的库存"""
+    warehouses.change_stock(conn, product_id, warehouse_id, quantity)
+    conn.execute("UPDATE products SET quantity = quantity + ? WHERE id = ?", (quantity, product_id))
+
+def _remove_stock(conn: sqlite3.Connection, product_id: int, warehouse_id: int, quantity: int) -> int:
+    """减少库存：先从指定仓库扣减，不足部分依次从其他仓库扣减，返回库存不足未能扣减的数量"""
+    remaining = quantity
+    for location, available in conn.execute('''
+    SELECT warehouse_id, quantity
+    FROM warehouse_stock
+    WHERE product_id = ? AND quantity > 0
+    ORDER BY warehouse_id != ?, warehouse_id
+    ''', (product_id, warehouse_id)).fetchall():
+        taken = min(available, remaining)
+        warehouses.change_stock(conn, product_id, location, -taken)
+        remaining -= taken
+        if not remaining:
+            break
+    conn.execute("UPDATE products SET quantity = quantity - ? WHERE id = ?", (quantity - remaining, product_id))
+    return remaining
+
+class _Importer:
+    """把一个变化包合并到本地数据库（由调用方管理事务）"""
+    def __init__(self, conn: sqlite3.Connection, bundle: dict):
+        self.conn = conn
+        self.bundle = bundle
+        self.node_id = get_node_id(conn)
+        self.origin = bundle['node_id']
+        self.products: Dict[str, int] = {}
+        # 本次新建、成本层从变化包复制的商品（其后重放的记录不再增减成本层）
+        self.copied_layers = set()
+        # 需要重新确定价格的商品
+        self.repriced = set()
+        self.warehouses: Dict[str, int] = {
+            code: id for id, code in conn.execute("SELECT id, code FROM warehouses")
+        }
+        # 已归档时间之前不能再插入记录（各分区时间范围不能重叠）
+        self.archived_until = conn.execute("SELECT MAX(last_at) FROM record_archives").fetchone()[0]
+        self.report = {
+            'node_id': self.origin, 'since': bundle['since'], 'until': bundle['until'],
+            'products_added': 0, 'products_updated': 0, 'products_deleted': 0,
+            'adjustments': 0, 'price_history': 0, 'inventory_records': 0,
+            'duplicates': 0, 'conflicts': [],
+        }
+
+    def conflict(self, message: str):
+        self.report['conflicts'].append(message)
+
+    def product_id(self, guid: str) -> Optional[int]:
+        """按 guid 查找本地商品ID"""
+        if guid not in self.products:
+            self.products[guid] = _find_row(self.conn, 'products', guid)
+        return self.products[guid]
+
+    def run(self) -> dict:
+        if self.origin == self.node_id:
+            raise ValueError("变化包来自本数据库，或两个数据库的节点ID相同（数据库文件是复制的），"
+                             "请先在其中一个上重新生成节点ID")
+        start_seq = last_seq(self.conn)
+        for item in self.bundle['products']:
+            self.merge_product(item)
+        for item in self.bundle['products']:
+            self.merge_adjustments(item)
+        for item in self.bundle['price_history']:
+            self.add_price_history(item)
+        for item in self.bundle['inventory_records']:
+            self.add_record(item)
+        for item in self.bundle['deleted_products']:
+            self.delete_product(item)
+        self.update_prices()
+
+        # 本次导入的记录和价格历史标记来源，导出给对方时跳过；商品的变化可能合并了本地修改，仍然导出
+        self.conn.execute(
+            "UPDATE change_log SET origin = ? WHERE seq > ? AND table_name != 'products'",
+            (self.origin, start_seq)
+        )
+        # 只有连续导入（中间没有遗漏的变化）时才推进已导入的序号
+        if self.bundle['since'] <= peer_seq(self.conn, self.origin):
+            self.conn.execute('''
+            INSERT INTO sync_peers (node_id, last_seq) VALUES (?, ?)
+            ON CONFLICT (node_id) DO UPDATE SET
+                last_seq = MAX(last_seq, excluded.last_seq),
+                imported_at = CURRENT_TIMESTAMP
+            ''', (self.origin, self.bundle['until']))
+        else:
+            self.conflict(f"变化包从序号 {self.bundle['since']} 开始，"
+                          f"此前导入到 {peer_seq(self.conn, self.origin)}，中间的变化尚未导入")
+        return self.report
+
+    def barcode_available(self, barcode: Optional[str], product_id: Optional[int]) -> bool:
+        if barcode is None:
+            return True
+        row = self.conn.execute("SELECT id FROM products WHERE barcode = ?", (barcode,)).fetchone()
+        return row is None or row[0] == product_id
+
+    def merge_product(self, item: dict):
+        """商品字段以后修改的一方为准；本地没有的商品按对方的库存和成本新建"""
+        product_id = self.product_id(item['guid'])
+        if product_id is None:
+            self.add_product(item)
+            return
+
+        local = self.conn.execute('''
+        SELECT COALESCE(edited_at, created_at), name, price, description, costing_method, barcode
+        FROM products WHERE id = ?
+        ''', (product_id,)).fetchone()
+        remote = (item['edited_at'], item['name'], item['price'], item['description'],
+                  item['costing_method'], item['barcode'])
+        if (item['edited_at'], self.origin) <= (local[0], self.node_id) or remote == tuple(local):
+            return
+        self.repriced.add(product_id)
+        barcode = item['barcode']
+        if not self.barcode_available(barcode, product_id):
+            self.conflict(f"商品 {item['name']} 的条码 {barcode} 已被其他商品使用，保留本地条码")
+            barcode = self.conn.execute("SELECT barcode FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+        self.conn.execute('''
+        UPDATE products
+        SET name = ?, price = ?, description = ?, costing_method = ?, barcode = ?,
+            edited_at = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', (item['name'], item['price'], item['description'], item['costing_method'],
+              barcode, item['edited_at'], product_id))
+        if item['costing_method'] != local[4]:
+            # 与本地切换相同：关闭剩余成本层，改为先进先出时以当前库存和均价建立期初成本层
+            self.conn.execute(
+                "UPDATE cost_layers SET remaining = 0 WHERE product_id = ? AND remaining > 0", (product_id,)
+            )
+            quantity, avg_price = self.conn.execute(
+                "SELECT quantity, avg_price FROM products WHERE id = ?", (product_id,)
+            ).fetchone()
+            self.add_layer(product_id, avg_price, quantity)
+        self.report['products_updated'] += 1
+
+    def add_product(self, item: dict):
+        """新建商品：初始库存和成本 = 对方的当前值 - 变化包中随后会重放的记录、价格历史和手工修改"""
+        guid = item['guid']
+        tombstone = self.conn.execute('''
+        SELECT MAX(changed_at) FROM change_log WHERE row_guid = ? AND op = 'delete'
+        ''', (guid,)).fetchone()[0]
+        if tombstone is not None and tombstone >= item['edited_at']:
+            self.report['duplicates'] += 1
+            return
+
+        quantity = item['quantity']
+        cost_total = item['cost_total']
+        cost_quantity = item['cost_quantity']
+        for record in self.bundle['inventory_records']:
+            if record['product_guid'] == guid:
+                quantity -= record['quantity'] if record['type'] == 'in' else -record['quantity']
+        for history in self.bundle['price_history']:
+            if history['product_guid'] == guid:
+                cost_total -= history['price'] * history['quantity']
+                cost_quantity -= history['quantity']
+        for origin, (total, version) in item['adjustments'].items():
+            if origin != self.node_id:
+                quantity -= total
+
+        barcode = item['barcode']
+        if not self.barcode_available(barcode, None):
+            self.conflict(f"商品 {item['name']} 的条码 {barcode} 已被其他商品使用，新建时不设条码")
+            barcode = None
+        if quantity < 0:
+            self.conflict(f"商品 {item['name']} 的库存与记录不一致，按0新建")
+            quantity = 0
+        self.products[guid] = self.conn.execute('''
+        INSERT INTO products (name, quantity, price, avg_price, cost_total, cost_quantity, description,
+                              costing_method, barcode, guid, created_at, edited_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (item['name'], quantity, item['price'], item['avg_price'], cost_total, cost_quantity,
+              item['description'], item['costing_method'], barcode, guid,
+              item['created_at'], item['edited_at'])).lastrowid
+        # 成本层复制对方的当前状态（已包含随后重放的记录和手工修改）
+        self.conn.executemany('''
+        INSERT INTO cost_layers (product_id, unit_cost, quantity, remaining)
+        VALUES (?, ?, ?, ?)
+        ''', [(self.products[guid], unit_cost, remaining, remaining)
+              for unit_cost, remaining in item['cost_layers']])
+        self.copied_layers.add(self.products[guid])
+        self.report['products_added'] += 1
+
+    def add_layer(self, product_id: int, unit_cost: float, quantity: int):
+        """先进先出商品新增一个成本层"""
+        if quantity > 0 and product_id not in self.copied_layers and self.is_fifo(product_id):
+            self.conn.execute('''
+            INSERT INTO cost_layers (product_id, unit_cost, quantity, remaining)
+            VALUES (?, ?, ?, ?)
+            ''', (product_id, unit_cost, quantity, quantity))
+
+    def consume_layers(self, product_id: int, quantity: int):
+        """先进先出商品按入库顺序消耗成本层"""
+        if quantity > 0 and product_id not in self.copied_layers and self.is_fifo(product_id):
+            avg_price = self.conn.execute(
+                "SELECT avg_price FROM products WHERE id = ?", (product_id,)
+            ).fetchone()[0]
+            layers = FifoLayers(self.conn, product_id)
+            layers.consume(quantity, avg_price)
+            write_layers(self.conn.cursor(), [layers])
+
+    def is_fifo(self, product_id: int) -> bool:
+        row = self.conn.execute("SELECT costing_method FROM products WHERE id = ?", (product_id,)).fetchone()
+        return row is not None and row[0] == 'fifo'
+
+    def merge_adjustments(self, item: dict):
+        """应用对方各节点新增的手工修改数量（计入默认仓库）"""
+        product_id = self.product_id(item['guid'])
+        if product_id is None:
+            return
+        for origin, (total, version) in item['adjustments'].items():
+            if origin == self.node_id:
+                continue
+            row = self.conn.execute(
+                "SELECT total, version FROM sync_adjustments WHERE product_id = ? AND origin = ?",
+                (product_id, origin)
+            ).fetchone()
+            local_total, local_version = row or (0, 0)
+            if version <= local_version:
+                continue
+            change = total - local_total
+            self.conn.execute('''
+            INSERT OR REPLACE INTO sync_adjustments (product_id, origin, total, version)
+            VALUES (?, ?, ?, ?)
+            ''', (product_id, origin, total, version))
+            if change > 0:
+                _add_stock(self.conn, product_id, warehouses.DEFAULT_WAREHOUSE_ID, change)
+                # 与本地修改数量相同：增加的数量按商品价格新增成本层
+                price = self.conn.execute("SELECT price FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+                self.add_layer(product_id, price, change)
+            elif change < 0:
+                shortage = _remove_stock(self.conn, product_id, warehouses.DEFAULT_WAREHOUSE_ID, -change)
+                self.consume_layers(product_id, -change - shortage)
+                if shortage:
+                    self.conflict(f"商品 {item['name']} 的手工修改数量超过库存，少扣减 {shortage} 件")
+            self.report['adjustments'] += 1
+
+    def is_archived(self, created_at: str) -> bool:
+        return self.archived_until is not None and created_at <= self.archived_until
+
+    def add_price_history(self, item: dict):
+        """新增价格历史并累加成本汇总"""
+        if _find_row(self.conn, 'price_history', item['guid']) is not None or self.is_archived(item['created_at']):
+            self.report['duplicates'] += 1
+            return
+        product_id = self.product_id(item['product_guid'])
+        if product_id is None:
+            return
+        self.conn.execute('''
+        INSERT INTO price_history (product_id, price, quantity, created_at, guid)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (product_id, item['price'], item['quantity'], item['created_at'], item['guid']))
+        self.conn.execute('''
+        UPDATE products
+        SET cost_total = cost_total + ?,
+            cost_quantity = cost_quantity + ?
+        WHERE id = ?
+        ''', (item['price'] * item['quantity'], item['quantity'], product_id))
+        self.report['price_history'] += 1
+
+    def warehouse_id(self, code: Optional[str], name: Optional[str]) -> int:
+        """按编码对应本地仓库，本地没有时新建"""
+        if code is None:
+            return warehouses.DEFAULT_WAREHOUSE_ID
+        if code not in self.warehouses:
+            self.warehouses[code] = self.conn.execute(
+                "INSERT INTO warehouses (code, name) VALUES (?, ?)", (code, name or code)
+            ).lastrowid
+        return self.warehouses[code]
+
+    def add_record(self, item: dict):
+        """新增出入库记录并调整库存：入库按成本汇总重算平均价，出库库存不足时减到0为止"""
+        if _find_row(self.conn, 'inventory_records', item['guid']) is not None:
+            self.report['duplicates'] += 1
+            return
+        product_id = self.product_id(item['product_guid'])
+        if product_id is None:
+            self.conflict(f"出入库记录 {item['guid']} 的商品不存在，已跳过")
+            return
+        if self.is_archived(item['created_at']):
+            self.conflict(f"出入库记录 {item['guid']} 早于已归档的时间，已跳过")
+            return
+        warehouse_id = self.warehouse_id(item['warehouse_code'], item['warehouse_name'])
+        self.conn.execute('''
+        INSERT INTO inventory_records (product_id, type, quantity, price, cost_price, remark,
+                                       created_at, warehouse_id, guid)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (product_id, item['type'], item['quantity'], item['price'], item['cost_price'],
+              item['remark'], item['created_at'], warehouse_id, item['guid']))
+        if item['type'] == 'in':
+            _add_stock(self.conn, product_id, warehouse_id, item['quantity'])
+            self.add_layer(product_id, item['price'], item['quantity'])
+            # 与本地入库相同：按成本汇总重算平均价
+            self.conn.execute('''
+            UPDATE products
+            SET avg_price = ROUND(cost_total / cost_quantity, 1)
+            WHERE id = ? AND cost_quantity > 0
+            ''', (product_id,))
+            self.repriced.add(product_id)
+        else:
+            shortage = _remove_stock(self.conn, product_id, warehouse_id, item['quantity'])
+            self.consume_layers(product_id, item['quantity'] - shortage)
+            if shortage:
+                self.conflict(f"出库记录 {item['guid']} 超过当前库存，少扣减 {shortage} 件")
+        self.report['inventory_records'] += 1
+
+    def update_prices(self):
+        """价格取修改时间之后最近一次入库的价格（没有时保持修改的价格），两边按相同规则得到相同结果"""
+        for product_id in self.repriced:
+            self.conn.execute(f'''
+            UPDATE products
+            SET price = COALESCE((
+                SELECT r.price
+                FROM inventory_records r
+                WHERE r.product_id = products.id AND r.type = 'in'
+                  AND r.created_at >= datetime(COALESCE(products.edited_at, products.created_at), 'localtime')
+                ORDER BY r.created_at DESC, {_guid_expr('inventory_records', 'r')} DESC
+                LIMIT 1
+            ), price)
+            WHERE id = ?
+            ''', (product_id,))
+
+    def delete_product(self, item: dict):
+        """删除商品（本地在删除时间之后修改过的保留）"""
+        product_id = self.product_id(item['guid'])
+        if product_id is None:
+            return
+        row = self.conn.execute(
+            "SELECT name, COALESCE(edited_at, created_at) FROM products WHERE id = ?", (product_id,)
+        ).fetchone()
+        if row[1] > item['deleted_at']:
+            self.conflict(f"商品 {row[0]} 已被对方删除，但本地之后有修改，保留")
+            return
+        self.conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        self.products[item['guid']] = None
+        self.report['products_deleted'] += 1
+
+def import_changes(conn: sqlite3.Connection, bundle: dict) -> dict:
+    """合并一个变化包（由调用方管理事务），返回各类变化的数量和冲突说明"""
+    return _Importer(conn, bundle).run()
+
+def pull(target, source) -> dict:
+    """从 source 导出 target 尚未导入的变化并导入 target（两者均为 DatabaseManager）"""
+    since = peer_seq(target.conn, source.get_node_id())
+    bundle = source.export_changes(since, exclude_origin=target.get_node_id())
+    return target.import_changes(bundle)
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    import argparse
+    from .db_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="导出、导入增量变化包")
+    parser.add_argument('--db', default='inventory.db', help="数据库文件")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help="导出变化包")
+    export_parser.add_argument('--since', type=int, default=0, help="导出序号大于此值的变化")
+    export_parser.add_argument('--exclude-origin', help="不导出从该节点导入的变化（一般为接收方的节点ID）")
+    export_parser.add_argument('-o', '--output', required=True, help="变化包文件（.json.gz）")
+    import_parser = commands.add_parser('import', help="导入变化包")
+    import_parser.add_argument('bundles', nargs='+', help="变化包文件（按导出顺序）")
+    pull_parser = commands.add_parser('pull', help="从另一个数据库文件拉取尚未导入的变化")
+    pull_parser.add_argument('--source', required=True, help="来源数据库文件")
+    commands.add_parser('status', help="显示节点ID、最新序号和已导入的节点")
+    commands.add_parser('reset-node', help="重新生成节点ID（复制数据库文件后执行）")
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db)
+    reports: List[Tuple[str, dict]] = []
+    if args.command == 'export':
+        bundle = db.export_changes(args.since, exclude_origin=args.exclude_origin)
+        size = write_bundle(bundle, args.output)
+        print(f"已导出序号 {bundle['since']} ~ {bundle['until']} 的变化：{len(bundle['products'])} 个商品、"
+              f"{len(bundle['inventory_records'])} 条出入库记录、{len(bundle['price_history'])} 条价格历史、"
+              f"{len(bundle['deleted_products'])} 个删除，{size} 字节")
+    elif args.command == 'import':
+        reports = [(path, db.import_changes(read_bundle(path))) for path in args.bundles]
+    elif args.command == 'pull':
+        reports = [(args.source, pull(db, DatabaseManager(args.source)))]
+    elif args.command == 'reset-node':
+        print(f"新的节点ID: {reset_node_id(db.conn)}")
+    else:
+        print(f"节点ID: {db.get_node_id()}  最新序号: {last_seq(db.conn)}")
+        for peer in db.get_sync_peers():
+            print(f"  已导入 {peer['node_id']} 到序号 {peer['last_seq']}（{peer['imported_at']}）")
+
+    for source, report in reports:
+        print(f"{source}: 新增商品 {report['products_added']}，更新 {report['products_updated']}，"
+              f"删除 {report['products_deleted']}，出入库记录 {report['inventory_records']}，"
+              f"价格历史 {report['price_history']}，手工修改 {report['adjustments']}，"
+              f"已存在 {report['duplicates']}")
+        for message in report['conflicts']:
+            print(f"  冲突: {message}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
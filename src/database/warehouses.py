@@ -0,0 +1,162 @@
+"""
+多仓库库存模块
+
+warehouse_stock 以 (商品ID, 仓库ID) 为主键保存各仓库的库存，products.quantity 为各仓库合计。
+单个商品在某个仓库的库存是一次主键查找，某个仓库的全部库存通过 (仓库ID, 商品ID) 索引读取，
+查询耗时与仓库数量无关。库存变化均为带条件的相对更新，库存不会被并发写入覆盖或减为负数。
+"""
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from src.models.warehouse import Warehouse
+
+# 迁移前的库存和记录都属于默认仓库
+DEFAULT_WAREHOUSE_ID = 1
+
+def list_warehouses(conn: sqlite3.Connection) -> List[Warehouse]:
+    """全部仓库（按ID排序）"""
+    return [Warehouse(*row) for row in conn.execute("SELECT id, code, name FROM warehouses ORDER BY id")]
+
+def warehouse_ids(conn: sqlite3.Connection) -> Set[int]:
+    """全部仓库ID"""
+    return {row[0] for row in conn.execute("SELECT id FROM warehouses")}
+
+def load_stock(conn: sqlite3.Connection, product_ids: Iterable[int]) -> Dict[Tuple[int, int], int]:
+    """一次查询加载若干商品在各仓库的库存: {(商品ID, 仓库ID): 数量}"""
+    stock = {}
+    ids = list(dict.fromkeys(product_ids))
+    # 分块避免超过SQLite参数数量上限
+    for start in range(0, len(ids), 900):
+        chunk = ids[start:start + 900]
+        for product_id, warehouse_id, quantity in conn.execute(f'''
+        SELECT product_id, warehouse_id, quantity
+        FROM warehouse_stock
+        WHERE product_id IN ({', '.join('?' * len(chunk))})
+        ''', chunk):
+            stock[(product_id, warehouse_id)] = quantity
+    return stock
+
+def change_stock(conn: sqlite3.Connection, product_id: int, warehouse_id: int, change: int):
+    """按变化量调整商品在某个仓库的库存（由调用方管理事务），减少后为负时抛出 ValueError"""
+    if change > 0:
+        conn.execute('''
+        INSERT INTO warehouse_stock (product_id, warehouse_id, quantity)
+        VALUES (?, ?, ?)
+        ON CONFLICT (product_id, warehouse_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            updated_at = CURRENT_TIMESTAMP
+        ''', (product_id, warehouse_id, change))
+    elif change < 0:
+        cursor = conn.execute('''
+        UPDATE warehouse_stock
+        SET quantity = quantity + ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE product_id = ? AND warehouse_id = ? AND quantity + ? >= 0
+        ''', (change, product_id, warehouse_id, change))
+        if cursor.rowcount == 0:
+            raise ValueError("仓库库存不足")
+
+def adjustment_warehouse(conn: sqlite3.Connection, product_id: int, warehouse_id: Optional[int],
+                         change: int) -> int:
+    """确定手工修改库存数量计入的仓库，无法修改时抛出 ValueError
+
+    未指定仓库时：库存只在一个仓库的计入该仓库，没有库存的计入默认仓库，分布在多个仓库时必须指定仓库。
+    """
+    stock = get_product_stock(conn, product_id)
+    if warehouse_id is None:
+        if len(stock) > 1:
+            raise ValueError("商品库存分布在多个仓库，请指定修改数量的仓库")
+        warehouse_id = next(iter(stock), DEFAULT_WAREHOUSE_ID)
+    elif warehouse_id not in warehouse_ids(conn):
+        raise ValueError(f"仓库 {warehouse_id} 不存在")
+    if change < 0 and stock.get(warehouse_id, 0) < -change:
+        raise ValueError(f"仓库库存不足，该仓库只有 {stock.get(warehouse_id, 0)} 件")
+    return warehouse_id
+
+def get_stock_level(conn: sqlite3.Connection, product_id: int, warehouse_id: Optional[int] = None) -> int:
+    """商品在某个仓库的库存（warehouse_id 为空时为各仓库合计）"""
+    if warehouse_id is None:
+        row = conn.execute("SELECT quantity FROM products WHERE id = ?", (product_id,)).fetchone()
+    else:
+        row = conn.execute(
+            "SELECT quantity FROM warehouse_stock WHERE product_id = ? AND warehouse_id = ?",
+            (product_id, warehouse_id)
+        ).fetchone()
+    return row[0] if row else 0
+
+def get_product_stock(conn: sqlite3.Connection, product_id: int) -> Dict[int, int]:
+    """商品在各仓库的库存: {仓库ID: 数量}（不含库存为0的仓库）"""
+    return dict(conn.execute('''
+    SELECT warehouse_id, quantity
+    FROM warehouse_stock
+    WHERE product_id = ? AND quantity > 0
+    ORDER BY warehouse_id
+    ''', (product_id,)).fetchall())
+
+def get_warehouse_stock(conn: sqlite3.Connection, warehouse_id: int,
+                        limit: Optional[int] = None) -> List[dict]:
+    """某个仓库中有库存的商品，按商品名称排序"""
+    rows = conn.execute('''
+    SELECT s.product_id, p.name, s.quantity
+    FROM warehouse_stock s
+    JOIN products p ON p.id = s.product_id
+    WHERE s.warehouse_id = ? AND s.quantity > 0
+    ORDER BY p.name, s.product_id
+    LIMIT ?
+    ''', (warehouse_id, limit if limit is not None else -1)).fetchall()
+    return [{'product_id': row[0], 'name': row[1], 'quantity': row[2]} for row in rows]
+
+def get_stock_rollup(conn: sqlite3.Connection, product_ids: Optional[Iterable[int]] = None) -> List[dict]:
+    """从 stock_rollup 视图汇总各商品的合计库存及各仓库库存（按仓库编码），按商品名称排序"""
+    conditions = ["quantity > 0"]
+    params = []
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        conditions.append(f"product_id IN ({', '.join('?' * len(product_ids))})")
+        params.extend(product_ids)
+    rollup = {}
+    for product_id, name, code, quantity, total in conn.execute(f'''
+    SELECT product_id, product_name, warehouse_code, quantity, total_quantity
+    FROM stock_rollup
+    WHERE {' AND '.join(conditions)}
+    ORDER BY product_name, product_id, warehouse_id
+    ''', params):
+        item = rollup.get(product_id)
+        if item is None:
+            item = rollup[product_id] = {
+                'product_id': product_id, 'name': name, 'total': total, 'warehouses': {},
+            }
+        item['warehouses'][code] = quantity
+    return list(rollup.values())
+
+def record_transfer(conn: sqlite3.Connection, product_id: int, from_warehouse_id: int,
+                    to_warehouse_id: int, quantity: int, remark: str = "") -> int:
+    """在仓库间调拨库存并记录（由调用方管理事务），调出仓库库存不足时抛出 ValueError"""
+    change_stock(conn, product_id, from_warehouse_id, -quantity)
+    change_stock(conn, product_id, to_warehouse_id, quantity)
+    return conn.execute('''
+    INSERT INTO stock_transfers (product_id, from_warehouse_id, to_warehouse_id, quantity, remark)
+    VALUES (?, ?, ?, ?, ?)
+    ''', (product_id, from_warehouse_id, to_warehouse_id, quantity, remark)).lastrowid
+
+def get_transfers(conn: sqlite3.Connection, product_id: Optional[int] = None,
+                  limit: int = 100) -> List[dict]:
+    """最近的调拨记录（按时间倒序）"""
+    condition = "WHERE t.product_id = ?" if product_id is not None else ""
+    params = [product_id] if product_id is not None else []
+    rows = conn.execute(f'''
+    SELECT t.id, t.product_id, p.name, t.from_warehouse_id, t.to_warehouse_id, t.quantity,
+           t.remark, t.created_at
+    FROM stock_transfers t
+    LEFT JOIN products p ON p.id = t.product_id
+    {condition}
+    ORDER BY t.created_at DESC, t.id DESC
+    LIMIT ?
+    ''', params + [limit]).fetchall()
+    return [
+        {
+            'id': row[0], 'product_id': row[1], 'product_name': row[2],
+            'from_warehouse_id': row[3], 'to_warehouse_id': row[4], 'quantity': row[5],
+            'remark': row[6], 'created_at': row[7],
+        }
+        for row in rows
+    ]
\ No newline at end of file
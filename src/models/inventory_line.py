@@ -0,0 +1,20 @@
+"""
+出入库明细行模型
+"""
+from dataclasses import dataclass
+from typing import Optional, Literal
+
+@dataclass
+class InventoryLine:
+    """出入库明细行类（用于批量出入库）"""
+    product_id: int
+    type: Literal['in', 'out']
+    quantity: int
+    price: Optional[float] = None
+    remark: str = ""
+    warehouse_id: Optional[int] = None  # 为空时使用默认仓库
+
+    @property
+    def type_text(self) -> str:
+        """操作类型文本"""
+        return "入库" if self.type == "in" else "出库"
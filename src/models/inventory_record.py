@@ -1,22 +1,69 @@
 """
 出入库记录模型
 """
-from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Literal
+from typing import Optional, Literal, Union
+from .timestamp import parse_timestamp, format_timestamp
 
-@dataclass
 class InventoryRecord:
-    """出入库记录类"""
-    id: Optional[int]
-    product_id: int
-    product_name: str
-    type: Literal['in', 'out']
-    quantity: int
-    price: Optional[float]
-    cost_price: Optional[float]
-    remark: str
-    created_at: datetime
+    """出入库记录类
+
+    使用 __slots__ 减少内存占用；created_at 可以传入数据库中的时间文本，
+    首次访问时才解析为 datetime，导出和显示时直接使用原文本。
+    """
+    __slots__ = ('id', 'product_id', 'product_name', 'type', 'quantity',
+                 'price', 'cost_price', 'remark', '_created_at')
+
+    FIELDS = ('id', 'product_id', 'product_name', 'type', 'quantity',
+              'price', 'cost_price', 'remark', 'created_at')
+
+    def __init__(self, id: Optional[int], product_id: int, product_name: str,
+                 type: Literal['in', 'out'], quantity: int, price: Optional[float],
+                 cost_price: Optional[float], remark: str,
+                 created_at: Union[datetime, str]):
+        self.id = id
+        self.product_id = product_id
+        self.product_name = product_name
+        self.type = type
+        self.quantity = quantity
+        self.price = price
+        self.cost_price = cost_price
+        self.remark = remark
+        self._created_at = created_at
+
+    @property
+    def created_at(self) -> datetime:
+        """操作时间"""
+        value = self._created_at
+        if isinstance(value, str):
+            value = self._created_at = parse_timestamp(value)
+        return value
+
+    @created_at.setter
+    def created_at(self, value: Union[datetime, str]):
+        self._created_at = value
+
+    @property
+    def created_at_text(self) -> str:
+        """操作时间文本（未解析时直接返回数据库中的文本）"""
+        return format_timestamp(self._created_at)
+
+    def replace(self, **changes) -> 'InventoryRecord':
+        """返回修改了指定字段的副本"""
+        values = {field: getattr(self, field) for field in self.FIELDS}
+        values.update(changes)
+        return InventoryRecord(**values)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"InventoryRecord({fields})"
 
     @property
     def type_text(self) -> str:
@@ -37,16 +84,26 @@ class InventoryRecord:
             return (self.price - self.cost_price) * self.quantity
         return None
 
+    def to_row(self) -> tuple:
+        """转换为导出行，字段顺序与 EXPORT_COLUMNS 一致"""
+        profit = self.profit
+        total_price = self.total_price
+        return (
+            self.created_at_text,
+            self.product_name,
+            self.type_text,
+            self.quantity,
+            f"{self.price:.2f}" if self.price is not None else "-",
+            f"{self.cost_price:.2f}" if self.cost_price is not None else "-",
+            f"{total_price:.2f}" if total_price != 0 else "-",
+            f"{profit:.2f}" if profit is not None else "-",
+            self.remark or "-"
+        )
+
     def to_dict(self) -> dict:
         """转换为字典，用于导出"""
-        return {
-            '时间': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            '商品名称': self.product_name,
-            '类型': self.type_text,
-            '数量': self.quantity,
-            '单价': f"{self.price:.2f}" if self.price is not None else "-",
-            '成本价': f"{self.cost_price:.2f}" if self.cost_price is not None else "-",
-            '总价': f"{self.total_price:.2f}" if self.total_price != 0 else "-",
-            '毛利': f"{self.profit:.2f}" if self.profit is not None else "-",
-            '备注': self.remark or "-"
-        } 
\ No newline at end of file
+        return dict(zip(EXPORT_COLUMNS, self.to_row()))
+
+
+# 导出列名
+EXPORT_COLUMNS = ('时间', '商品名称', '类型', '数量', '单价', '成本价', '总价', '毛利', '备注')
@@ -1,21 +1,89 @@
 """
 商品模型
 """
-from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
+from .timestamp import parse_timestamp, format_timestamp
 
-@dataclass
 class Product:
-    """商品类"""
-    id: Optional[int]
-    name: str
-    quantity: int
-    price: float
-    avg_price: float
-    description: str
-    created_at: datetime
-    updated_at: datetime
+    """商品类
+
+    使用 __slots__ 减少内存占用；created_at/updated_at 可以传入数据库中的时间文本，
+    首次访问时才解析为 datetime。
+    costing_method 为出库成本计算方式：'average'（加权平均）或 'fifo'（先进先出）；
+    barcode 为条码/SKU（未设置时为 None）。
+    """
+    __slots__ = ('id', 'name', 'quantity', 'price', 'avg_price', 'description',
+                 '_created_at', '_updated_at', 'costing_method', 'barcode')
+
+    FIELDS = ('id', 'name', 'quantity', 'price', 'avg_price', 'description',
+              'created_at', 'updated_at', 'costing_method', 'barcode')
+
+    def __init__(self, id: Optional[int], name: str, quantity: int, price: float,
+                 avg_price: float, description: str,
+                 created_at: Union[datetime, str], updated_at: Union[datetime, str],
+                 costing_method: str = 'average', barcode: Optional[str] = None):
+        self.id = id
+        self.name = name
+        self.quantity = quantity
+        self.price = price
+        self.avg_price = avg_price
+        self.description = description
+        self._created_at = created_at
+        self._updated_at = updated_at
+        self.costing_method = costing_method
+        self.barcode = barcode
+
+    @property
+    def created_at(self) -> datetime:
+        """创建时间"""
+        value = self._created_at
+        if isinstance(value, str):
+            value = self._created_at = parse_timestamp(value)
+        return value
+
+    @created_at.setter
+    def created_at(self, value: Union[datetime, str]):
+        self._created_at = value
+
+    @property
+    def updated_at(self) -> datetime:
+        """更新时间"""
+        value = self._updated_at
+        if isinstance(value, str):
+            value = self._updated_at = parse_timestamp(value)
+        return value
+
+    @updated_at.setter
+    def updated_at(self, value: Union[datetime, str]):
+        self._updated_at = value
+
+    @property
+    def created_at_text(self) -> str:
+        """创建时间文本（未解析时直接返回数据库中的文本）"""
+        return format_timestamp(self._created_at)
+
+    @property
+    def updated_at_text(self) -> str:
+        """更新时间文本（未解析时直接返回数据库中的文本）"""
+        return format_timestamp(self._updated_at)
+
+    def replace(self, **changes) -> 'Product':
+        """返回修改了指定字段的副本"""
+        values = {field: getattr(self, field) for field in self.FIELDS}
+        values.update(changes)
+        return Product(**values)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"Product({fields})"
 
     @property
     def price_display(self) -> str:
@@ -28,4 +96,4 @@ class Product:
     @property
     def has_high_avg_price(self) -> bool:
         """判断是否均价高于当前价格"""
-        return self.avg_price > self.price 
\ No newline at end of file
+        return self.avg_price > self.price
@@ -0,0 +1,40 @@
+"""
+利润统计模型
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class ProfitSummary:
+    """利润统计类（某一时间段、某一商品或全部商品的汇总）"""
+    period: str
+    product_id: Optional[int]
+    product_name: Optional[str]
+    units_in: int
+    units_out: int
+    purchase_amount: float
+    revenue: float
+    cogs: float
+    profit: float
+    record_count: int
+
+    @property
+    def margin(self) -> Optional[float]:
+        """毛利率（无销售额时为None）"""
+        if not self.revenue:
+            return None
+        return self.profit / self.revenue
+
+    def to_dict(self) -> dict:
+        """转换为字典，用于导出"""
+        return {
+            '期间': self.period,
+            '商品名称': self.product_name or "全部",
+            '入库数量': self.units_in,
+            '出库数量': self.units_out,
+            '入库金额': f"{self.purchase_amount:.2f}",
+            '销售额': f"{self.revenue:.2f}",
+            '销售成本': f"{self.cogs:.2f}",
+            '毛利': f"{self.profit:.2f}",
+            '毛利率': f"{self.margin:.1%}" if self.margin is not None else "-"
+        }
@@ -0,0 +1,83 @@
+"""
+出入库记录列式结果集
+"""
+import math
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence
+from .inventory_record import InventoryRecord
+from .timestamp import from_epoch
+
+NAN = float('nan')
+
+class RecordColumns:
+    """出入库记录列式结果集类
+
+    数值列保存在 array 中（每条记录几十字节），商品名称去重共享，
+    适合一次性读取大量记录做统计；按下标访问时才创建 InventoryRecord。
+    时间保存为本地时间按 UTC 换算的秒数。
+    """
+    __slots__ = ('ids', 'product_ids', 'product_names', 'is_out', 'quantities',
+                 'prices', 'cost_prices', 'remarks', 'created_at', '_names')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.product_ids = array('q')
+        self.product_names: List[str] = []
+        self.is_out = array('b')
+        self.quantities = array('q')
+        self.prices = array('d')  # 空值为 NaN
+        self.cost_prices = array('d')  # 空值为 NaN
+        self.remarks: List[Optional[str]] = []
+        self.created_at = array('q')
+        self._names: Dict[str, str] = {}
+
+    def append_rows(self, rows: Sequence[tuple]):
+        """追加数据库行：(id, product_id, 商品名称, type, quantity, price, cost_price, remark, 时间秒数)"""
+        names = self._names
+        for row in rows:
+            self.ids.append(row[0])
+            self.product_ids.append(row[1])
+            self.product_names.append(names.setdefault(row[2], row[2]))
+            self.is_out.append(row[3] == 'out')
+            self.quantities.append(row[4])
+            self.prices.append(NAN if row[5] is None else row[5])
+            self.cost_prices.append(NAN if row[6] is None else row[6])
+            self.remarks.append(row[7] or None)
+            self.created_at.append(row[8])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> InventoryRecord:
+        price = self.prices[index]
+        cost_price = self.cost_prices[index]
+        return InventoryRecord(
+            id=self.ids[index],
+            product_id=self.product_ids[index],
+            product_name=self.product_names[index],
+            type='out' if self.is_out[index] else 'in',
+            quantity=self.quantities[index],
+            price=None if math.isnan(price) else price,
+            cost_price=None if math.isnan(cost_price) else cost_price,
+            remark=self.remarks[index] or "",
+            created_at=from_epoch(self.created_at[index])
+        )
+
+    def __iter__(self) -> Iterator[InventoryRecord]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def total_profit(self) -> float:
+        """出库毛利合计（与 InventoryRecord.profit 规则一致）"""
+        total = 0.0
+        for is_out, quantity, price, cost_price in zip(
+                self.is_out, self.quantities, self.prices, self.cost_prices):
+            if is_out and not math.isnan(price) and not math.isnan(cost_price):
+                total += (price - cost_price) * quantity
+        return total
+
+    def total_quantity(self, type: str) -> int:
+        """入库或出库数量合计"""
+        want_out = type == 'out'
+        return sum(quantity for is_out, quantity in zip(self.is_out, self.quantities)
+                   if bool(is_out) == want_out)
@@ -0,0 +1,32 @@
+"""
+时间戳转换工具
+"""
+from datetime import datetime, timedelta
+from typing import Union
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 本地时间按 UTC 换算出的秒数（不含时区）以此为起点
+EPOCH = datetime(1970, 1, 1)
+
+
+def parse_timestamp(value: Union[str, datetime]) -> datetime:
+    """将数据库中的时间文本转换为 datetime（fromisoformat 比 strptime 快一个数量级）"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def format_timestamp(value: Union[str, datetime]) -> str:
+    """格式化时间；数据库中的时间文本已是目标格式，直接返回"""
+    if isinstance(value, str):
+        return value
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def from_epoch(seconds: int) -> datetime:
+    """将不含时区的秒数转换回 datetime"""
+    return EPOCH + timedelta(seconds=seconds)
@@ -0,0 +1,11 @@
+"""
+仓库模型
+"""
+from dataclasses import dataclass
+
+@dataclass
+class Warehouse:
+    """仓库类"""
+    id: int
+    code: str
+    name: str
@@ -0,0 +1,3 @@
+"""
+Server package initialization
+"""
\ No newline at end of file
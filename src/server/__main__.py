@@ -0,0 +1,7 @@
+"""
+库存 HTTP 服务入口
+"""
+from .app import main
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
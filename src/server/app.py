@@ -0,0 +1,569 @@
+"""
+库存 HTTP 服务
+
+多个收银终端通过 HTTP/JSON 访问同一个库存数据库：
+读请求在线程池中并发执行（WAL 模式下读写互不阻塞）；
+写请求进入队列，由唯一的写线程按到达顺序执行，写线程忙碌期间到达的出入库单合并到一个事务中提交。
+"""
+import argparse
+import asyncio
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from urllib.parse import unquote
+from src.database.costing import COSTING_METHODS
+from src.database.db_manager import DatabaseManager
+from src.models.inventory_line import InventoryLine
+from .protocol import HTTPError, Request, build_response, read_request
+
+# 可以合并提交的写操作
+GROUP_METHOD = 'process_inventory_batch'
+
+def product_to_json(product) -> dict:
+    """商品转换为 JSON 对象"""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'quantity': product.quantity,
+        'price': product.price,
+        'avg_price': product.avg_price,
+        'description': product.description,
+        'costing_method': product.costing_method,
+        'barcode': product.barcode,
+        'created_at': product.created_at_text,
+        'updated_at': product.updated_at_text,
+    }
+
+def record_to_json(record) -> dict:
+    """出入库记录转换为 JSON 对象"""
+    return {
+        'id': record.id,
+        'product_id': record.product_id,
+        'product_name': record.product_name,
+        'type': record.type,
+        'quantity': record.quantity,
+        'price': record.price,
+        'cost_price': record.cost_price,
+        'profit': record.profit,
+        'remark': record.remark,
+        'created_at': record.created_at_text,
+    }
+
+def encode_cursor(cursor: Optional[Tuple[str, int]]) -> Optional[str]:
+    """分页游标转换为字符串"""
+    if cursor is None:
+        return None
+    return f"{cursor[0]}|{cursor[1]}"
+
+def decode_cursor(text: str) -> Tuple[str, int]:
+    """解析分页游标字符串"""
+    created_at, _, id = text.rpartition('|')
+    try:
+        return created_at, int(id)
+    except ValueError:
+        raise HTTPError(400, "无效的分页游标")
+
+def parse_line(data) -> InventoryLine:
+    """解析一行出入库明细"""
+    try:
+        price = data.get('price')
+        warehouse_id = data.get('warehouse_id')
+        return InventoryLine(
+            product_id=int(data['product_id']),
+            type=str(data['type']),
+            quantity=int(data['quantity']),
+            price=float(price) if price is not None else None,
+            remark=str(data.get('remark') or ""),
+            warehouse_id=int(warehouse_id) if warehouse_id is not None else None
+        )
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise HTTPError(400, "无效的出入库明细")
+
+class InventoryServer:
+    """库存 HTTP 服务类"""
+    def __init__(self, db_path: str = 'inventory.db', host: str = '127.0.0.1', port: int = 8080,
+                 read_workers: int = 4, max_batch: int = 64, batch_wait: float = 0.0):
+        # batch_wait：写线程空闲时收到出入库单后额外等待的秒数，用于凑批（默认不等待）
+        self.db = DatabaseManager(db_path)
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'writes': 0,
+            'write_batches': 0,
+            'group_commits': 0,
+        }
+
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='db-read')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-write')
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task = None
+        self._server = None
+
+        self.routes = [
+            (method, re.compile(pattern), handler)
+            for method, pattern, handler in (
+                ('GET', r'/products', self.list_products),
+                ('GET', r'/products/search', self.search_products),
+                ('GET', r'/products/barcode/([^/]+)', self.get_product_by_barcode),
+                ('GET', r'/products/(\d+)', self.get_product),
+                ('GET', r'/products/(\d+)/stock', self.get_product_stock),
+                ('POST', r'/products', self.add_product),
+                ('PUT', r'/products/(\d+)', self.update_product),
+                ('DELETE', r'/products/(\d+)', self.delete_product),
+                ('POST', r'/inventory', self.process_inventory),
+                ('POST', r'/transfers', self.transfer_stock),
+                ('GET', r'/transfers', self.list_transfers),
+                ('GET', r'/warehouses', self.list_warehouses),
+                ('POST', r'/warehouses', self.add_warehouse),
+                ('GET', r'/warehouses/(\d+)/stock', self.get_warehouse_stock),
+                ('GET', r'/records', self.list_records),
+                ('GET', r'/reports/totals', self.report_totals),
+                ('GET', r'/reports/stock', self.report_stock),
+                ('GET', r'/reports/valuation', self.report_valuation),
+                ('GET', r'/reports/stock-rollup', self.report_stock_rollup),
+                ('GET', r'/stats', self.get_stats),
+            )
+        ]
+
+    async def start(self):
+        """开始监听（port 为 0 时自动分配端口）"""
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._write_loop())
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """启动并持续运行服务"""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """停止服务：不再接受连接，处理完已排队的写请求后退出"""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._writer_task is not None:
+            self._write_queue.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+        self._readers.shutdown(wait=False)
+        self._writer.shutdown(wait=True)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接（支持长连接，同一连接上的请求依次处理）"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    writer.write(build_response(e.status, {'error': e.message}, keep_alive=False))
+                    break
+                except (asyncio.IncompleteReadError, ValueError):
+                    break
+                if request is None:
+                    break
+
+                status, payload = await self.dispatch(request)
+                writer.write(build_response(status, payload, request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request) -> Tuple[int, object]:
+        """按路径和方法调用处理函数"""
+        self.stats['requests'] += 1
+        path_matched = False
+        try:
+            for method, pattern, handler in self.routes:
+                match = pattern.fullmatch(request.path)
+                if not match:
+                    continue
+                path_matched = True
+                if method == request.method:
+                    return await handler(request, *match.groups())
+            if path_matched:
+                raise HTTPError(405, "不支持的请求方法")
+            raise HTTPError(404, "路径不存在")
+        except HTTPError as e:
+            self.stats['errors'] += 1
+            return e.status, {'error': e.message}
+        except Exception as e:
+            self.stats['errors'] += 1
+            return 500, {'error': f"服务器错误: {str(e)}"}
+
+    async def read(self, func, *args, **kwargs):
+        """在读线程池中执行查询"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(func, *args, **kwargs))
+
+    async def write(self, method: str, *args, **kwargs):
+        """把写操作交给写线程，等待执行结果"""
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((method, args, kwargs, future))
+        return await future
+
+    async def _write_loop(self):
+        """写队列处理：每次取出所有已排队的写请求交给写线程执行"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._write_queue.get()
+            if job is None:
+                return
+            if self.batch_wait > 0 and job[0] == GROUP_METHOD:
+                await asyncio.sleep(self.batch_wait)
+
+            jobs = [job]
+            stopping = False
+            while len(jobs) < self.max_batch:
+                try:
+                    job = self._write_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                jobs.append(job)
+
+            try:
+                outcomes, group_commits = await loop.run_in_executor(self._writer, self._run_writes, jobs)
+            except Exception as e:
+                outcomes, group_commits = [(False, e)] * len(jobs), 0
+
+            self.stats['writes'] += len(jobs)
+            self.stats['write_batches'] += 1
+            self.stats['group_commits'] += group_commits
+            for (_, _, _, future), (ok, value) in zip(jobs, outcomes):
+                if future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            if stopping:
+                return
+
+    def _run_writes(self, jobs):
+        """写线程：依次执行写请求，相邻的出入库单合并到一个事务中
+
+        返回 ([(是否成功, 结果或异常), ...], 合并提交次数)。
+        """
+        outcomes = []
+        group_commits = 0
+        index = 0
+        while index < len(jobs):
+            method, args, kwargs, _ = jobs[index]
+            if method == GROUP_METHOD:
+                batches = []
+                while index < len(jobs) and jobs[index][0] == GROUP_METHOD:
+                    batches.append(jobs[index][1][0])
+                    index += 1
+                if len(batches) == 1:
+                    results = [self.db.process_inventory_batch(batches[0])]
+                else:
+                    results = self.db.process_inventory_group(batches)
+                    group_commits += 1
+                outcomes.extend((True, result) for result in results)
+                continue
+
+            try:
+                outcomes.append((True, getattr(self.db, method)(*args, **kwargs)))
+            except Exception as e:
+                outcomes.append((False, e))
+            index += 1
+        return outcomes, group_commits
+
+    @staticmethod
+    def _int_param(query: dict, name: str, default: Optional[int] = None) -> Optional[int]:
+        """读取整数查询参数"""
+        value = query.get(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise HTTPError(400, f"参数 {name} 必须为整数")
+
+    @staticmethod
+    def _product_fields(data: dict, required: bool) -> dict:
+        """解析商品字段（required 为 True 时名称、数量、价格必填）"""
+        if not isinstance(data, dict):
+            raise HTTPError(400, "请求体必须为JSON对象")
+        fields = {}
+        try:
+            if data.get('name') is not None:
+                fields['name'] = str(data['name']).strip()
+            if data.get('quantity') is not None:
+                fields['quantity'] = int(data['quantity'])
+            if data.get('price') is not None:
+                fields['price'] = float(data['price'])
+            if data.get('description') is not None:
+                fields['description'] = str(data['description'])
+            if data.get('costing_method') is not None:
+                fields['costing_method'] = str(data['costing_method'])
+            if data.get('barcode') is not None:
+                fields['barcode'] = str(data['barcode']).strip()
+        except (TypeError, ValueError):
+            raise HTTPError(400, "无效的商品信息")
+
+        if required and not all(key in fields for key in ('name', 'quantity', 'price')):
+            raise HTTPError(400, "商品名称、数量和价格不能为空")
+        if 'name' in fields and not fields['name']:
+            raise HTTPError(400, "商品名称不能为空")
+        if fields.get('quantity', 0) < 0 or fields.get('price', 0) < 0:
+            raise HTTPError(400, "数量和价格不能为负数")
+        if fields.get('costing_method', 'average') not in COSTING_METHODS:
+            raise HTTPError(400, "成本计算方式必须为 average 或 fifo")
+        return fields
+
+    async def list_products(self, request: Request):
+        """GET /products：全部商品"""
+        products = await self.read(self.db.get_all_products)
+        return 200, [product_to_json(product) for product in products]
+
+    async def search_products(self, request: Request):
+        """GET /products/search?q=关键字&limit=50：搜索商品"""
+        keyword = request.query.get('q', '').strip()
+        if not keyword:
+            raise HTTPError(400, "搜索关键字不能为空")
+        limit = self._int_param(request.query, 'limit', 50)
+        products = await self.read(self.db.search_products, keyword, limit)
+        return 200, [product_to_json(product) for product in products]
+
+    async def get_product(self, request: Request, id: str):
+        """GET /products/<id>：单个商品"""
+        product = await self.read(self.db.get_product, int(id))
+        if product is None:
+            raise HTTPError(404, "商品不存在")
+        return 200, product_to_json(product)
+
+    async def get_product_by_barcode(self, request: Request, barcode: str):
+        """GET /products/barcode/<条码>：按条码精确查找商品"""
+        product = await self.read(self.db.get_product_by_barcode, unquote(barcode))
+        if product is None:
+            raise HTTPError(404, "商品不存在")
+        return 200, product_to_json(product)
+
+    async def _check_barcode(self, fields: dict, product_id: Optional[int] = None):
+        """条码已被其他商品使用时返回 409"""
+        if fields.get('barcode'):
+            product = await self.read(self.db.get_product_by_barcode, fields['barcode'])
+            if product is not None and product.id != product_id:
+                raise HTTPError(409, f"条码 {fields['barcode']} 已被其他商品使用")
+
+    async def add_product(self, request: Request):
+        """POST /products：添加商品"""
+        fields = self._product_fields(request.json(), required=True)
+        await self._check_barcode(fields)
+        product_id = await self.write('add_product', **fields)
+        return 201, {'id': product_id}
+
+    async def update_product(self, request: Request, id: str):
+        """PUT /products/<id>：修改商品（只修改传入的字段，修改 quantity 时可用 warehouse_id 指定仓库）"""
+        data = request.json()
+        fields = self._product_fields(data, required=False)
+        if data.get('warehouse_id') is not None:
+            try:
+                fields['warehouse_id'] = int(data['warehouse_id'])
+            except (TypeError, ValueError):
+                raise HTTPError(400, "无效的仓库ID")
+        product = await self.read(self.db.get_product, int(id))
+        if product is None:
+            raise HTTPError(404, "商品不存在")
+        await self._check_barcode(fields, int(id))
+        try:
+            updated = await self.write('update_product', int(id), **fields)
+        except ValueError as e:
+            # 库存分布在多个仓库、仓库不存在或库存不足
+            raise HTTPError(422, str(e))
+        return 200, {'updated': updated}
+
+    async def delete_product(self, request: Request, id: str):
+        """DELETE /products/<id>：删除商品"""
+        deleted = await self.write('delete_product', int(id))
+        if not deleted:
+            raise HTTPError(404, "商品不存在")
+        return 200, {'deleted': True}
+
+    async def process_inventory(self, request: Request):
+        """POST /inventory：出入库
+
+        请求体为单行明细 {"product_id", "type", "quantity", "price", "remark", "warehouse_id"}，
+        或整单 {"lines": [明细, ...]}（整单成功或整单失败）。
+        """
+        data = request.json()
+        if isinstance(data, dict) and 'lines' in data:
+            if not isinstance(data['lines'], list):
+                raise HTTPError(400, "lines 必须为数组")
+            lines = [parse_line(line) for line in data['lines']]
+        else:
+            lines = [parse_line(data)]
+
+        success, message, results = await self.write(GROUP_METHOD, lines)
+        return (200 if success else 422), {
+            'success': success,
+            'message': message,
+            'results': [{'success': ok, 'message': text} for ok, text in results],
+        }
+
+    async def transfer_stock(self, request: Request):
+        """POST /transfers：仓库间调拨 {"product_id", "from_warehouse_id", "to_warehouse_id", "quantity", "remark"}"""
+        data = request.json()
+        try:
+            args = (int(data['product_id']), int(data['from_warehouse_id']),
+                    int(data['to_warehouse_id']), int(data['quantity']), str(data.get('remark') or ""))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise HTTPError(400, "无效的调拨信息")
+        success, message = await self.write('transfer_stock', *args)
+        return (200 if success else 422), {'success': success, 'message': message}
+
+    async def list_transfers(self, request: Request):
+        """GET /transfers：最近的调拨记录（参数：product_id、limit）"""
+        product_id = self._int_param(request.query, 'product_id')
+        limit = min(max(self._int_param(request.query, 'limit', 100), 1), 1000)
+        return 200, await self.read(self.db.get_transfers, product_id, limit)
+
+    async def list_warehouses(self, request: Request):
+        """GET /warehouses：全部仓库"""
+        warehouses = await self.read(self.db.get_warehouses)
+        return 200, [{'id': item.id, 'code': item.code, 'name': item.name} for item in warehouses]
+
+    async def add_warehouse(self, request: Request):
+        """POST /warehouses：添加仓库 {"code", "name"}"""
+        data = request.json()
+        if not isinstance(data, dict) or not str(data.get('code') or '').strip() \
+                or not str(data.get('name') or '').strip():
+            raise HTTPError(400, "仓库编码和名称不能为空")
+        code = str(data['code']).strip()
+        existing = await self.read(self.db.get_warehouses)
+        if any(item.code == code for item in existing):
+            raise HTTPError(409, f"仓库编码 {code} 已存在")
+        warehouse_id = await self.write('add_warehouse', code, str(data['name']).strip())
+        return 201, {'id': warehouse_id}
+
+    async def get_warehouse_stock(self, request: Request, id: str):
+        """GET /warehouses/<id>/stock：仓库中有库存的商品（参数：limit）"""
+        limit = self._int_param(request.query, 'limit')
+        return 200, await self.read(self.db.get_warehouse_stock, int(id), limit)
+
+    async def get_product_stock(self, request: Request, id: str):
+        """GET /products/<id>/stock：商品在各仓库的库存"""
+        product = await self.read(self.db.get_product, int(id))
+        if product is None:
+            raise HTTPError(404, "商品不存在")
+        stock = await self.read(self.db.get_product_stock, int(id))
+        return 200, {
+            'product_id': product.id,
+            'total': product.quantity,
+            'warehouses': [{'warehouse_id': key, 'quantity': value} for key, value in stock.items()],
+        }
+
+    async def list_records(self, request: Request):
+        """GET /records：出入库记录（键集分页）
+
+        参数：limit、after（上一页返回的 next）、order=asc|desc、type、product_id、warehouse_id、start、end、remark。
+        """
+        query = request.query
+        limit = min(max(self._int_param(query, 'limit', 100), 1), 1000)
+        filters = {}
+        if 'type' in query:
+            if query['type'] not in ('in', 'out'):
+                raise HTTPError(400, "type 只能为 in 或 out")
+            filters['types'] = [query['type']]
+        if 'product_id' in query:
+            filters['product_ids'] = [self._int_param(query, 'product_id')]
+        if 'warehouse_id' in query:
+            filters['warehouse_ids'] = [self._int_param(query, 'warehouse_id')]
+        for name in ('start', 'end', 'remark'):
+            if name in query:
+                filters[name] = query[name]
+        after = decode_cursor(query['after']) if 'after' in query else None
+        descending = query.get('order', 'desc') != 'asc'
+
+        records, cursor = await self.read(
+            self.db.get_inventory_records_page, limit, after, descending, **filters
+        )
+        return 200, {
+            'records': [record_to_json(record) for record in records],
+            'next': encode_cursor(cursor),
+        }
+
+    async def report_totals(self, request: Request):
+        """GET /reports/totals：全部历史的利润合计"""
+        summary = await self.read(self.db.get_report_totals)
+        return 200, {
+            'units_in': summary.units_in,
+            'units_out': summary.units_out,
+            'purchase_amount': summary.purchase_amount,
+            'revenue': summary.revenue,
+            'cogs': summary.cogs,
+            'profit': summary.profit,
+            'margin': summary.margin,
+            'record_count': summary.record_count,
+        }
+
+    async def report_stock(self, request: Request):
+        """GET /reports/stock：某一时刻之前的库存（参数：as_of 必填、product_id）"""
+        as_of = request.query.get('as_of', '').strip()
+        if not as_of:
+            raise HTTPError(400, "as_of 不能为空")
+        product_id = self._int_param(request.query, 'product_id')
+        return 200, await self.read(self.db.get_stock_as_of, as_of, product_id)
+
+    async def report_valuation(self, request: Request):
+        """GET /reports/valuation：按月统计月末库存金额（参数：start、end 为月份范围）"""
+        # 补齐快照需要写入，交给写线程；统计本身在读线程池中执行
+        await self.write('create_month_end_snapshots')
+        return 200, await self.read(
+            self.db.get_valuation_report, request.query.get('start'), request.query.get('end'),
+            create_snapshots=False
+        )
+
+    async def report_stock_rollup(self, request: Request):
+        """GET /reports/stock-rollup：各商品的合计库存及各仓库库存（参数：product_id）"""
+        product_id = self._int_param(request.query, 'product_id')
+        return 200, await self.read(
+            self.db.get_stock_rollup, [product_id] if product_id is not None else None
+        )
+
+    async def get_stats(self, request: Request):
+        """GET /stats：服务统计（请求数、写入批次、合并提交次数、商品缓存）"""
+        stats = dict(self.stats)
+        stats['pending_writes'] = self._write_queue.qsize()
+        stats['average_batch'] = (
+            stats['writes'] / stats['write_batches'] if stats['write_batches'] else 0.0
+        )
+        stats['cache'] = self.db.cache_stats()
+        return 200, stats
+
+def main(argv=None):
+    """命令行入口：python -m src.server"""
+    parser = argparse.ArgumentParser(description="库存 HTTP 服务")
+    parser.add_argument('--db', default='inventory.db', help="数据库文件")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--read-workers', type=int, default=4, help="读线程数")
+    parser.add_argument('--max-batch', type=int, default=64, help="每个写事务最多合并的请求数")
+    parser.add_argument('--batch-wait', type=float, default=0.0, help="凑批等待秒数")
+    args = parser.parse_args(argv)
+
+    server = InventoryServer(
+        args.db, args.host, args.port,
+        read_workers=args.read_workers, max_batch=args.max_batch, batch_wait=args.batch_wait
+    )
+    print(f"库存服务已启动: http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
\ No newline at end of file
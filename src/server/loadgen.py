@@ -0,0 +1,196 @@
+"""
+库存服务压测客户端
+
+模拟多个收银终端并发访问库存服务，统计吞吐量（请求/秒）和延迟分位数。
+用法: python -m src.server.loadgen --port 8080 --concurrency 32 --duration 10 --write-ratio 0.3
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Optional, Tuple
+
+class ClientConnection:
+    """长连接 HTTP 客户端（只支持 Content-Length 响应）"""
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, payload=None) -> Tuple[int, object]:
+        """发送请求并读取响应，返回 (状态码, JSON)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"\r\n"
+        )
+        self.writer.write(head.encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError("服务器关闭了连接")
+        status = int(status_line.split()[1])
+        length = 0
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection':
+                keep_alive = value.strip().lower() != 'close'
+        data = await self.reader.readexactly(length) if length else b''
+        if not keep_alive:
+            await self.close()
+        return status, json.loads(data) if data else None
+
+    async def close(self):
+        """关闭连接"""
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.writer = None
+            self.reader = None
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """计算分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class LoadGenerator:
+    """压测类：concurrency 个终端在 duration 秒内循环发送读写请求"""
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, concurrency: int = 32,
+                 duration: float = 10.0, write_ratio: float = 0.3, seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.concurrency = concurrency
+        self.duration = duration
+        self.write_ratio = write_ratio
+        self.random = random.Random(seed)
+        self.latencies = {'read': [], 'write': []}
+        self.errors = 0
+        self.product_ids: List[int] = []
+
+    async def prepare(self, products: int = 20):
+        """读取商品列表，商品不足时创建压测商品"""
+        conn = ClientConnection(self.host, self.port)
+        try:
+            _, existing = await conn.request('GET', '/products')
+            self.product_ids = [product['id'] for product in existing]
+            for index in range(len(self.product_ids), products):
+                _, created = await conn.request('POST', '/products', {
+                    'name': f"压测商品{index + 1}", 'quantity': 0, 'price': 10.0
+                })
+                self.product_ids.append(created['id'])
+        finally:
+            await conn.close()
+
+    def _next_request(self) -> Tuple[str, str, str, object]:
+        """随机生成一个请求：(类别, 方法, 路径, 请求体)"""
+        product_id = self.random.choice(self.product_ids)
+        if self.random.random() < self.write_ratio:
+            # 入库为主，少量出库（库存不足时返回 422，也计入延迟）
+            if self.random.random() < 0.7:
+                line = {'product_id': product_id, 'type': 'in', 'quantity': 5,
+                        'price': round(self.random.uniform(5, 15), 2)}
+            else:
+                line = {'product_id': product_id, 'type': 'out', 'quantity': 1,
+                        'price': round(self.random.uniform(15, 25), 2)}
+            return 'write', 'POST', '/inventory', line
+
+        choice = self.random.random()
+        if choice < 0.6:
+            return 'read', 'GET', f'/products/{product_id}', None
+        if choice < 0.8:
+            return 'read', 'GET', f'/records?limit=20&product_id={product_id}', None
+        return 'read', 'GET', '/products/search?q=%E5%95%86%E5%93%81&limit=20', None
+
+    async def _worker(self, deadline: float):
+        """一个终端：在截止时间前循环发送请求"""
+        conn = ClientConnection(self.host, self.port)
+        try:
+            while time.perf_counter() < deadline:
+                kind, method, path, payload = self._next_request()
+                started = time.perf_counter()
+                try:
+                    status, _ = await conn.request(method, path, payload)
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    self.errors += 1
+                    await conn.close()
+                    continue
+                self.latencies[kind].append(time.perf_counter() - started)
+                if status >= 500:
+                    self.errors += 1
+        finally:
+            await conn.close()
+
+    async def run(self) -> dict:
+        """执行压测并返回统计结果"""
+        if not self.product_ids:
+            await self.prepare()
+        started = time.perf_counter()
+        deadline = started + self.duration
+        await asyncio.gather(*(self._worker(deadline) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        result = {
+            'concurrency': self.concurrency,
+            'duration': round(elapsed, 3),
+            'errors': self.errors,
+        }
+        total = 0
+        for kind, values in self.latencies.items():
+            values.sort()
+            total += len(values)
+            result[kind] = {
+                'requests': len(values),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+            }
+        result['requests'] = total
+        result['requests_per_second'] = round(total / elapsed, 1) if elapsed else 0.0
+        return result
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="库存服务压测客户端")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--concurrency', type=int, default=32, help="并发终端数")
+    parser.add_argument('--duration', type=float, default=10.0, help="压测时长（秒）")
+    parser.add_argument('--write-ratio', type=float, default=0.3, help="写请求比例")
+    parser.add_argument('--products', type=int, default=20, help="商品不足时创建的压测商品数")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子")
+    args = parser.parse_args(argv)
+
+    generator = LoadGenerator(args.host, args.port, args.concurrency, args.duration,
+                              args.write_ratio, args.seed)
+
+    async def run():
+        await generator.prepare(args.products)
+        return await generator.run()
+
+    print(json.dumps(asyncio.run(run()), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
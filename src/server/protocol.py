@@ -0,0 +1,102 @@
+"""
+HTTP 协议处理模块
+
+基于 asyncio 流的最小 HTTP/1.1 实现：解析请求、生成 JSON 响应，支持长连接。
+"""
+import asyncio
+import json
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+MAX_LINE = 8192
+MAX_HEADERS = 100
+MAX_BODY = 10 * 1024 * 1024
+
+STATUS_TEXT = {
+    200: 'OK',
+    201: 'Created',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    422: 'Unprocessable Entity',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+class HTTPError(Exception):
+    """请求处理失败，返回指定状态码"""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Request:
+    """HTTP 请求类"""
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path.rstrip('/') or '/'
+        # 查询参数只取第一个值
+        self.query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        """是否保持连接（HTTP/1.1 默认保持）"""
+        return self.headers.get('connection', '').lower() != 'close'
+
+    def json(self):
+        """解析 JSON 请求体"""
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body)
+        except ValueError as e:
+            raise HTTPError(400, f"无效的JSON: {str(e)}")
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """读取一个请求，连接关闭时返回 None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if len(line) > MAX_LINE or not line.endswith(b'\n'):
+        raise HTTPError(400, "请求行过长")
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "无效的请求行")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(400, "请求头过多")
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, "无效的Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "请求体过大")
+    body = await reader.readexactly(length) if length else b''
+    return Request(method.upper(), target, headers, body)
+
+def build_response(status: int, payload, keep_alive: bool = True) -> bytes:
+    """生成 JSON 响应"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Unknown')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        f"\r\n"
+    )
+    return head.encode('latin-1') + body
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""
+出入库分析模块
+
+按块读取出入库记录和价格历史，直接构造带类型的 pandas DataFrame：
+数量为 int64，价格为 float64（空值为 NaN），时间为 datetime64，商品名称为 category。
+毛利、毛利率、周转和价格走势在 pandas/NumPy 中向量化计算；每块先按日聚合再合并，
+内存占用只与块大小和结果行数有关，与记录总数无关，几百万条记录也可以分析。
+
+依赖 pandas，导入本模块时加载（启动时不导入，只在统计、导出时使用）。
+"""
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+# 出入库记录数据表的列（与 DatabaseManager.iter_inventory_record_chunks 的前8列对应）
+RECORD_FIELDS = ('id', 'product_id', 'is_out', 'quantity', 'price', 'cost_price', 'warehouse_id', 'created_at')
+
+# 价格历史数据表的列（与 DatabaseManager.iter_price_history_chunks 对应）
+PRICE_FIELDS = ('product_id', 'price', 'quantity', 'created_at')
+
+# 汇总结果的数值列（与 daily_summary 表一致）
+SUMMARY_FIELDS = ('units_in', 'units_out', 'purchase_amount', 'revenue', 'cogs', 'profit', 'record_count')
+
+# 统计周期的标签格式（与 reporting.PERIOD_EXPRESSIONS 一致，周为 ISO 周）
+PERIOD_FORMATS = {
+    'day': '%Y-%m-%d',
+    'week': '%G-W%V',
+    'month': '%Y-%m',
+    'year': '%Y',
+    'all': None,
+}
+
+DateLike = Union[date, datetime, str]
+
+def _seconds_to_datetime(values: np.ndarray) -> np.ndarray:
+    """UTC 换算的秒数转换为 datetime64（不带时区）"""
+    return values.astype('datetime64[s]')
+
+def _period_labels(days: pd.Index, period: str) -> pd.Index:
+    """按日期生成统计周期标签（只对去重后的日期格式化）"""
+    if period not in PERIOD_FORMATS:
+        raise ValueError(f"无效的统计周期: {period}")
+    period_format = PERIOD_FORMATS[period]
+    if period_format is None:
+        return pd.Index(['全部'] * len(days))
+    return pd.DatetimeIndex(days).strftime(period_format)
+
+class RecordAnalytics:
+    """出入库分析类"""
+    def __init__(self, db, chunk_size: int = 100000):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def product_names(self) -> pd.Series:
+        """商品名称（以商品ID为索引）"""
+        rows = self.db.conn.execute("SELECT id, name FROM products").fetchall()
+        return pd.Series([name for _, name in rows], index=pd.Index([id for id, _ in rows], dtype='int64'),
+                         dtype='category', name='product_name')
+
+    def _record_frame(self, rows: List[tuple], names: Optional[pd.Series] = None) -> pd.DataFrame:
+        """把一块数据库行转换为带类型的数据表"""
+        frame = pd.DataFrame.from_records(rows, columns=RECORD_FIELDS + ('_cursor',), exclude=['_cursor'])
+        frame = frame.astype({
+            'id': 'int64', 'product_id': 'int64', 'is_out': 'bool', 'quantity': 'int64',
+            'price': 'float64', 'cost_price': 'float64', 'warehouse_id': 'int64',
+        })
+        frame['created_at'] = _seconds_to_datetime(frame['created_at'].to_numpy('int64'))
+        if names is not None:
+            frame['product_name'] = pd.Categorical(
+                names.reindex(frame['product_id']).to_numpy(), dtype=names.dtype
+            )
+        return frame
+
+    def iter_record_frames(self, with_names: bool = True, **filters) -> Iterator[pd.DataFrame]:
+        """按时间顺序逐块返回出入库记录数据表（filters 与 DatabaseManager.iter_inventory_records 一致）"""
+        names = self.product_names() if with_names else None
+        for rows in self.db.iter_inventory_record_chunks(self.chunk_size, **filters):
+            yield self._record_frame(rows, names)
+
+    def load_records(self, **filters) -> pd.DataFrame:
+        """读取全部符合条件的出入库记录（一次性占用全部内存，大量记录时请用 iter_record_frames 或汇总方法）"""
+        frames = list(self.iter_record_frames(**filters))
+        if not frames:
+            return self._record_frame([], self.product_names())
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_price_frames(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+                          product_ids: Optional[Iterable[int]] = None) -> Iterator[pd.DataFrame]:
+        """按时间顺序逐块返回价格历史数据表"""
+        for rows in self.db.iter_price_history_chunks(self.chunk_size, start, end, product_ids):
+            frame = pd.DataFrame.from_records(rows, columns=PRICE_FIELDS).astype({
+                'product_id': 'int64', 'price': 'float64', 'quantity': 'int64',
+            })
+            frame['created_at'] = _seconds_to_datetime(frame['created_at'].to_numpy('int64'))
+            yield frame
+
+    @staticmethod
+    def _daily_chunk(frame: pd.DataFrame, by_product: bool) -> pd.DataFrame:
+        """一块记录按日（和商品）汇总入库、出库、金额、成本和毛利（规则与 daily_summary 触发器一致）"""
+        is_out = frame['is_out'].to_numpy()
+        quantity = frame['quantity'].to_numpy()
+        amount = np.nan_to_num(frame['price'].to_numpy() * quantity)
+        cost = np.nan_to_num(frame['cost_price'].to_numpy() * quantity)
+        margin = np.nan_to_num((frame['price'].to_numpy() - frame['cost_price'].to_numpy()) * quantity)
+        values = pd.DataFrame({
+            'day': frame['created_at'].dt.floor('D'),
+            'units_in': np.where(is_out, 0, quantity),
+            'units_out': np.where(is_out, quantity, 0),
+            'purchase_amount': np.where(is_out, 0.0, amount),
+            'revenue': np.where(is_out, amount, 0.0),
+            'cogs': np.where(is_out, cost, 0.0),
+            'profit': np.where(is_out, margin, 0.0),
+            'record_count': 1,
+        })
+        keys = ['day']
+        if by_product:
+            values['product_id'] = frame['product_id'].to_numpy()
+            keys.append('product_id')
+        return values.groupby(keys, sort=False).sum()
+
+    def daily_summary(self, by_product: bool = False, **filters) -> pd.DataFrame:
+        """按日（by_product 为 True 时按日和商品）汇总，各块汇总后再合并"""
+        parts = [self._daily_chunk(frame, by_product)
+                 for frame in self.iter_record_frames(with_names=False, **filters)]
+        if not parts:
+            index = ['day', 'product_id'] if by_product else ['day']
+            return pd.DataFrame(columns=index + list(SUMMARY_FIELDS)).set_index(index)
+        keys = ['day', 'product_id'] if by_product else 'day'
+        return pd.concat(parts).groupby(level=keys).sum().sort_index()
+
+    @staticmethod
+    def _add_margin(summary: pd.DataFrame) -> pd.DataFrame:
+        """毛利率 = 毛利 / 销售额（没有销售额时为 NaN）"""
+        revenue = summary['revenue'].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            summary['margin'] = np.where(revenue != 0, summary['profit'].to_numpy(dtype='float64') / revenue, np.nan)
+        return summary
+
+    def profit(self, period: str = 'day', by_product: bool = False, **filters) -> pd.DataFrame:
+        """按日/周/月/年统计入库、出库、销售额、销售成本、毛利和毛利率
+
+        结果以统计周期（by_product 为 True 时还有商品ID）为索引，与 DatabaseManager.get_profit_report 的数值一致。
+        """
+        daily = self.daily_summary(by_product, **filters)
+        days = daily.index.get_level_values('day')
+        labels = dict(zip(days.unique(), _period_labels(days.unique(), period)))
+        keys = [days.map(labels).rename('period')]
+        if by_product:
+            keys.append(daily.index.get_level_values('product_id'))
+        summary = daily.groupby(keys).sum()
+        summary = self._add_margin(summary)
+        if by_product:
+            summary = summary.join(self.product_names(), on='product_id')
+        return summary
+
+    def totals(self, **filters) -> pd.Series:
+        """符合条件的记录的合计（含毛利率）"""
+        totals = pd.Series(0, index=SUMMARY_FIELDS, dtype='float64')
+        for frame in self.iter_record_frames(with_names=False, **filters):
+            part = self._daily_chunk(frame, by_product=False)
+            totals = totals.add(part.sum(), fill_value=0)
+        totals['margin'] = totals['profit'] / totals['revenue'] if totals['revenue'] else np.nan
+        return totals
+
+    def turnover(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> pd.DataFrame:
+        """按商品统计期间出入库数量、销售成本及周转
+
+        turnover = 出库数量 / 当前库存（与 DatabaseManager.get_turnover_report 一致），
+        days_of_stock = 当前库存 / 期间日均出库数量（按期间天数计算，没有出库时为 NaN）。
+        """
+        daily = self.daily_summary(by_product=True, start=start, end=end)
+        moved = daily.groupby(level='product_id')[['units_in', 'units_out', 'cogs']].sum()
+        rows = self.db.conn.execute("SELECT id, name, quantity, avg_price FROM products").fetchall()
+        products = pd.DataFrame.from_records(
+            rows, columns=['product_id', 'product_name', 'quantity', 'avg_price']
+        ).astype({'product_id': 'int64', 'quantity': 'int64', 'avg_price': 'float64'}).set_index('product_id')
+        result = products.join(moved).fillna({'units_in': 0, 'units_out': 0, 'cogs': 0.0})
+        result = result.astype({'units_in': 'int64', 'units_out': 'int64'})
+
+        days = daily.index.get_level_values('day')
+        first = pd.Timestamp(start) if start is not None else (days.min() if len(days) else None)
+        last = pd.Timestamp(end) if end is not None else (days.max() + pd.Timedelta(days=1) if len(days) else None)
+        span = max((last - first).days, 1) if first is not None and last is not None else np.nan
+
+        quantity = result['quantity'].to_numpy(dtype='float64')
+        units_out = result['units_out'].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['turnover'] = np.where(quantity != 0, units_out / quantity, np.nan)
+            daily_out = units_out / span
+            result['days_of_stock'] = np.where(daily_out > 0, quantity / daily_out, np.nan)
+        return result.sort_values('product_name')
+
+    def price_trends(self, period: str = 'month', start: Optional[DateLike] = None,
+                     end: Optional[DateLike] = None,
+                     product_ids: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """按商品和统计周期计算入库价格走势：加权平均价、最低价、最高价、数量及较上一周期的变化率"""
+        parts = []
+        for frame in self.iter_price_frames(start, end, product_ids):
+            price = frame['price'].to_numpy()
+            quantity = frame['quantity'].to_numpy()
+            values = pd.DataFrame({
+                'product_id': frame['product_id'].to_numpy(),
+                'day': frame['created_at'].dt.floor('D'),
+                'amount': price * quantity,
+                'quantity': quantity,
+                'min_price': price,
+                'max_price': price,
+            })
+            parts.append(values.groupby(['product_id', 'day'], sort=False).agg(
+                amount=('amount', 'sum'), quantity=('quantity', 'sum'),
+                min_price=('min_price', 'min'), max_price=('max_price', 'max'),
+            ))
+        columns = ['avg_price', 'min_price', 'max_price', 'quantity', 'change']
+        if not parts:
+            return pd.DataFrame(columns=['product_id', 'period'] + columns).set_index(['product_id', 'period'])
+
+        daily = pd.concat(parts)
+        days = daily.index.get_level_values('day')
+        labels = dict(zip(days.unique(), _period_labels(days.unique(), period)))
+        trends = daily.groupby([daily.index.get_level_values('product_id'), days.map(labels).rename('period')]).agg(
+            amount=('amount', 'sum'), quantity=('quantity', 'sum'),
+            min_price=('min_price', 'min'), max_price=('max_price', 'max'),
+        ).sort_index()
+        amount = trends['amount'].to_numpy()
+        quantity = trends['quantity'].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 数量为0的价格历史（如修改价格时没有库存）按最低、最高价的平均值计
+            trends['avg_price'] = np.where(
+                quantity != 0, amount / quantity,
+                (trends['min_price'].to_numpy() + trends['max_price'].to_numpy()) / 2
+            )
+        trends['change'] = trends.groupby(level='product_id')['avg_price'].pct_change()
+        trends = trends[columns]
+        return trends.join(self.product_names(), on='product_id')
+
+    def export_report(self, file_path: str, period: str = 'month',
+                      start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> List[str]:
+        """导出分析报表：Excel 时每项一个工作表；CSV 时每项一个文件（文件名加后缀），数值保持数字类型
+
+        返回写入的工作表名或文件路径。
+        """
+        reports = {
+            '利润': self.profit(period, start=start, end=end),
+            '商品利润': self.profit(period, by_product=True, start=start, end=end),
+            '周转': self.turnover(start, end),
+            '价格走势': self.price_trends(period, start, end),
+        }
+        if not file_path.lower().endswith('.csv'):
+            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+                for name, frame in reports.items():
+                    frame.to_excel(writer, sheet_name=name)
+            return list(reports)
+
+        paths = []
+        base = file_path[:-4]
+        for name, frame in reports.items():
+            path = f"{base}_{name}.csv"
+            frame.to_csv(path, encoding='utf-8-sig')
+            paths.append(path)
+        return paths
\ No newline at end of file
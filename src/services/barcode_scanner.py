@@ -0,0 +1,202 @@
+"""
+条码批量扫描入库模块
+
+用进程池并行解码一个文件夹（或持续产生的图片路径流）中的条码图片，
+按条码唯一索引批量查找商品，每累计一批图片就合并成一张入库单提交，
+结束后报告处理速度（张/秒）以及无法识别、找不到商品的条码。
+
+解码依赖 opencv-python 和 pyzbar，只在工作进程中导入。
+
+用法: python -m src.services.barcode_scanner --db inventory.db scans/ [--workers 4] [--dry-run]
+"""
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.models.inventory_line import InventoryLine
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+# 单张图片的解码结果：(图片路径, 条码列表, 错误信息)
+ScanResult = Tuple[str, List[str], Optional[str]]
+
+# 进度回调：(已处理图片数, 已识别条码数)
+ProgressCallback = Callable[[int, int], None]
+
+def decode_image(path: str) -> List[str]:
+    """解码一张图片中的全部条码（同一条码出现多次时按多件计）"""
+    import cv2
+    from pyzbar import pyzbar
+
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("无法读取图片")
+    return [symbol.data.decode('utf-8', errors='replace').strip() for symbol in pyzbar.decode(image)]
+
+def _decode_chunk(decoder: Callable[[str], List[str]], paths: List[str]) -> List[ScanResult]:
+    """在工作进程中解码一组图片（一次提交多张，减少进程间通信）"""
+    results = []
+    for path in paths:
+        try:
+            results.append((path, [code for code in decoder(path) if code], None))
+        except Exception as e:
+            results.append((path, [], str(e)))
+    return results
+
+def iter_image_files(folder: str) -> Iterator[str]:
+    """按文件名顺序列出文件夹（含子文件夹）中的图片"""
+    for directory, subdirs, files in os.walk(folder):
+        subdirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(directory, name)
+
+class BarcodeScanPipeline:
+    """条码批量扫描入库类"""
+    def __init__(self, db, workers: Optional[int] = None,
+                 decoder: Callable[[str], List[str]] = decode_image, chunk_size: int = 8):
+        """workers 为 0 时在当前进程中解码；decoder 必须是模块级函数（需要传给工作进程）"""
+        self.db = db
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.decoder = decoder
+        self.chunk_size = chunk_size
+
+    def _chunks(self, paths: Iterable[str]) -> Iterator[List[str]]:
+        """把图片路径按 chunk_size 分组"""
+        paths = iter(paths)
+        while True:
+            chunk = list(islice(paths, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def scan(self, paths: Iterable[str]) -> Iterator[ScanResult]:
+        """解码图片，按完成顺序逐张返回结果
+
+        paths 可以是持续产生路径的生成器：同时提交的任务数有上限，内存占用与图片总数无关。
+        """
+        if self.workers <= 0:
+            for chunk in self._chunks(paths):
+                yield from _decode_chunk(self.decoder, chunk)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            chunks = self._chunks(paths)
+            pending = set()
+            while True:
+                # 保持每个工作进程有两组待处理的图片
+                while len(pending) < self.workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending.add(pool.submit(_decode_chunk, self.decoder, chunk))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+    def receive(self, paths: Iterable[str], quantity_per_code: int = 1, price: Optional[float] = None,
+                remark: str = "扫码入库", batch_size: int = 500, dry_run: bool = False,
+                progress: Optional[ProgressCallback] = None) -> dict:
+        """扫描图片并入库：每个条码入库 quantity_per_code 件
+
+        每处理 batch_size 张图片提交一张入库单（同一商品合并为一行），中途失败不影响已提交的批次。
+        price 为空时按商品当前价格入库；dry_run 为 True 时只扫描和查找商品，不入库。
+        """
+        started = time.perf_counter()
+        report = {
+            'images': 0, 'codes': 0, 'quantity': 0, 'batches': 0,
+            'unknown': Counter(), 'failed_images': [], 'failed_batches': [],
+        }
+        pending = Counter()
+        pending_images = 0
+
+        for path, codes, error in self.scan(paths):
+            report['images'] += 1
+            if error is not None:
+                report['failed_images'].append((path, error))
+            report['codes'] += len(codes)
+            pending.update(codes)
+            pending_images += 1
+            if pending_images >= batch_size:
+                self._receive_batch(pending, quantity_per_code, price, remark, dry_run, report)
+                pending.clear()
+                pending_images = 0
+            if progress:
+                progress(report['images'], report['codes'])
+        self._receive_batch(pending, quantity_per_code, price, remark, dry_run, report)
+
+        elapsed = time.perf_counter() - started
+        report['unknown'] = dict(report['unknown'])
+        report['elapsed'] = round(elapsed, 3)
+        report['images_per_sec'] = round(report['images'] / elapsed, 1) if elapsed > 0 else 0.0
+        return report
+
+    def _receive_batch(self, counts: Counter, quantity_per_code: int, price: Optional[float],
+                       remark: str, dry_run: bool, report: dict):
+        """按条码查找商品，把一批条码合并为一张入库单提交"""
+        if not counts:
+            return
+        products = self.db.get_products_by_barcodes(counts)
+        quantities: Dict[int, int] = Counter()
+        for code, count in counts.items():
+            product = products.get(code)
+            if product is None:
+                report['unknown'][code] += count
+            else:
+                quantities[product.id] += count * quantity_per_code
+        if not quantities:
+            return
+
+        if not dry_run:
+            lines = [InventoryLine(product_id, 'in', quantity, price, remark)
+                     for product_id, quantity in quantities.items()]
+            success, message, _ = self.db.process_inventory_batch(lines)
+            if not success:
+                report['failed_batches'].append(message)
+                return
+        report['batches'] += 1
+        report['quantity'] += sum(quantities.values())
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    import argparse
+    from src.database.db_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="批量扫描条码图片并入库")
+    parser.add_argument('folders', nargs='+', help="图片文件夹或图片文件")
+    parser.add_argument('--db', default='inventory.db', help="数据库文件")
+    parser.add_argument('--workers', type=int, help="解码进程数（默认为CPU核数，0 表示不使用进程池）")
+    parser.add_argument('--quantity', type=int, default=1, help="每个条码入库的数量")
+    parser.add_argument('--price', type=float, help="入库价格（默认为商品当前价格）")
+    parser.add_argument('--remark', default="扫码入库", help="入库备注")
+    parser.add_argument('--batch-size', type=int, default=500, help="每张入库单包含的图片数")
+    parser.add_argument('--dry-run', action='store_true', help="只扫描和查找商品，不入库")
+    args = parser.parse_args(argv)
+
+    def paths():
+        for folder in args.folders:
+            if os.path.isdir(folder):
+                yield from iter_image_files(folder)
+            else:
+                yield folder
+
+    db = DatabaseManager(args.db)
+    pipeline = BarcodeScanPipeline(db, workers=args.workers)
+    report = pipeline.receive(paths(), args.quantity, args.price, args.remark, args.batch_size, args.dry_run)
+
+    print(f"处理 {report['images']} 张图片，识别 {report['codes']} 个条码，"
+          f"{'可' if args.dry_run else '已'}入库 {report['quantity']} 件（{report['batches']} 张入库单），"
+          f"用时 {report['elapsed']:.2f} 秒，{report['images_per_sec']} 张/秒")
+    for path, error in report['failed_images']:
+        print(f"  无法解码 {path}: {error}")
+    for code, count in sorted(report['unknown'].items()):
+        print(f"  找不到商品的条码 {code}: {count} 个")
+    for message in report['failed_batches']:
+        print(f"  入库失败: {message}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+数据库后台服务
+
+界面线程不直接访问数据库：调用提交到后台线程执行，返回 Future；
+执行结果由界面线程通过 after() 轮询取回后再调用回调，回调中可以安全地操作控件。
+"""
+import queue
+import tkinter as tk
+from tkinter import messagebox
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+class DatabaseService:
+    """数据库后台服务类
+
+    默认只有一个工作线程，请求按提交顺序执行（先写后读的请求能读到写入结果）。
+    请求执行期间禁用提交时指定的控件，并通过 busy 监听函数通知界面显示忙碌状态。
+    """
+    POLL_INTERVAL = 50  # 毫秒
+
+    def __init__(self, root, db, max_workers: int = 1):
+        self.root = root
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-service')
+        self.pending = 0
+        self._results = queue.Queue()
+        self._polling = False
+        self._closed = False
+        self._disabled: Dict[Any, int] = {}  # 控件 -> 正在使用它的请求数
+        self._busy_listeners: List[Callable[[bool], None]] = []
+
+    def add_busy_listener(self, listener: Callable[[bool], None]):
+        """注册忙碌状态监听函数，参数为是否有请求正在执行"""
+        self._busy_listeners.append(listener)
+
+    def remove_busy_listener(self, listener: Callable[[bool], None]):
+        """移除忙碌状态监听函数"""
+        if listener in self._busy_listeners:
+            self._busy_listeners.remove(listener)
+
+    @property
+    def busy(self) -> bool:
+        """是否有请求正在执行"""
+        return self.pending > 0
+
+    def submit(self, func: Callable, *args,
+               on_success: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None,
+               widgets: Iterable = (), **kwargs) -> Future:
+        """在后台线程执行 func(*args, **kwargs)（只能在界面线程调用）
+
+        on_success(result)/on_error(exception) 在界面线程中调用；
+        未指定 on_error 时弹窗显示错误。widgets 中的控件在请求完成前保持禁用。
+        """
+        if self._closed:
+            raise RuntimeError("数据库服务已关闭")
+
+        widgets = list(widgets)
+        for widget in widgets:
+            self._disable(widget)
+        self.pending += 1
+        if self.pending == 1:
+            self._notify_busy(True)
+
+        future = self.executor.submit(func, *args, **kwargs)
+        callbacks = (on_success, on_error, widgets)
+        # 完成回调在工作线程中执行，只把结果放入队列，由界面线程处理
+        future.add_done_callback(lambda done: self._results.put((done, callbacks)))
+
+        if not self._polling:
+            self._polling = True
+            self._schedule_poll()
+        return future
+
+    def call(self, method: str, *args, **kwargs) -> Future:
+        """在后台线程调用 DatabaseManager 的方法，参数同 submit"""
+        return self.submit(getattr(self.db, method), *args, **kwargs)
+
+    def _schedule_poll(self):
+        """安排下一次轮询（窗口已销毁时停止）"""
+        try:
+            self.root.after(self.POLL_INTERVAL, self._poll)
+        except tk.TclError:
+            self._polling = False
+
+    def _poll(self):
+        """界面线程：处理已完成的请求"""
+        while True:
+            try:
+                future, (on_success, on_error, widgets) = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending -= 1
+            for widget in widgets:
+                self._enable(widget)
+            if self.pending == 0:
+                self._notify_busy(False)
+
+            if future.cancelled():
+                continue
+            error = future.exception()
+            try:
+                if error is not None:
+                    self._handle_error(error, on_error)
+                elif on_success:
+                    on_success(future.result())
+            except tk.TclError:
+                # 回调涉及的窗口已关闭
+                pass
+
+        if self.pending > 0 and not self._closed:
+            self._schedule_poll()
+        else:
+            self._polling = False
+
+    def _handle_error(self, error: Exception, on_error):
+        """处理后台执行中的异常"""
+        if on_error:
+            on_error(error)
+        else:
+            messagebox.showerror("错误", f"操作失败: {str(error)}")
+
+    def _disable(self, widget):
+        """禁用控件（多个请求使用同一控件时计数）"""
+        count = self._disabled.get(widget, 0)
+        self._disabled[widget] = count + 1
+        if count == 0:
+            try:
+                widget.configure(state=tk.DISABLED)
+            except tk.TclError:
+                pass
+
+    def _enable(self, widget):
+        """最后一个使用该控件的请求完成后恢复控件"""
+        count = self._disabled.get(widget, 0) - 1
+        if count > 0:
+            self._disabled[widget] = count
+            return
+        self._disabled.pop(widget, None)
+        try:
+            widget.configure(state=tk.NORMAL)
+        except tk.TclError:
+            pass
+
+    def _notify_busy(self, busy: bool):
+        """通知忙碌状态变化"""
+        for listener in list(self._busy_listeners):
+            try:
+                listener(busy)
+            except tk.TclError:
+                pass
+
+    def shutdown(self):
+        """关闭服务：取消尚未开始的请求，不等待正在执行的请求"""
+        self._closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
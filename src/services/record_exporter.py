@@ -0,0 +1,117 @@
+"""
+出入库记录导出模块
+
+按块流式读取记录并写入文件，内存占用与记录数量无关；
+支持 Excel（openpyxl 只写模式）、CSV 和 CSV.gz 格式，可在后台线程中运行并随时取消。
+"""
+import csv
+import gzip
+import os
+import threading
+from typing import Callable, Iterator, Optional
+from src.models.inventory_record import EXPORT_COLUMNS
+
+# 进度回调：(已导出行数, 总行数)
+ProgressCallback = Callable[[int, int], None]
+
+class ExportCancelled(Exception):
+    """导出被取消"""
+
+
+class RecordExporter:
+    """出入库记录导出类"""
+    def __init__(self, db, chunk_size: int = 5000):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def detect_format(file_path: str) -> str:
+        """根据文件扩展名判断导出格式"""
+        lower = file_path.lower()
+        if lower.endswith('.csv.gz'):
+            return 'csv.gz'
+        if lower.endswith('.csv'):
+            return 'csv'
+        return 'xlsx'
+
+    def export(self, file_path: str, progress: Optional[ProgressCallback] = None,
+               cancel_event: Optional[threading.Event] = None, **filters) -> int:
+        """导出符合条件的记录，返回导出行数
+
+        filters 与 DatabaseManager.iter_inventory_records 一致。
+        先写入临时文件，完成后再替换目标文件；取消或出错时删除临时文件。
+        """
+        total = self.db.count_inventory_records(**filters)
+        rows = self._iter_rows(total, progress, cancel_event, filters)
+
+        export_format = self.detect_format(file_path)
+        temp_path = f"{file_path}.part"
+        try:
+            if export_format == 'xlsx':
+                count = self._write_xlsx(temp_path, rows)
+            else:
+                count = self._write_csv(temp_path, rows, compress=(export_format == 'csv.gz'))
+            os.replace(temp_path, file_path)
+            return count
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _iter_rows(self, total: int, progress: Optional[ProgressCallback],
+                   cancel_event: Optional[threading.Event], filters: dict) -> Iterator[tuple]:
+        """逐行生成导出数据，每个块结束时报告进度并检查是否取消"""
+        done = 0
+        for record in self.db.iter_inventory_records(page_size=self.chunk_size, **filters):
+            yield record.to_row()
+            done += 1
+            if done % self.chunk_size == 0:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                if progress:
+                    progress(done, total)
+        if cancel_event is not None and cancel_event.is_set():
+            raise ExportCancelled()
+        if progress:
+            progress(done, max(total, done))
+
+    def _write_xlsx(self, file_path: str, rows: Iterator[tuple]) -> int:
+        """使用 openpyxl 只写模式逐行写入 Excel"""
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(EXPORT_COLUMNS)
+        count = 0
+        for row in rows:
+            sheet.append(row)
+            count += 1
+        workbook.save(file_path)
+        return count
+
+    def _write_csv(self, file_path: str, rows: Iterator[tuple], compress: bool = False) -> int:
+        """写入 CSV（带 BOM，Excel 可直接打开中文）"""
+        if compress:
+            file = gzip.open(file_path, 'wt', encoding='utf-8-sig', newline='', compresslevel=6)
+        else:
+            file = open(file_path, 'w', encoding='utf-8-sig', newline='')
+        with file:
+            writer = csv.writer(file)
+            writer.writerow(EXPORT_COLUMNS)
+            count = 0
+            for chunk in _chunks(rows, self.chunk_size):
+                writer.writerows(chunk)
+                count += len(chunk)
+        return count
+
+
+def _chunks(rows: Iterator[tuple], size: int) -> Iterator[list]:
+    """将行迭代器按块分组"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,206 @@
+"""
+批量出入库窗口
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox
+from models.inventory_line import InventoryLine
+
+class BatchInventoryWindow:
+    """批量出入库窗口类（多行入库单/出库单）"""
+    def __init__(self, parent, db, on_success=None, service=None):
+        # on_success(product_ids)：提交成功后回调，参数为涉及的商品ID
+        # service：数据库后台服务，未传入时直接在界面线程访问数据库
+        self.db = db
+        self.on_success = on_success
+        self.service = service
+        self.lines = []
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("批量出入库")
+        self.window.geometry("900x500")
+
+        # 单据类型
+        type_frame = ttk.Frame(self.window)
+        type_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.type_var = tk.StringVar(value='in')
+        ttk.Radiobutton(type_frame, text="入库单", variable=self.type_var, value='in',
+                        command=self.on_type_change).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(type_frame, text="出库单", variable=self.type_var, value='out',
+                        command=self.on_type_change).pack(side=tk.LEFT, padx=5)
+
+        # 明细输入区域
+        entry_frame = ttk.LabelFrame(self.window, text="添加明细", padding="5")
+        entry_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Label(entry_frame, text="商品:").grid(row=0, column=0, sticky=tk.W)
+        self.product_var = tk.StringVar()
+        self.product_combo = ttk.Combobox(entry_frame, textvariable=self.product_var, width=30)
+        self.product_combo.grid(row=0, column=1, padx=5, pady=2)
+
+        ttk.Label(entry_frame, text="数量:").grid(row=0, column=2, sticky=tk.W)
+        self.quantity_var = tk.StringVar()
+        ttk.Entry(entry_frame, textvariable=self.quantity_var, width=10).grid(row=0, column=3, padx=5, pady=2)
+
+        self.price_label = ttk.Label(entry_frame, text="进价:")
+        self.price_label.grid(row=0, column=4, sticky=tk.W)
+        self.price_var = tk.StringVar()
+        ttk.Entry(entry_frame, textvariable=self.price_var, width=10).grid(row=0, column=5, padx=5, pady=2)
+
+        ttk.Label(entry_frame, text="备注:").grid(row=0, column=6, sticky=tk.W)
+        self.remark_var = tk.StringVar()
+        ttk.Entry(entry_frame, textvariable=self.remark_var, width=20).grid(row=0, column=7, padx=5, pady=2)
+
+        ttk.Button(entry_frame, text="添加", command=self.add_line).grid(row=0, column=8, padx=5)
+
+        # 明细表格
+        table_frame = ttk.Frame(self.window)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        columns = ("行号", "商品ID", "商品名称", "数量", "单价", "备注", "结果")
+        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100)
+        self.tree.column("行号", width=50)
+        self.tree.column("商品名称", width=150)
+        self.tree.column("结果", width=180)
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.tag_configure('failed', foreground='red')
+
+        # 按钮区域
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Button(button_frame, text="删除明细", command=self.remove_line).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="清空", command=self.clear_lines).pack(side=tk.LEFT, padx=5)
+        self.submit_button = ttk.Button(button_frame, text="提交", command=self.submit)
+        self.submit_button.pack(side=tk.RIGHT, padx=5)
+
+        self.load_products()
+
+    def run(self, method, *args, on_success, widgets=()):
+        """执行数据库操作：有后台服务时在后台执行，完成后在界面线程回调"""
+        if self.service:
+            self.service.call(method, *args, on_success=on_success, widgets=widgets)
+        else:
+            on_success(getattr(self.db, method)(*args))
+
+    def load_products(self):
+        """加载商品下拉列表"""
+        self.products = {}
+        self.run('get_all_products', on_success=self.show_products,
+                 widgets=(self.product_combo,))
+
+    def show_products(self, products):
+        """显示商品下拉列表"""
+        options = []
+        for product in products:
+            option = f"{product.id} - {product.name}"
+            self.products[option] = product
+            options.append(option)
+        self.product_combo['values'] = options
+
+    def on_type_change(self):
+        """切换单据类型时更新价格提示"""
+        self.price_label.configure(text="进价:" if self.type_var.get() == 'in' else "售价:")
+
+    def add_line(self):
+        """添加一行明细"""
+        product = self.products.get(self.product_var.get())
+        if not product:
+            messagebox.showwarning("警告", "请先选择商品！", parent=self.window)
+            return
+
+        try:
+            quantity = int(self.quantity_var.get())
+            if quantity <= 0:
+                messagebox.showerror("错误", "数量必须大于0！", parent=self.window)
+                return
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的数量！", parent=self.window)
+            return
+
+        price_str = self.price_var.get().strip()
+        if self.type_var.get() == 'out' and not price_str:
+            messagebox.showerror("错误", "出库时必须输入售价！", parent=self.window)
+            return
+        try:
+            price = float(price_str) if price_str else None
+            if price is not None and price < 0:
+                messagebox.showerror("错误", "价格不能为负数！", parent=self.window)
+                return
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的价格！", parent=self.window)
+            return
+
+        self.lines.append((product, quantity, price, self.remark_var.get()))
+        self.quantity_var.set("")
+        self.price_var.set("")
+        self.remark_var.set("")
+        self.refresh_lines()
+
+    def remove_line(self):
+        """删除选中的明细"""
+        selected = {int(item) for item in self.tree.selection()}
+        self.lines = [line for index, line in enumerate(self.lines) if index not in selected]
+        self.refresh_lines()
+
+    def clear_lines(self):
+        """清空明细"""
+        self.lines = []
+        self.refresh_lines()
+
+    def refresh_lines(self, results=None):
+        """刷新明细表格"""
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+
+        for index, (product, quantity, price, remark) in enumerate(self.lines):
+            result = ""
+            tags = ()
+            if results:
+                ok, message = results[index]
+                result = message
+                if not ok:
+                    tags = ('failed',)
+            self.tree.insert('', tk.END, iid=str(index), values=(
+                index + 1,
+                product.id,
+                product.name,
+                quantity,
+                f"{price:.2f}" if price is not None else "-",
+                remark or "-",
+                result
+            ), tags=tags)
+
+    def submit(self):
+        """提交整单"""
+        if not self.lines:
+            messagebox.showwarning("警告", "请先添加明细！", parent=self.window)
+            return
+
+        type = self.type_var.get()
+        lines = [
+            InventoryLine(product.id, type, quantity, price, remark)
+            for product, quantity, price, remark in self.lines
+        ]
+        self.run('process_inventory_batch', lines,
+                 on_success=lambda result: self.on_submitted(lines, *result),
+                 widgets=(self.submit_button,))
+
+    def on_submitted(self, lines, success, message, results):
+        """整单提交完成"""
+        if success:
+            messagebox.showinfo("成功", f"共{len(lines)}行，{message}", parent=self.window)
+            if self.on_success:
+                self.on_success([line.product_id for line in lines])
+            self.window.destroy()
+        else:
+            self.refresh_lines(results)
+            messagebox.showerror("错误", message, parent=self.window)
@@ -0,0 +1,168 @@
+"""
+性能诊断窗口
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from datetime import datetime
+
+METHOD_COLUMNS = (("方法", 200), ("次数", 70), ("平均(ms)", 80), ("P50", 70), ("P95", 70),
+                  ("P99", 70), ("最大(ms)", 80), ("行数", 80))
+STATEMENT_COLUMNS = (("SQL", 420), ("次数", 70), ("累计(ms)", 90), ("平均(ms)", 80),
+                     ("P95", 70), ("最大(ms)", 80), ("影响行数", 80))
+SLOW_COLUMNS = (("时间", 170), ("类型", 70), ("方法/SQL", 480), ("耗时(ms)", 90), ("行数", 70))
+
+class DiagnosticsWindow:
+    """性能诊断窗口类：开关性能监测，查看方法/SQL 耗时统计和慢查询"""
+    REFRESH_INTERVAL = 1000  # 毫秒
+
+    def __init__(self, parent, db):
+        self.db = db
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("性能诊断")
+        self.window.geometry("1000x560")
+
+        # 控制区域
+        control_frame = ttk.Frame(self.window)
+        control_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        instrumentation = db.instrumentation
+        self.enabled_var = tk.BooleanVar(value=bool(instrumentation and instrumentation.enabled))
+        ttk.Checkbutton(control_frame, text="启用性能监测", variable=self.enabled_var,
+                        command=self.toggle).pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(control_frame, text="慢查询阈值(ms):").pack(side=tk.LEFT, padx=(15, 2))
+        self.slow_var = tk.StringVar(value=str(instrumentation.slow_ms if instrumentation else 100))
+        ttk.Entry(control_frame, textvariable=self.slow_var, width=8).pack(side=tk.LEFT)
+        ttk.Button(control_frame, text="应用", command=self.apply_threshold).pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(control_frame, text="导出...", command=self.export).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(control_frame, text="重置", command=self.reset).pack(side=tk.RIGHT, padx=5)
+
+        # 统计表格
+        notebook = ttk.Notebook(self.window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.method_tree = self._create_tree(notebook, "方法耗时", METHOD_COLUMNS)
+        self.statement_tree = self._create_tree(notebook, "SQL 语句", STATEMENT_COLUMNS)
+        self.slow_tree = self._create_tree(notebook, "慢查询", SLOW_COLUMNS)
+
+        self.summary_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.summary_var).pack(fill=tk.X, padx=10, pady=(0, 5))
+
+        self._refresh_job = None
+        self.refresh()
+
+    def _create_tree(self, notebook, title, columns):
+        """创建一个标签页及其表格"""
+        frame = ttk.Frame(notebook)
+        notebook.add(frame, text=title)
+        tree = ttk.Treeview(frame, columns=[name for name, _ in columns], show="headings")
+        for name, width in columns:
+            tree.heading(name, text=name)
+            tree.column(name, width=width, anchor=tk.W if width > 150 else tk.E)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        return tree
+
+    def toggle(self):
+        """开启或关闭性能监测"""
+        if self.enabled_var.get():
+            slow_ms = self._read_threshold()
+            if slow_ms is None:
+                self.enabled_var.set(False)
+                return
+            self.db.enable_instrumentation(slow_ms=slow_ms)
+        else:
+            self.db.disable_instrumentation()
+        self.refresh()
+
+    def _read_threshold(self):
+        """读取慢查询阈值"""
+        try:
+            slow_ms = float(self.slow_var.get())
+            if slow_ms < 0:
+                raise ValueError
+            return slow_ms
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的慢查询阈值！", parent=self.window)
+            return None
+
+    def apply_threshold(self):
+        """修改慢查询阈值"""
+        slow_ms = self._read_threshold()
+        if slow_ms is not None and self.db.instrumentation:
+            self.db.instrumentation.configure(slow_ms=slow_ms)
+
+    def reset(self):
+        """清空统计数据"""
+        if self.db.instrumentation:
+            self.db.instrumentation.reset()
+        self.refresh()
+
+    def export(self):
+        """导出统计数据为 JSON"""
+        if not self.db.instrumentation:
+            messagebox.showwarning("警告", "尚未启用性能监测！", parent=self.window)
+            return
+        file_path = filedialog.asksaveasfilename(
+            parent=self.window,
+            defaultextension=".json",
+            filetypes=[("JSON 文件", "*.json")],
+            initialfile=f"性能诊断_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        if file_path:
+            try:
+                self.db.instrumentation.export(file_path)
+                messagebox.showinfo("成功", f"已导出到：\n{file_path}", parent=self.window)
+            except Exception as e:
+                messagebox.showerror("错误", f"导出失败：{str(e)}", parent=self.window)
+
+    def refresh(self):
+        """刷新统计数据（窗口打开期间定时刷新）"""
+        instrumentation = self.db.instrumentation
+        if instrumentation is not None:
+            snapshot = instrumentation.snapshot()
+            self._fill(self.method_tree, [
+                (name, stats['count'], f"{stats['mean_ms']:.3f}", stats['p50_ms'], stats['p95_ms'],
+                 stats['p99_ms'], f"{stats['max_ms']:.3f}", stats['rows'])
+                for name, stats in sorted(snapshot['methods'].items(),
+                                          key=lambda item: item[1]['total_ms'], reverse=True)
+            ])
+            self._fill(self.statement_tree, [
+                (stats['sql'], stats['count'], f"{stats['total_ms']:.1f}", f"{stats['mean_ms']:.3f}",
+                 stats['p95_ms'], f"{stats['max_ms']:.3f}", stats['rows'])
+                for stats in snapshot['statements']
+            ])
+            self._fill(self.slow_tree, [
+                (entry['time'], "方法" if entry['kind'] == 'method' else "SQL",
+                 entry.get('sql', entry['name']).replace('\n', ' '), entry['elapsed_ms'],
+                 entry['rows'] if entry['rows'] is not None else "-")
+                for entry in reversed(snapshot['slow_queries'])
+            ])
+            lock_wait = snapshot['lock_wait']
+            self.summary_var.set(
+                f"{'监测中' if snapshot['enabled'] else '已停止'}，统计开始于 {snapshot['since']}；"
+                f"等待写锁 {lock_wait['count']} 次，累计 {lock_wait['total_ms']:.1f} ms，"
+                f"P95 {lock_wait['p95_ms']} ms，最长 {lock_wait['max_ms']:.1f} ms"
+            )
+        else:
+            self.summary_var.set("性能监测未启用（启用后才记录，关闭时没有额外开销）")
+
+        if self._refresh_job is not None:
+            self.window.after_cancel(self._refresh_job)
+        self._refresh_job = self.window.after(self.REFRESH_INTERVAL, self._refresh_if_open)
+
+    def _refresh_if_open(self):
+        """窗口仍然存在时刷新"""
+        self._refresh_job = None
+        if self.window.winfo_exists():
+            self.refresh()
+
+    @staticmethod
+    def _fill(tree, rows):
+        """用新数据替换表格内容"""
+        tree.delete(*tree.get_children())
+        for values in rows:
+            tree.insert('', tk.END, values=values)
\ No newline at end of file
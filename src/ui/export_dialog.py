@@ -0,0 +1,81 @@
+"""
+导出进度窗口
+"""
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from services.record_exporter import RecordExporter, ExportCancelled
+
+class ExportProgressDialog:
+    """导出进度窗口类：在后台线程中导出，界面线程轮询进度"""
+    POLL_INTERVAL = 100  # 毫秒
+
+    def __init__(self, parent, db, file_path: str, title: str = "导出", **filters):
+        self.file_path = file_path
+        self.title = title
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(title)
+        self.window.geometry("400x130")
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        self.status_var = tk.StringVar(value="正在准备导出...")
+        ttk.Label(self.window, textvariable=self.status_var).pack(fill=tk.X, padx=10, pady=(10, 5))
+
+        self.progress = ttk.Progressbar(self.window, mode='determinate', maximum=100)
+        self.progress.pack(fill=tk.X, padx=10, pady=5)
+
+        self.cancel_button = ttk.Button(self.window, text="取消", command=self.cancel)
+        self.cancel_button.pack(pady=5)
+
+        exporter = RecordExporter(db)
+        self.thread = threading.Thread(
+            target=self._run, args=(exporter, filters), daemon=True
+        )
+        self.thread.start()
+        self.window.after(self.POLL_INTERVAL, self._poll)
+
+    def _run(self, exporter: RecordExporter, filters: dict):
+        """后台线程：执行导出，通过队列把进度和结果交给界面线程"""
+        try:
+            count = exporter.export(
+                self.file_path,
+                progress=lambda done, total: self.messages.put(('progress', done, total)),
+                cancel_event=self.cancel_event,
+                **filters
+            )
+            self.messages.put(('done', count, None))
+        except ExportCancelled:
+            self.messages.put(('cancelled', None, None))
+        except Exception as e:
+            self.messages.put(('error', str(e), None))
+
+    def _poll(self):
+        """界面线程：处理后台线程发来的消息"""
+        try:
+            while True:
+                kind, value, total = self.messages.get_nowait()
+                if kind == 'progress':
+                    self.progress['value'] = value * 100 / total if total else 100
+                    self.status_var.set(f"已导出 {value} / {total} 行")
+                    continue
+
+                self.window.destroy()
+                if kind == 'done':
+                    messagebox.showinfo("成功", f"{self.title}完成，共{value}行，已导出到：\n{self.file_path}")
+                elif kind == 'error':
+                    messagebox.showerror("错误", f"导出失败：{value}")
+                return
+        except queue.Empty:
+            pass
+        self.window.after(self.POLL_INTERVAL, self._poll)
+
+    def cancel(self):
+        """取消导出"""
+        self.cancel_event.set()
+        self.cancel_button.configure(state=tk.DISABLED)
+        self.status_var.set("正在取消...")
@@ -4,16 +4,40 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import pandas as pd
 from database.db_manager import DatabaseManager
+from services.db_service import DatabaseService
+from ui.export_dialog import ExportProgressDialog
+from ui.virtual_table import VirtualTable
+
+# 表格列及宽度
+COLUMNS = (
+    ("时间", 150),
+    ("商品名称", 150),
+    ("类型", 60),
+    ("数量", 60),
+    ("单价", 100),
+    ("成本价", 100),
+    ("总价", 100),
+    ("毛利", 100),
+    ("备注", 140),
+)
 
 class InventoryRecordsWindow:
     """出入库记录窗口类"""
-    def __init__(self, parent):
+    def __init__(self, parent, db: DatabaseManager = None, service: DatabaseService = None):
+        # 复用主窗口的数据库管理器，未传入时按默认路径获取（共享连接，无额外开销）
+        self.db = db or DatabaseManager()
+        
         self.window = tk.Toplevel(parent)
         self.window.title("出入库记录统计")
         self.window.geometry("1000x600")
         
+        # 查询在后台执行；未传入服务时自建一个，窗口关闭时停止
+        self.service = service
+        if service is None:
+            self.service = DatabaseService(self.window, self.db)
+            self.window.bind('<Destroy>', self.on_destroy)
+        
         # 创建主框架
         main_frame = ttk.Frame(self.window)
         main_frame.pack(fill=tk.BOTH, expand=True)
@@ -23,142 +47,184 @@ class InventoryRecordsWindow:
         button_frame.pack(fill=tk.X, padx=5, pady=5)
         
         # 添加导出按钮
-        ttk.Button(
+        self.export_buttons = {}
+        self.export_buttons['in'] = ttk.Button(
             button_frame,
             text="导出入库明细",
             command=lambda: self.export_records('in')
-        ).pack(side=tk.LEFT, padx=5)
+        )
+        self.export_buttons['in'].pack(side=tk.LEFT, padx=5)
         
-        ttk.Button(
+        self.export_buttons['out'] = ttk.Button(
             button_frame,
             text="导出出库明细",
             command=lambda: self.export_records('out')
-        ).pack(side=tk.LEFT, padx=5)
+        )
+        self.export_buttons['out'].pack(side=tk.LEFT, padx=5)
+        
+        self.analysis_button = ttk.Button(
+            button_frame,
+            text="导出分析报表",
+            command=self.export_analysis
+        )
+        self.analysis_button.pack(side=tk.LEFT, padx=5)
         
         # 创建表格框架
         table_frame = ttk.Frame(main_frame)
         table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        # 创建表格
-        columns = ("时间", "商品名称", "类型", "数量", "单价", "成本价", "总价", "毛利", "备注")
-        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings")
-        
-        # 设置列标题和宽度
-        self.tree.heading("时间", text="时间")
-        self.tree.heading("商品名称", text="商品名称")
-        self.tree.heading("类型", text="类型")
-        self.tree.heading("数量", text="数量")
-        self.tree.heading("单价", text="单价")
-        self.tree.heading("成本价", text="成本价")
-        self.tree.heading("总价", text="总价")
-        self.tree.heading("毛利", text="毛利")
-        self.tree.heading("备注", text="备注")
-        
-        self.tree.column("时间", width=150)
-        self.tree.column("商品名称", width=150)
-        self.tree.column("类型", width=60)
-        self.tree.column("数量", width=60)
-        self.tree.column("单价", width=100)
-        self.tree.column("成本价", width=100)
-        self.tree.column("总价", width=100)
-        self.tree.column("毛利", width=100)
-        self.tree.column("备注", width=140)
-        
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        
-        # 放置表格和滚动条
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # 创建虚拟滚动表格（只创建并格式化可见区域的行，按页在后台加载）
+        self.table = VirtualTable(
+            table_frame,
+            COLUMNS,
+            fetch_rows=None,
+            format_row=self.format_record,
+            request_rows=self.request_records
+        )
+        self.table.pack(fill=tk.BOTH, expand=True)
+        self.tree = self.table.tree
+        
+        # 设置标签样式：使用不同的颜色标识出入库记录
+        self.table.tag_configure("in_record", foreground="green")
+        self.table.tag_configure("out_record", foreground="red")
+        
+        # 总计行（固定在表格底部）
+        self.footer = ttk.Treeview(
+            main_frame, columns=[name for name, _ in COLUMNS], show="", height=1, selectmode="none"
+        )
+        for name, width in COLUMNS:
+            self.footer.column(name, width=width)
+        self.footer.tag_configure('total', background='#f0f0f0', foreground='blue')
+        self.footer.pack(fill=tk.X, padx=(5, 22), pady=(0, 5))
         
         # 加载数据
         self.load_records()
     
     def export_records(self, record_type: str):
-        """导出记录到Excel"""
+        """导出记录（先在后台检查是否有记录）"""
+        self.service.call(
+            'count_inventory_records', types=[record_type],
+            on_success=lambda count: self.choose_export_file(record_type, count),
+            on_error=lambda e: messagebox.showerror("错误", f"导出失败：{str(e)}"),
+            widgets=(self.export_buttons[record_type],)
+        )
+    
+    def choose_export_file(self, record_type: str, count: int):
+        """选择保存路径并开始导出（后台流式导出到 Excel/CSV）"""
         try:
-            # 获取数据
-            db = DatabaseManager()
-            records = db.get_inventory_records()
-            
-            # 筛选指定类型的记录并转换为字典列表
-            filtered_records = [
-                record.to_dict() for record in records
-                if record.type == ('in' if record_type == 'in' else 'out')
-            ]
-            
-            if not filtered_records:
-                type_text = "入库" if record_type == "in" else "出库"
+            type_text = "入库" if record_type == "in" else "出库"
+            if count == 0:
                 messagebox.showwarning("警告", f"没有{type_text}记录可供导出！")
                 return
             
-            # 创建DataFrame
-            df = pd.DataFrame(filtered_records)
-            
             # 获取保存路径
             current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            type_text = "入库" if record_type == "in" else "出库"
             default_filename = f"{type_text}记录_{current_time}.xlsx"
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".xlsx",
-                filetypes=[("Excel 文件", "*.xlsx")],
+                filetypes=[
+                    ("Excel 文件", "*.xlsx"),
+                    ("CSV 文件", "*.csv"),
+                    ("压缩 CSV 文件（大量数据）", "*.csv.gz")
+                ],
                 initialfile=default_filename
             )
             
             if file_path:
-                # 导出到Excel
-                df.to_excel(file_path, index=False, engine='openpyxl')
-                messagebox.showinfo("成功", f"{type_text}记录已导出到：\n{file_path}")
+                ExportProgressDialog(
+                    self.window, self.db, file_path,
+                    title=f"导出{type_text}记录", types=[record_type]
+                )
         
         except Exception as e:
             messagebox.showerror("错误", f"导出失败：{str(e)}")
     
+    def export_analysis(self):
+        """导出按月的利润、商品利润、周转和价格走势（后台按块读取记录，数值保持数字类型）"""
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[
+                ("Excel 文件", "*.xlsx"),
+                ("CSV 文件（每项一个文件）", "*.csv")
+            ],
+            initialfile=f"分析报表_{current_time}.xlsx"
+        )
+        if not file_path:
+            return
+        self.service.submit(
+            self.write_analysis, file_path,
+            on_success=lambda names: messagebox.showinfo("完成", f"已导出：{'、'.join(names)}"),
+            on_error=lambda e: messagebox.showerror("错误", f"导出失败：{str(e)}"),
+            widgets=(self.analysis_button,)
+        )
+    
+    def write_analysis(self, file_path: str):
+        """在后台线程中生成分析报表（pandas 在此时才导入）"""
+        from services.analytics import RecordAnalytics
+        return RecordAnalytics(self.db).export_report(file_path)
+    
     def load_records(self):
-        """加载记录到表格"""
-        # 获取数据库实例
-        db = DatabaseManager()
-        records = db.get_inventory_records()
-        
-        # 清空表格
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # 填充数据
-        total_profit = 0  # 总毛利
-        for record in records:
-            # 计算总毛利
-            if record.type == 'out' and record.profit is not None:
-                total_profit += record.profit
-            
-            # 格式化价格显示
-            unit_price = f"¥{record.price:.2f}" if record.price is not None else "-"
-            cost_price = f"¥{record.cost_price:.2f}" if record.cost_price is not None else "-"
-            total_price = f"¥{record.total_price:.2f}" if record.total_price != 0 else "-"
-            profit = f"¥{record.profit:.2f}" if record.profit is not None else "-"
-            
-            values = (
-                record.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                record.product_name,
-                record.type_text,
-                record.quantity,
-                unit_price,
-                cost_price,
-                total_price,
-                profit,
-                record.remark or "-"
-            )
-            
-            # 使用不同的颜色标识出入库记录
-            tag = "in_record" if record.type == "in" else "out_record"
-            self.tree.insert("", 0, values=values, tags=(tag,))
-        
-        # 设置标签样式
-        self.tree.tag_configure("in_record", foreground="green")
-        self.tree.tag_configure("out_record", foreground="red")
-        
-        # 添加总计行
-        self.tree.insert("", tk.END, values=(
+        """加载记录到表格（后台统计总数，具体记录滚动时按页读取）"""
+        self._page_cursors = {}
+        self.service.submit(
+            lambda: (self.db.count_inventory_records(), self.db.get_report_totals()),
+            on_success=self.show_records
+        )
+    
+    def show_records(self, result):
+        """显示记录总数和总计行"""
+        count, totals = result
+        self.table.reload(count)
+        
+        # 总计行（总毛利读取汇总表）
+        total_profit = totals.profit
+        self.footer.delete(*self.footer.get_children())
+        self.footer.insert("", tk.END, values=(
             "总计", "", "", "", "", "", "", f"¥{total_profit:.2f}", ""
         ), tags=('total',))
-        self.tree.tag_configure('total', background='#f0f0f0', foreground='blue') 
\ No newline at end of file
+    
+    def request_records(self, offset: int, limit: int, callback):
+        """在后台读取一页记录，完成后由表格回调刷新"""
+        self.service.submit(self.fetch_records, offset, limit, self._page_cursors,
+                            on_success=callback)
+    
+    def fetch_records(self, offset: int, limit: int, page_cursors: dict):
+        """按页读取记录（时间升序）：顺序翻页使用键集游标，随机跳转时使用偏移"""
+        after = page_cursors.get(offset)
+        if after is not None:
+            records, cursor = self.db.get_inventory_records_page(limit, after, descending=False)
+        else:
+            records, cursor = self.db.get_inventory_records_page(limit, descending=False, offset=offset)
+        if cursor is not None:
+            page_cursors[offset + len(records)] = cursor
+        return records
+    
+    def on_destroy(self, event):
+        """窗口关闭时停止自建的后台服务"""
+        if event.widget is self.window:
+            self.service.shutdown()
+    
+    def format_record(self, record):
+        """格式化一条记录用于显示"""
+        # 格式化价格显示
+        unit_price = f"¥{record.price:.2f}" if record.price is not None else "-"
+        cost_price = f"¥{record.cost_price:.2f}" if record.cost_price is not None else "-"
+        total_price = f"¥{record.total_price:.2f}" if record.total_price != 0 else "-"
+        profit = f"¥{record.profit:.2f}" if record.profit is not None else "-"
+        
+        values = (
+            record.created_at_text,
+            record.product_name,
+            record.type_text,
+            record.quantity,
+            unit_price,
+            cost_price,
+            total_price,
+            profit,
+            record.remark or "-"
+        )
+        
+        # 使用不同的颜色标识出入库记录
+        tag = "in_record" if record.type == "in" else "out_record"
+        return values, (tag,)
@@ -1,10 +1,20 @@
 """
 主窗口模块
 """
+import bisect
 import tkinter as tk
 from tkinter import ttk, messagebox
 from database.db_manager import DatabaseManager
-from ui.inventory_records_window import InventoryRecordsWindow
+from database.costing import COSTING_METHODS
+from services.db_service import DatabaseService
+
+# 输入停止多久后自动搜索（毫秒）
+SEARCH_DELAY = 250
+# 搜索结果最多显示的商品数
+SEARCH_LIMIT = 500
+# 商品列表首屏加载的商品数，其余商品在首屏显示后分页追加
+FIRST_PAGE_SIZE = 100
+PAGE_SIZE = 2000
 
 class InventorySystem:
     """库存管理系统主窗口类"""
@@ -16,6 +26,10 @@ class InventorySystem:
         # 初始化数据库
         self.db = DatabaseManager()
         
+        # 数据库操作在后台线程执行，界面不会因查询或等待锁而卡住
+        self.service = DatabaseService(self.root, self.db)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # 创建主框架
         self.create_widgets()
         
@@ -24,12 +38,21 @@ class InventorySystem:
     
     def create_widgets(self):
         """创建窗口部件"""
+        # 底部状态栏（后台请求执行期间显示忙碌状态）
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=(0, 5))
+        
+        self.status_var = tk.StringVar(value="就绪")
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side=tk.LEFT)
+        self.busy_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=120)
+        self.service.add_busy_listener(self.on_busy_change)
+        
         # 左侧商品列表
         list_frame = ttk.LabelFrame(self.root, text="商品列表", padding="5")
         list_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # 创建表格
-        columns = ("ID", "名称", "数量", "价格(均价)", "描述", "更新时间")
+        columns = ("ID", "名称", "数量", "价格(均价)", "描述", "更新时间", "成本计算", "条码")
         self.tree = ttk.Treeview(list_frame, columns=columns, show="headings")
         
         # 设置列标题
@@ -73,13 +96,25 @@ class InventorySystem:
         self.description_var = tk.StringVar()
         ttk.Entry(add_frame, textvariable=self.description_var).grid(row=3, column=1, padx=5, pady=2)
         
+        ttk.Label(add_frame, text="成本计算:").grid(row=4, column=0, sticky=tk.W)
+        self.costing_var = tk.StringVar(value=COSTING_METHODS['average'])
+        ttk.Combobox(add_frame, textvariable=self.costing_var, values=list(COSTING_METHODS.values()),
+                     state='readonly', width=18).grid(row=4, column=1, padx=5, pady=2)
+        
+        ttk.Label(add_frame, text="条码:").grid(row=5, column=0, sticky=tk.W)
+        self.barcode_var = tk.StringVar()
+        ttk.Entry(add_frame, textvariable=self.barcode_var).grid(row=5, column=1, padx=5, pady=2)
+        
         # 按钮区域
         button_frame = ttk.Frame(operation_frame)
         button_frame.pack(fill=tk.X, padx=5, pady=5)
         
-        ttk.Button(button_frame, text="添加商品", command=self.add_product).pack(fill=tk.X, pady=2)
-        ttk.Button(button_frame, text="修改商品", command=self.update_product).pack(fill=tk.X, pady=2)
-        ttk.Button(button_frame, text="删除商品", command=self.delete_product).pack(fill=tk.X, pady=2)
+        self.add_button = ttk.Button(button_frame, text="添加商品", command=self.add_product)
+        self.add_button.pack(fill=tk.X, pady=2)
+        self.update_button = ttk.Button(button_frame, text="修改商品", command=self.update_product)
+        self.update_button.pack(fill=tk.X, pady=2)
+        self.delete_button = ttk.Button(button_frame, text="删除商品", command=self.delete_product)
+        self.delete_button.pack(fill=tk.X, pady=2)
         
         # 出入库操作区域
         inventory_frame = ttk.LabelFrame(operation_frame, text="出入库操作", padding="5")
@@ -137,6 +172,13 @@ class InventorySystem:
         )
         self.out_button.pack(side=tk.LEFT, padx=5)
         
+        # 批量出入库按钮
+        ttk.Button(
+            inventory_frame,
+            text="批量出入库",
+            command=self.show_batch_inventory
+        ).grid(row=4, column=0, columnspan=3, sticky=tk.EW, padx=5, pady=(0, 5))
+        
         # 绑定按钮悬停事件
         self.in_button.bind('<Enter>', lambda e: self.update_price_hint('in'))
         self.out_button.bind('<Enter>', lambda e: self.update_price_hint('out'))
@@ -152,8 +194,14 @@ class InventorySystem:
         ttk.Entry(search_frame, textvariable=self.search_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
         ttk.Button(search_frame, text="搜索", command=self.search_products).pack(side=tk.RIGHT, padx=5)
         
+        # 输入时自动搜索（防抖）
+        self._search_job = None
+        self._search_generation = 0
+        self.search_var.trace_add('write', self.on_search_changed)
+        
         # 刷新按钮
-        ttk.Button(operation_frame, text="刷新列表", command=self.refresh_product_list).pack(fill=tk.X, padx=5, pady=5)
+        self.refresh_button = ttk.Button(operation_frame, text="刷新列表", command=self.refresh_product_list)
+        self.refresh_button.pack(fill=tk.X, padx=5, pady=5)
         
         # 添加统计按钮
         stats_button = ttk.Button(
@@ -163,8 +211,25 @@ class InventorySystem:
         )
         stats_button.pack(fill=tk.X, padx=5, pady=5)
         
+        # 性能诊断按钮
+        ttk.Button(
+            operation_frame,
+            text="性能诊断",
+            command=self.show_diagnostics
+        ).pack(fill=tk.X, padx=5, pady=5)
+        
         # 绑定表格选择事件
         self.tree.bind('<<TreeviewSelect>>', self.on_select_item)
+        
+        # 设置标签样式
+        self.tree.tag_configure('high_avg_price', foreground='red')
+        
+        # 商品ID与表格行的对应关系，用于增量更新
+        self.product_items = {}
+        self.item_products = {}
+        self.sort_keys = []
+        self.sorted_by_name = True
+        self._restore_state = ([], 0.0)
     
     def on_price_focus(self, event):
         """当价格输入框获得焦点时，根据最后悬停的按钮更新提示"""
@@ -214,15 +279,20 @@ class InventorySystem:
             
             remark = self.remark_var.get()
             
-            # 执行数据库操作
-            success, message = self.db.process_inventory(item_id, type, quantity, price, remark)
+            def on_done(result):
+                success, message = result
+                if success:
+                    messagebox.showinfo("成功", message)
+                    self.clear_inventory_inputs()
+                    self.update_product_rows([item_id])
+                else:
+                    messagebox.showerror("错误", message)
             
-            if success:
-                messagebox.showinfo("成功", message)
-                self.clear_inventory_inputs()
-                self.refresh_product_list()
-            else:
-                messagebox.showerror("错误", message)
+            # 执行数据库操作（后台执行，完成前禁用出入库按钮）
+            self.service.call(
+                'process_inventory', item_id, type, quantity, price, remark,
+                on_success=on_done, widgets=(self.in_button, self.out_button)
+            )
         
         except ValueError:
             messagebox.showerror("错误", "请输入有效的数量！")
@@ -257,10 +327,14 @@ class InventorySystem:
                 messagebox.showerror("错误", "价格不能为负数！")
                 return
             
-            self.db.add_product(name, quantity, price, description)
-            messagebox.showinfo("成功", "商品添加成功！")
-            self.clear_inputs()
-            self.refresh_product_list()
+            def on_done(product_id):
+                messagebox.showinfo("成功", "商品添加成功！")
+                self.clear_inputs()
+                self.update_product_rows([product_id])
+            
+            self.service.call('add_product', name, quantity, price, description,
+                              self.selected_costing_method(), self.barcode_var.get().strip() or None,
+                              on_success=on_done, widgets=(self.add_button,))
             
         except ValueError:
             messagebox.showerror("错误", "请输入有效的数量和价格！")
@@ -291,10 +365,21 @@ class InventorySystem:
                 messagebox.showerror("错误", "价格不能为负数！")
                 return
             
-            self.db.update_product(item_id, name, quantity, price, description)
-            messagebox.showinfo("成功", "商品更新成功！")
-            self.clear_inputs()
-            self.refresh_product_list()
+            def on_done(result):
+                messagebox.showinfo("成功", "商品更新成功！")
+                self.clear_inputs()
+                self.update_product_rows([item_id])
+            
+            def on_error(error):
+                if isinstance(error, ValueError):
+                    # 库存分布在多个仓库或仓库库存不足：请通过出入库或调拨调整
+                    messagebox.showerror("错误", f"商品更新失败: {str(error)}，请通过出入库或仓库调拨调整库存")
+                else:
+                    messagebox.showerror("错误", f"操作失败: {str(error)}")
+            
+            self.service.call('update_product', item_id, name, quantity, price, description,
+                              self.selected_costing_method(), self.barcode_var.get().strip(),
+                              on_success=on_done, on_error=on_error, widgets=(self.update_button,))
             
         except ValueError:
             messagebox.showerror("错误", "请输入有效的数量和价格！")
@@ -308,45 +393,174 @@ class InventorySystem:
         
         if messagebox.askyesno("确认", "确定要删除选中的商品吗？"):
             item_id = self.tree.item(selected_items[0])['values'][0]
-            self.db.delete_product(item_id)
-            messagebox.showinfo("成功", "商品删除成功！")
-            self.clear_inputs()
-            self.refresh_product_list()
+            
+            def on_done(result):
+                messagebox.showinfo("成功", "商品删除成功！")
+                self.clear_inputs()
+                self.update_product_rows([item_id])
+            
+            self.service.call('delete_product', item_id,
+                              on_success=on_done, widgets=(self.delete_button,))
+    
+    def on_search_changed(self, *args):
+        """搜索框内容变化时，取消尚未执行的搜索并重新计时"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DELAY, self.search_products)
     
     def search_products(self):
         """搜索商品"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+            self._search_job = None
+        
+        # 每次搜索递增序号，过期的搜索结果不再显示
+        self._search_generation += 1
+        generation = self._search_generation
+        
+        def on_done(products):
+            if generation == self._search_generation:
+                self.show_products(products)
+        
         keyword = self.search_var.get().strip()
-        products = self.db.search_products(keyword) if keyword else self.db.get_all_products()
-        self.refresh_product_list(products)
+        if keyword:
+            self.service.call('search_products', keyword, limit=SEARCH_LIMIT, on_success=on_done)
+        else:
+            self.load_product_pages(generation)
+    
+    def refresh_product_list(self):
+        """刷新商品列表（后台分页读取全部商品）"""
+        # 之前尚未返回的搜索结果不再显示
+        self._search_generation += 1
+        self.load_product_pages(self._search_generation, widgets=(self.refresh_button,))
     
-    def refresh_product_list(self, products=None):
-        """刷新商品列表"""
-        # 清空表格
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    def load_product_pages(self, generation, after=None, widgets=()):
+        """按名称分页读取全部商品：首屏先显示，其余分页追加（列表刷新或开始搜索后停止）"""
+        def on_page(result):
+            if generation != self._search_generation:
+                return
+            products, cursor = result
+            self.show_products(products, append=after is not None, complete=cursor is None)
+            if cursor is not None:
+                self.load_product_pages(generation, cursor)
         
-        # 获取并显示商品列表
-        if products is None:
-            products = self.db.get_all_products()
+        self.service.call('get_products_page', FIRST_PAGE_SIZE if after is None else PAGE_SIZE, after,
+                          on_success=on_page, widgets=widgets)
+    
+    def show_products(self, products, append=False, complete=True):
+        """显示商品列表（全量重新加载，保留选中行和滚动位置）
+
+        分页加载时 append 为 True 的页追加到列表末尾，complete 为 True 表示最后一页。
+        """
+        if not append:
+            self._restore_state = (
+                [self.item_products[item] for item in self.tree.selection() if item in self.item_products],
+                self.tree.yview()[0]
+            )
+            
+            # 清空表格
+            self.tree.delete(*self.tree.get_children())
+            self.product_items = {}
+            self.item_products = {}
+            self.sort_keys = []
         
         for product in products:
-            values = (
-                product.id,
-                product.name,
-                product.quantity,
-                product.price_display,
-                product.description,
-                product.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            )
+            if product.id in self.product_items:
+                # 分页加载期间已通过增量更新插入
+                continue
+            item = self.tree.insert('', tk.END, values=self.product_values(product),
+                                    tags=self.product_tags(product))
+            self.product_items[product.id] = item
+            self.item_products[item] = product.id
+            self.sort_keys.append((product.name, product.id))
+        
+        # 搜索结果按相关度排序，不能按名称二分插入
+        self.sorted_by_name = all(
+            previous[0] <= current[0] for previous, current in zip(self.sort_keys, self.sort_keys[1:])
+        )
+        
+        # 恢复选中行；滚动位置在全部加载后恢复
+        selected_ids, scroll_position = self._restore_state
+        reselect = [self.product_items[id] for id in selected_ids if id in self.product_items]
+        if reselect:
+            self.tree.selection_add(reselect)
+        if complete:
+            self.tree.yview_moveto(scroll_position)
+    
+    def update_product_rows(self, product_ids):
+        """增量更新列表中指定商品的行（新增、修改、删除），商品在后台读取"""
+        product_ids = list(dict.fromkeys(product_ids))
+        self.service.submit(
+            lambda: [(product_id, self.db.get_product(product_id)) for product_id in product_ids],
+            on_success=self.apply_product_rows
+        )
+    
+    def apply_product_rows(self, products):
+        """把读取到的商品应用到列表：[(商品ID, 商品或None), ...]"""
+        searching = bool(self.search_var.get().strip())
+        for product_id, product in products:
+            item = self.product_items.get(product_id)
             
-            # 如果均价高于当前价格，使用红色显示
-            if product.has_high_avg_price:
-                self.tree.insert('', tk.END, values=values, tags=('high_avg_price',))
+            if product is None:
+                # 商品已删除
+                if item is not None:
+                    self._remove_row(product_id, item)
+                continue
+            
+            if item is None:
+                # 新商品：搜索状态下不一定符合条件，不加入列表
+                if not searching:
+                    self._insert_row(product)
+                continue
+            
+            index = self.tree.index(item)
+            if self.sort_keys[index][0] != product.name and self.sorted_by_name:
+                # 名称变化时移动到新的排序位置
+                selected = item in self.tree.selection()
+                self._remove_row(product_id, item)
+                item = self._insert_row(product)
+                if selected:
+                    self.tree.selection_add(item)
             else:
-                self.tree.insert('', tk.END, values=values)
-        
-        # 设置标签样式
-        self.tree.tag_configure('high_avg_price', foreground='red')
+                self.tree.item(item, values=self.product_values(product),
+                               tags=self.product_tags(product))
+                self.sort_keys[index] = (product.name, product.id)
+    
+    def _insert_row(self, product):
+        """按名称顺序插入一行"""
+        key = (product.name, product.id)
+        index = bisect.bisect(self.sort_keys, key) if self.sorted_by_name else len(self.sort_keys)
+        item = self.tree.insert('', index, values=self.product_values(product),
+                                tags=self.product_tags(product))
+        self.sort_keys.insert(index, key)
+        self.product_items[product.id] = item
+        self.item_products[item] = product.id
+        return item
+    
+    def _remove_row(self, product_id, item):
+        """删除一行"""
+        index = self.tree.index(item)
+        self.tree.delete(item)
+        del self.sort_keys[index]
+        del self.product_items[product_id]
+        del self.item_products[item]
+    
+    def product_values(self, product):
+        """商品行显示的值"""
+        return (
+            product.id,
+            product.name,
+            product.quantity,
+            product.price_display,
+            product.description,
+            product.updated_at_text,
+            COSTING_METHODS.get(product.costing_method, product.costing_method),
+            product.barcode or ""
+        )
+    
+    def product_tags(self, product):
+        """商品行的标签：均价高于当前价格时使用红色显示"""
+        return ('high_avg_price',) if product.has_high_avg_price else ()
     
     def on_select_item(self, event):
         """选择商品时的回调函数"""
@@ -357,6 +571,9 @@ class InventorySystem:
             self.quantity_var.set(values[2])
             self.price_var.set(values[3].split()[0])  # 只取当前价格，不要均价部分
             self.description_var.set(values[4])
+            self.costing_var.set(values[6])
+            # 条码可能以0开头，按原始文本读取，避免被转换为数字
+            self.barcode_var.set(self.tree.set(selected_items[0], "条码"))
     
     def clear_inputs(self):
         """清空输入框"""
@@ -364,8 +581,46 @@ class InventorySystem:
         self.quantity_var.set("")
         self.price_var.set("")
         self.description_var.set("")
+        self.costing_var.set(COSTING_METHODS['average'])
+        self.barcode_var.set("")
         self.clear_inventory_inputs()
     
+    def selected_costing_method(self):
+        """输入区选择的成本计算方式"""
+        label = self.costing_var.get()
+        return next((method for method, text in COSTING_METHODS.items() if text == label), 'average')
+    
+    # 以下窗口（及其依赖的导出、统计模块）在首次打开时才导入，加快程序启动
     def show_inventory_records(self):
         """显示出入库记录统计窗口"""
-        InventoryRecordsWindow(self.root) 
\ No newline at end of file
+        from ui.inventory_records_window import InventoryRecordsWindow
+        InventoryRecordsWindow(self.root, self.db, self.service)
+    
+    def show_batch_inventory(self):
+        """显示批量出入库窗口"""
+        from ui.batch_inventory_window import BatchInventoryWindow
+        BatchInventoryWindow(self.root, self.db, on_success=self.update_product_rows,
+                             service=self.service)
+    
+    def show_diagnostics(self):
+        """显示性能诊断窗口"""
+        from ui.diagnostics_window import DiagnosticsWindow
+        DiagnosticsWindow(self.root, self.db)
+    
+    def on_busy_change(self, busy):
+        """后台请求开始/全部完成时更新状态栏"""
+        if busy:
+            self.status_var.set("正在处理...")
+            self.busy_bar.pack(side=tk.RIGHT)
+            self.busy_bar.start(10)
+            self.root.configure(cursor='watch')
+        else:
+            self.status_var.set("就绪")
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.root.configure(cursor='')
+    
+    def on_close(self):
+        """关闭主窗口：停止后台服务"""
+        self.service.shutdown()
+        self.root.destroy()
@@ -0,0 +1,247 @@
+"""
+虚拟滚动表格模块
+"""
+import tkinter as tk
+from tkinter import ttk
+from tkinter import font as tkfont
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+class VirtualTable(ttk.Frame):
+    """虚拟滚动表格类
+
+    Treeview 中只保留可见区域及少量缓冲的行，滚动时复用这些行并按需格式化；
+    数据按页从 fetch_rows(offset, limit) 懒加载，并缓存最近访问的若干页。
+    传入 request_rows(offset, limit, callback) 时改为异步加载：页面未到达前显示占位行，
+    callback(rows) 在界面线程中被调用后再刷新。
+    """
+    LOADING_TEXT = "加载中..."
+
+    def __init__(self, parent, columns: Sequence[Tuple[str, int]],
+                 fetch_rows: Optional[Callable[[int, int], List[Any]]],
+                 format_row: Callable[[Any], Tuple[tuple, tuple]],
+                 row_count: int = 0, page_size: int = 200,
+                 buffer_rows: int = 5, cache_pages: int = 20,
+                 request_rows: Optional[Callable[[int, int, Callable[[List[Any]], None]], None]] = None):
+        super().__init__(parent)
+        self.fetch_rows = fetch_rows
+        self.request_rows = request_rows
+        self.format_row = format_row
+        self.row_count = row_count
+        self.page_size = page_size
+        self.buffer_rows = buffer_rows
+        self.cache_pages = cache_pages
+
+        self.top = 0  # 第一可见行的序号
+        self.visible_rows = 20
+        self.selected_index = None
+        self._pages = OrderedDict()
+        self._loading = set()  # 正在异步加载的页
+        self._generation = 0  # reload 后丢弃之前请求的页
+        self._pool: List[str] = []  # 复用的表格行
+        self._rendering = False
+
+        names = [name for name, _ in columns]
+        self.tree = ttk.Treeview(self, columns=names, show="headings", selectmode="browse")
+        for name, width in columns:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=width)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.row_height = self._get_row_height()
+
+        # 滚动事件由本类处理，不交给Treeview
+        self.tree.bind('<Configure>', self.on_configure)
+        self.tree.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_by(3))
+        self.tree.bind('<Up>', lambda e: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self.move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.scroll_by(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self.scroll_by(self.visible_rows))
+        self.tree.bind('<Home>', lambda e: self.scroll_to(0))
+        self.tree.bind('<End>', lambda e: self.scroll_to(self.row_count))
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+
+    def _get_row_height(self) -> int:
+        """获取表格行高"""
+        row_height = ttk.Style().lookup('Treeview', 'rowheight')
+        try:
+            return int(row_height)
+        except (TypeError, ValueError):
+            return tkfont.nametofont('TkDefaultFont').metrics('linespace') + 4
+
+    def tag_configure(self, tag: str, **options):
+        """设置行标签样式"""
+        self.tree.tag_configure(tag, **options)
+
+    def reload(self, row_count: int):
+        """数据变化后重新加载（清空页缓存）"""
+        self._pages.clear()
+        self._loading.clear()
+        self._generation += 1
+        self.row_count = row_count
+        self.selected_index = None
+        self.scroll_to(self.top)
+
+    def _get_page(self, page: int) -> Optional[List[Any]]:
+        """获取一页数据（优先使用缓存），异步加载尚未完成时返回 None"""
+        rows = self._pages.get(page)
+        if rows is not None:
+            self._pages.move_to_end(page)
+            return rows
+
+        if self.request_rows is not None:
+            if page not in self._loading:
+                self._loading.add(page)
+                generation = self._generation
+                self.request_rows(
+                    page * self.page_size, self.page_size,
+                    lambda rows: self._on_page_loaded(page, generation, rows)
+                )
+            return None
+
+        rows = self.fetch_rows(page * self.page_size, self.page_size)
+        return self._store_page(page, rows)
+
+    def _on_page_loaded(self, page: int, generation: int, rows: List[Any]):
+        """异步加载的页到达后刷新表格"""
+        if generation != self._generation:
+            return
+        self._loading.discard(page)
+        self._store_page(page, rows)
+        self.render()
+
+    def _store_page(self, page: int, rows: List[Any]) -> List[Any]:
+        """缓存一页数据"""
+        self._pages[page] = rows
+        if len(self._pages) > self.cache_pages:
+            self._pages.popitem(last=False)
+
+        # 实际行数少于预期时（如商品已删除的记录）修正总行数
+        if len(rows) < self.page_size:
+            self.row_count = page * self.page_size + len(rows)
+        return rows
+
+    def _get_rows(self, start: int, count: int) -> List[Any]:
+        """获取 [start, start+count) 范围内的数据（尚未加载的行为 None）"""
+        rows = []
+        end = min(start + count, self.row_count)
+        index = start
+        while index < end:
+            page, offset = divmod(index, self.page_size)
+            page_rows = self._get_page(page)
+            if page_rows is None:
+                missing = min(end, (page + 1) * self.page_size) - index
+                rows.extend([None] * missing)
+                index += missing
+                continue
+            taken = page_rows[offset:offset + end - index]
+            if not taken:
+                break
+            rows.extend(taken)
+            index += len(taken)
+        return rows
+
+    def render(self):
+        """渲染可见区域的行"""
+        if self._rendering:
+            return
+        self._rendering = True
+        try:
+            rows = self._get_rows(self.top, self.visible_rows + self.buffer_rows)
+
+            for index, row in enumerate(rows):
+                if row is None:
+                    values, tags = (self.LOADING_TEXT,), ()
+                else:
+                    values, tags = self.format_row(row)
+                if index < len(self._pool):
+                    self.tree.item(self._pool[index], values=values, tags=tags)
+                else:
+                    self._pool.append(self.tree.insert('', tk.END, values=values, tags=tags))
+
+            # 删除多余的行
+            for item in self._pool[len(rows):]:
+                self.tree.delete(item)
+            del self._pool[len(rows):]
+
+            # 恢复选中行
+            position = None if self.selected_index is None else self.selected_index - self.top
+            if position is not None and 0 <= position < len(self._pool):
+                self.tree.selection_set(self._pool[position])
+            elif self.tree.selection():
+                self.tree.selection_remove(*self.tree.selection())
+
+            self._update_scrollbar()
+        finally:
+            self._rendering = False
+
+    def _update_scrollbar(self):
+        """根据当前位置设置滚动条"""
+        if self.row_count <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        first = self.top / self.row_count
+        last = min(1.0, (self.top + self.visible_rows) / self.row_count)
+        self.scrollbar.set(first, last)
+
+    def _max_top(self) -> int:
+        """第一可见行序号的最大值"""
+        return max(0, self.row_count - self.visible_rows)
+
+    def scroll_to(self, top: int):
+        """滚动到指定行"""
+        self.top = max(0, min(int(top), self._max_top()))
+        self.render()
+        return "break"
+
+    def scroll_by(self, rows: int):
+        """滚动指定行数"""
+        return self.scroll_to(self.top + rows)
+
+    def move_selection(self, step: int):
+        """键盘上下移动选中行，必要时滚动"""
+        if self.row_count <= 0:
+            return "break"
+        if self.selected_index is None:
+            self.selected_index = self.top
+        else:
+            self.selected_index = max(0, min(self.selected_index + step, self.row_count - 1))
+
+        if self.selected_index < self.top:
+            self.top = self.selected_index
+        elif self.selected_index >= self.top + self.visible_rows:
+            self.top = self.selected_index - self.visible_rows + 1
+        return self.scroll_to(self.top)
+
+    def on_scrollbar(self, action: str, value: str, unit: str = None):
+        """滚动条回调"""
+        if action == tk.MOVETO:
+            self.scroll_to(round(float(value) * self.row_count))
+        elif action == tk.SCROLL:
+            step = self.visible_rows if unit == tk.PAGES else 1
+            self.scroll_by(int(value) * step)
+
+    def on_mouse_wheel(self, event):
+        """鼠标滚轮"""
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_configure(self, event):
+        """表格大小变化时重新计算可见行数"""
+        # 减去表头高度
+        visible_rows = max(1, (event.height - self.row_height) // self.row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.scroll_to(self.top)
+
+    def on_select(self, event):
+        """记录选中行的绝对序号"""
+        if self._rendering:
+            return
+        selection = self.tree.selection()
+        if selection and selection[0] in self._pool:
+            self.selected_index = self.top + self._pool.index(selection[0])